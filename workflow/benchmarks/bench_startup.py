@@ -0,0 +1,202 @@
+# Measures how much of each short workflow step is spent importing modules versus doing work
+# Every entry point is run in a fresh Python (through stubs.py, so missing chemistry packages are
+# replaced by mocks) against a small synthetic DFT_DIR:
+#   cold  - first run with an empty bytecode cache
+#   warm  - median of the following runs, with the bytecode cache filled
+# Each entry point runs against its own copy of scripts/ with no __pycache__ directories, so the
+# cold run really compiles the workflow modules (PYTHONPYCACHEPREFIX would need Python 3.8).
+# For each run the wall time and the total import time (from python -X importtime, counting only
+# the modules the entry point imports) are recorded.
+#
+# Exit codes are recorded too - with stubbed packages most scripts fail partway through, which
+# still times the imports but not all of the real work.
+# Results are written as JSON, and a previous result file can be given to print the change
+#
+# Usage: python bench_startup.py [n_repeats] [output.json] [previous.json]
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import statistics
+import subprocess
+
+import stubs
+
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+WORKFLOW_DIR = os.path.dirname(BENCHMARK_DIR)
+SCRIPTS_DIR = os.path.join(WORKFLOW_DIR, 'scripts')
+
+# name: (working directory, argv)
+ENTRY_POINTS = {
+    # interpreter and launcher startup alone, to subtract from the others
+    'python_startup': (SCRIPTS_DIR, ['-c', 'pass']),
+    'species_thermo': (SCRIPTS_DIR, ['species_thermo.py', '0', '--no-submit']),
+    'species_rotors': (SCRIPTS_DIR, ['species_rotors.py', '0', '--no-submit']),
+    'make_arkane_thermo_input': (SCRIPTS_DIR, ['make_arkane_thermo_input.py', '0']),
+    'setup_arkane_kinetics': (os.path.join(SCRIPTS_DIR, 'kinetics'), ['setup_arkane_kinetics.py', '0']),
+    'collect_species': (os.path.join(SCRIPTS_DIR, 'kinetics'), ['collect_species.py', '0']),
+    'get_lowest_conformer': (os.path.join(SCRIPTS_DIR, 'thermo'), ['get_lowest_conformer.py', '0']),
+    'job.index2smiles': (
+        os.path.join(SCRIPTS_DIR, 'thermo'),
+        ['-c', 'import job; job.index2smiles(0); job.smiles2index("CC"); job.conformers_complete(0)'],
+    ),
+    'kineticfun.reaction_index2smiles': (
+        os.path.join(SCRIPTS_DIR, 'kinetics'),
+        ['-c', 'import kineticfun; kineticfun.reaction_index2smiles(0); kineticfun.shell_complete(0)'],
+    ),
+}
+
+SPECIES = [('CH4(1)', 'C'), ('C2H6(2)', 'CC'), ('CH3(3)', '[CH3]'), ('C2H5(4)', 'C[CH2]')]
+REACTIONS = [('CH4(1)+C2H5(4)<=>CH3(3)+C2H6(2)', 'C+C[CH2]_CC+[CH3]')]
+
+
+def make_dft_dir(dft_dir):
+    """Writes the species and reaction lists the entry points look things up in
+    """
+    os.makedirs(dft_dir, exist_ok=True)
+    with open(os.path.join(dft_dir, 'species_list.csv'), 'w') as f:
+        f.write(',i,name,SMILES,in_model\n')
+        for i, (name, smiles) in enumerate(SPECIES):
+            f.write(f'{i},{i},{name},{smiles},True\n')
+    with open(os.path.join(dft_dir, 'reaction_list.csv'), 'w') as f:
+        f.write(',i,name,SMILES,in_model\n')
+        for i, (name, smiles) in enumerate(REACTIONS):
+            f.write(f'{i},{i},{name},{smiles},True\n')
+
+
+def get_import_time(stderr):
+    """Total seconds spent in top-level imports after the BENCH_START marker
+    """
+    total_us = 0
+    started = False
+    for line in stderr.splitlines():
+        if line.startswith('BENCH_START'):
+            started = True
+            continue
+        # import time: self [us] | cumulative | imported package
+        match = re.match(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)', line)
+        if started and match and len(match.group(3)) == 1:
+            total_us += int(match.group(2))
+    return total_us / 1e6
+
+
+def get_python_path(scripts_dir):
+    # the scripts add the cluster paths to sys.path, so point them at the copy being timed too
+    return os.pathsep.join([scripts_dir, os.path.join(scripts_dir, 'thermo'), os.path.join(scripts_dir, 'kinetics')])
+
+
+def copy_scripts(temp_dir):
+    """Copies scripts/ and the stubs launcher into temp_dir without any compiled bytecode
+    Returns (scripts copy, launcher copy)
+    """
+    scripts_dir = os.path.join(temp_dir, 'scripts')
+    shutil.copytree(SCRIPTS_DIR, scripts_dir, ignore=shutil.ignore_patterns('__pycache__'))
+    launcher = os.path.join(temp_dir, 'stubs.py')
+    shutil.copy2(os.path.join(BENCHMARK_DIR, 'stubs.py'), launcher)
+    return scripts_dir, launcher
+
+
+def run_once(launcher, cwd, argv, env):
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', launcher] + argv,
+        cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    wall = time.perf_counter() - start
+    return {'wall': wall, 'import': get_import_time(proc.stderr), 'exit_code': proc.returncode}
+
+
+def benchmark(name, n_repeats, base_env):
+    cwd, argv = ENTRY_POINTS[name]
+    temp_dir = tempfile.mkdtemp(prefix='bench_startup_')
+    scripts_dir, launcher = copy_scripts(temp_dir)
+    cwd = os.path.join(scripts_dir, os.path.relpath(cwd, SCRIPTS_DIR))
+    env = dict(base_env, PYTHONPATH=get_python_path(scripts_dir))
+    env.pop('PYTHONDONTWRITEBYTECODE', None)  # the warm runs need the cache the cold run writes
+    if argv[0] == '-c':
+        # run the snippet as a script so it goes through the same launcher
+        snippet_file = os.path.join(temp_dir, 'snippet.py')
+        with open(snippet_file, 'w') as f:
+            f.write(argv[1] + '\n')
+        argv = [snippet_file]
+    try:
+        cold = run_once(launcher, cwd, argv, env)
+        warm = [run_once(launcher, cwd, argv, env) for i in range(n_repeats)]
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return {
+        'name': name,
+        'cold_wall': cold['wall'],
+        'cold_import': cold['import'],
+        'warm_wall': statistics.median([run['wall'] for run in warm]),
+        'warm_wall_min': min([run['wall'] for run in warm]),
+        'warm_import': statistics.median([run['import'] for run in warm]),
+        'exit_code': cold['exit_code'],
+    }
+
+
+def get_git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=WORKFLOW_DIR, capture_output=True, text=True
+        ).stdout.strip()
+    except FileNotFoundError:
+        return ''
+
+
+def compare(results, previous):
+    old = {entry['name']: entry for entry in previous['results']}
+    print(f'\nCompared to {previous.get("commit", "previous run")}')
+    for entry in results['results']:
+        if entry['name'] not in old:
+            continue
+        ratio = entry['warm_wall'] / old[entry['name']]['warm_wall']
+        flag = '  SLOWER' if ratio > 1.1 else ''
+        print(f"{entry['name']:36s} {old[entry['name']]['warm_wall']:8.3f}s -> {entry['warm_wall']:8.3f}s  x{ratio:.2f}{flag}")
+
+
+if __name__ == '__main__':
+    n_repeats = 5
+    if len(sys.argv) > 1:
+        n_repeats = int(sys.argv[1])
+    output_file = None
+    if len(sys.argv) > 2:
+        output_file = sys.argv[2]
+
+    dft_dir = tempfile.mkdtemp(prefix='bench_dft_')
+    make_dft_dir(dft_dir)
+    env = dict(os.environ)
+    env['DFT_DIR'] = dft_dir
+
+    results = {
+        'commit': get_git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'host': platform.node(),
+        'stubbed': stubs.missing_packages(),
+        'n_repeats': n_repeats,
+        'results': [],
+    }
+    try:
+        for name in ENTRY_POINTS:
+            entry = benchmark(name, n_repeats, env)
+            results['results'].append(entry)
+            print(f"{name:36s} cold {entry['cold_wall']:7.3f}s ({entry['cold_import']:6.3f}s imports)  "
+                  f"warm {entry['warm_wall']:7.3f}s ({entry['warm_import']:6.3f}s imports)  exit {entry['exit_code']}")
+    finally:
+        shutil.rmtree(dft_dir, ignore_errors=True)
+
+    if output_file:
+        with open(output_file, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+    if len(sys.argv) > 3:
+        with open(sys.argv[3], 'r') as f:
+            compare(results, json.load(f))
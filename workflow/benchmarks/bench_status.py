@@ -0,0 +1,151 @@
+# Times the status and log-scanning functions against synthetic campaigns (make_dft_fixture.py)
+# at multiples of the current campaign size. Each function is swept over every species or
+# reaction in the fixture, the way run_all.py and the status reports use them.
+#
+# Results are written as JSON, and a previous result file can be given to print the change
+# The same sweeps run under pytest-benchmark in test_status.py
+#
+# Usage: python bench_status.py [scales] [output.json] [previous.json]
+# e.g.   python bench_status.py 10,100 status.json
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import contextlib
+import platform
+import tempfile
+
+import stubs
+stubs.install()
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.join(os.path.dirname(BENCHMARK_DIR), 'scripts')
+sys.path.append(SCRIPTS_DIR)
+sys.path.append(os.path.join(SCRIPTS_DIR, 'thermo'))
+sys.path.append(os.path.join(SCRIPTS_DIR, 'kinetics'))
+
+import job
+import kineticfun
+import ts_index
+import state_db
+import events
+import make_dft_fixture
+from bench_startup import get_git_commit, compare
+
+# collect_species is a script that only runs with the real pandas
+N_COLLECT_SPECIES_RUNS = 50
+
+
+def set_dft_dir(dft_dir):
+    os.environ['DFT_DIR'] = dft_dir
+    os.environ.pop('STATE_DB', None)
+    # each fixture gets its own state database, so earlier runs don't short-circuit the checks
+    for module in [job, kineticfun, ts_index, state_db, events]:
+        module.DFT_DIR = dft_dir
+
+
+def reset_state_db():
+    # start each sweep from an empty state database so it times the checks, not the cached rows
+    if state_db._connection is not None:
+        state_db._connection.close()
+    state_db._connection = None
+    if os.path.exists(state_db.get_db_file()):
+        os.remove(state_db.get_db_file())
+
+
+def sweep(function, items):
+    """Calls function on every item with stdout silenced
+    """
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for item in items:
+            function(item)
+
+
+def time_sweep(function, items):
+    """Returns (total seconds, seconds per call) for sweep
+    """
+    start = time.perf_counter()
+    sweep(function, items)
+    total = time.perf_counter() - start
+    return total, total / max(1, len(items))
+
+
+def get_sweeps(dft_dir, n_species, n_reactions):
+    """(name, function, items) for every sweep over a fixture
+    """
+    species = list(range(n_species))
+    reactions = list(range(n_reactions))
+    conformer_logs = sorted(glob.glob(os.path.join(dft_dir, 'thermo', 'species_*', 'conformers', 'conformer_*.log')))
+    sweeps = [
+        ('job.termination_status', job.termination_status, conformer_logs),
+        ('kineticfun.termination_status', kineticfun.termination_status, conformer_logs),
+        ('job.incomplete_conformers', job.incomplete_conformers, species),
+        ('job.incomplete_rotors', job.incomplete_rotors, species),
+        ('job.get_lowest_conformer', job.get_lowest_conformer, species),
+        ('kineticfun.shell_complete', kineticfun.shell_complete, reactions),
+        ('kineticfun.overall_complete', kineticfun.overall_complete, reactions),
+    ]
+    if 'pandas' not in stubs.missing_packages():
+        sweeps.append(('collect_species', run_collect_species, reactions[:N_COLLECT_SPECIES_RUNS]))
+    return sweeps
+
+
+def run_collect_species(reaction_index):
+    stubs.run_script([os.path.join(SCRIPTS_DIR, 'kinetics', 'collect_species.py'), str(reaction_index)])
+
+
+def benchmark_scale(scale, log_kb=100):
+    dft_dir = tempfile.mkdtemp(prefix=f'bench_dft_x{scale}_')
+    try:
+        start = time.perf_counter()
+        n_species, n_reactions = make_dft_fixture.make_dft_dir(dft_dir, scale=scale, log_kb=log_kb)
+        setup_time = time.perf_counter() - start
+        set_dft_dir(dft_dir)
+        print(f'x{scale}: {n_species} species, {n_reactions} reactions (fixture took {setup_time:.1f}s)')
+
+        results = []
+        for name, function, items in get_sweeps(dft_dir, n_species, n_reactions):
+            reset_state_db()
+            total, per_call = time_sweep(function, items)
+            results.append({
+                'name': f'{name} x{scale}',
+                'scale': scale,
+                'n_calls': len(items),
+                'total': total,
+                'per_call': per_call,
+                # compare() looks at this
+                'warm_wall': total,
+            })
+            print(f'    {name:32s} {len(items):8d} calls {total:9.3f}s  {per_call * 1e3:8.3f} ms/call')
+        return results
+    finally:
+        shutil.rmtree(dft_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    scales = [10, 100]
+    if len(sys.argv) > 1:
+        scales = [float(scale) if '.' in scale else int(scale) for scale in sys.argv[1].split(',')]
+
+    results = {
+        'commit': get_git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'host': platform.node(),
+        'stubbed': stubs.missing_packages(),
+        'results': [],
+    }
+    for scale in scales:
+        results['results'] += benchmark_scale(scale)
+
+    if len(sys.argv) > 2:
+        with open(sys.argv[2], 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+    if len(sys.argv) > 3:
+        with open(sys.argv[3], 'r') as f:
+            compare(results, json.load(f))
@@ -0,0 +1,146 @@
+# Baseline timings for scripts/zmatrix.py, which rotor_scan.py uses to write the rotor inputs
+# For linear alkanes from methane to C20 and a set of branched radicals, it times building the
+# ZMatrix and each of build_z_crds, build_pretty_zcrds and build_cart_crds, and measures the
+# memory allocated by each step with tracemalloc. It also checks the round trip
+# cartesian -> z-matrix -> cartesian by comparing every interatomic distance.
+# Prints the scaling exponent of each step with the number of atoms (log-log fit).
+#
+# Needs RDKit, NumPy and OpenMM (simtk.unit) - these aren't stubbed, the numbers would be meaningless
+#
+# Usage: python bench_zmatrix.py [n_repeats] [output.json] [previous.json]
+import os
+import sys
+import json
+import time
+import platform
+import tracemalloc
+
+import numpy as np
+from rdkit import Chem
+from rdkit.Chem import AllChem
+from simtk import unit
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+import zmatrix
+from bench_startup import get_git_commit, compare
+
+
+ALKANES = ['C' * n for n in [1, 2, 3, 4, 6, 8, 10, 12, 16, 20]]
+BRANCHED_RADICALS = [
+    'C[CH]C',
+    'CC(C)[CH2]',
+    'C[C](C)C',
+    'CC(C)(C)C[CH]C',
+    '[CH2]C(C)(C)CC(C)(C)C',
+    'CC(C)CC(C)C[C](C)CC(C)C',
+    'CC(C)(C)C(C)(C)CC(C)(C)C[CH]C(C)(C)C',
+]
+
+# distances are compared in angstrom
+ROUND_TRIP_TOLERANCE = 1e-4
+
+
+def embed(smiles):
+    """RDKit molecule with hydrogens and one 3D conformer
+    """
+    rdmol = Chem.AddHs(Chem.MolFromSmiles(smiles))
+    AllChem.EmbedMolecule(rdmol, randomSeed=0xf00d)
+    AllChem.MMFFOptimizeMolecule(rdmol)
+    return rdmol
+
+
+def get_distances(crds):
+    crds = np.asarray(crds)
+    return np.linalg.norm(crds[:, np.newaxis, :] - crds[np.newaxis, :, :], axis=-1)
+
+
+def measure(function, n_repeats):
+    """Returns (result, best seconds per call, peak bytes allocated during one call)
+    """
+    best = None
+    for i in range(n_repeats):
+        start = time.perf_counter()
+        result = function()
+        duration = time.perf_counter() - start
+        if best is None or duration < best:
+            best = duration
+
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, best, peak
+
+
+def benchmark_molecule(smiles, n_repeats):
+    rdmol = embed(smiles)
+    crds = np.array(rdmol.GetConformers()[0].GetPositions()) * unit.angstrom
+
+    entry = {'name': smiles, 'n_atoms': rdmol.GetNumAtoms()}
+    zm, entry['ZMatrix'], entry['ZMatrix_bytes'] = measure(lambda: zmatrix.ZMatrix(rdmol), n_repeats)
+    z_crds, entry['build_z_crds'], entry['build_z_crds_bytes'] = measure(lambda: zm.build_z_crds(crds), n_repeats)
+    _, entry['build_pretty_zcrds'], entry['build_pretty_zcrds_bytes'] = measure(
+        lambda: zm.build_pretty_zcrds(crds), n_repeats
+    )
+    cart_crds, entry['build_cart_crds'], entry['build_cart_crds_bytes'] = measure(
+        lambda: zm.build_cart_crds(z_crds), n_repeats
+    )
+
+    # the rebuilt molecule is in a different frame, so compare distances instead of positions
+    original = get_distances(crds.value_in_unit(unit.angstrom))
+    rebuilt = get_distances(cart_crds.value_in_unit(unit.angstrom))
+    entry['round_trip_error'] = float(np.max(np.abs(original - rebuilt)))
+    entry['round_trip_ok'] = entry['round_trip_error'] < ROUND_TRIP_TOLERANCE
+    # compare() looks at this
+    entry['warm_wall'] = entry['ZMatrix'] + entry['build_z_crds'] + entry['build_pretty_zcrds'] + entry['build_cart_crds']
+    return entry
+
+
+def get_scaling(results, step):
+    """Exponent b of time ~ n_atoms^b from a least squares fit to the alkanes bigger than ethane
+    """
+    points = [(entry['n_atoms'], entry[step]) for entry in results if entry['name'] in ALKANES and entry['n_atoms'] > 8]
+    if len(points) < 2:
+        return None
+    n_atoms, times = zip(*points)
+    return float(np.polyfit(np.log(n_atoms), np.log(times), 1)[0])
+
+
+if __name__ == '__main__':
+    n_repeats = 5
+    if len(sys.argv) > 1:
+        n_repeats = int(sys.argv[1])
+
+    results = {
+        'commit': get_git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'host': platform.node(),
+        'n_repeats': n_repeats,
+        'results': [],
+        'scaling': {},
+    }
+    steps = ['ZMatrix', 'build_z_crds', 'build_pretty_zcrds', 'build_cart_crds']
+    print(f"{'SMILES':40s} {'atoms':>5s}" + ''.join([f' {step:>18s}' for step in steps]) + '  round trip (A)')
+    for smiles in ALKANES + BRANCHED_RADICALS:
+        entry = benchmark_molecule(smiles, n_repeats)
+        results['results'].append(entry)
+        print(f"{smiles:40s} {entry['n_atoms']:5d}" +
+              ''.join([f" {entry[step] * 1e3:9.2f}ms {entry[step + '_bytes'] / 1024:5.0f}kB" for step in steps]) +
+              f"  {entry['round_trip_error']:.1e}{'' if entry['round_trip_ok'] else '  FAILED'}")
+
+    for step in steps:
+        results['scaling'][step] = get_scaling(results['results'], step)
+    print('Scaling exponent with number of atoms: ' +
+          ', '.join([f'{step} {exponent:.2f}' for step, exponent in results['scaling'].items() if exponent is not None]))
+
+    if len(sys.argv) > 2:
+        with open(sys.argv[2], 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if len(sys.argv) > 3:
+        with open(sys.argv[3], 'r') as f:
+            compare(results, json.load(f))
+
+    if not all([entry['round_trip_ok'] for entry in results['results']]):
+        exit(1)
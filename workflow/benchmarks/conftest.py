@@ -0,0 +1,35 @@
+# pytest fixtures for the pytest-benchmark versions of the benchmarks (test_*.py in this directory)
+# The campaign fixture is built once per scale with make_dft_fixture.py, in multiples of the
+# current campaign size. x100 takes a few minutes to write.
+#
+# Usage (from workflow/benchmarks): python -m pytest [--scales=10,100] [--benchmark-autosave]
+import os
+import shutil
+
+import pytest
+
+import bench_status
+import make_dft_fixture
+
+
+def pytest_addoption(parser):
+    parser.addoption('--scales', default='10,100', help='comma separated campaign fixture scales')
+
+
+def pytest_generate_tests(metafunc):
+    if 'scale' in metafunc.fixturenames:
+        scales = [float(scale) if '.' in scale else int(scale) for scale in metafunc.config.getoption('scales').split(',')]
+        metafunc.parametrize('scale', scales, ids=[f'x{scale}' for scale in scales], scope='session')
+
+
+@pytest.fixture(scope='session')
+def campaign(tmp_path_factory, scale):
+    """Synthetic DFT_DIR at one scale, with the sweeps that run over it
+    Returns {'dft_dir', 'n_species', 'n_reactions', 'sweeps'}
+    """
+    dft_dir = str(tmp_path_factory.mktemp(f'dft_x{scale}'))
+    n_species, n_reactions = make_dft_fixture.make_dft_dir(dft_dir, scale=scale)
+    bench_status.set_dft_dir(dft_dir)
+    sweeps = {name: (function, items) for name, function, items in bench_status.get_sweeps(dft_dir, n_species, n_reactions)}
+    yield {'dft_dir': dft_dir, 'n_species': n_species, 'n_reactions': n_reactions, 'sweeps': sweeps}
+    shutil.rmtree(dft_dir, ignore_errors=True)
@@ -0,0 +1,208 @@
+# Builds a synthetic DFT_DIR that looks like a real campaign, for benchmarking and trying out
+# the status and log-scanning functions without the cluster
+# Scale 1 is the size of the current campaign (resources/species_list.csv and reaction_list.csv).
+# Each species gets conformer and rotor runs and each reaction gets shell and overall TS runs,
+# with a mix of normal, error and unfinished Gaussian logs. The logs are hardlinks to a small
+# pool of generated logs, so even the 100x fixture only costs inodes, not disk space.
+#
+# Usage: python make_dft_fixture.py output_dir [scale] [log_kb]
+import os
+import sys
+import random
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+import staging
+
+
+N_SPECIES = 186
+N_REACTIONS = 1400
+
+# fraction of Gaussian logs ending each way, keyed by the termination_status code
+TERMINATION_MIX = {
+    0: 0.85,   # Normal termination
+    1: 0.04,   # Error termination
+    2: 0.01,   # all variables frozen
+    3: 0.02,   # problem with the distance matrix
+    -1: 0.08,  # still running or killed at the time limit
+}
+
+MAX_CONFORMERS = 20
+MAX_ROTORS = 8
+MAX_TS_RUNS = 12
+FRACTION_THERMO_DONE = 0.6
+N_TEMPLATES = 8
+
+
+def make_log_text(status, energy, log_kb):
+    """Text of a Gaussian optimization + frequency log of about log_kb kilobytes
+    """
+    header = [
+        ' Entering Gaussian System, Link 0=g16\n',
+        ' %mem=5GB\n',
+        ' %nprocshared=16\n',
+        ' ----------------------------------------------------------------------\n',
+        ' #p opt=(calcfc,maxcycles=900) freq m062x/cc-pvtz scf=(maxcycle=900)\n',
+        ' ----------------------------------------------------------------------\n',
+    ]
+    step = [
+        '                         Standard orientation:\n',
+        ' ---------------------------------------------------------------------\n',
+        ' Center     Atomic      Atomic             Coordinates (Angstroms)\n',
+        ' Number     Number       Type             X           Y           Z\n',
+        ' ---------------------------------------------------------------------\n',
+    ] + [
+        f'      {j + 1}          6           0        {0.1 * j: .6f}    {0.2 * j: .6f}   {-0.1 * j: .6f}\n' for j in range(12)
+    ] + [
+        ' ---------------------------------------------------------------------\n',
+        f' SCF Done:  E(RM062X) =  {energy + 0.001:.9f}     A.U. after   12 cycles\n',
+        '         Item               Value     Threshold  Converged?\n',
+        ' Maximum Force            0.000123     0.000450     YES\n',
+        ' RMS     Force            0.000034     0.000300     YES\n',
+    ]
+    step_size = sum([len(line) for line in step])
+    n_steps = max(1, int(log_kb * 1024 / step_size))
+
+    lines = list(header)
+    for i in range(n_steps):
+        lines += step
+    if status == -1:
+        # killed partway through the optimization
+        return ''.join(lines)
+
+    if status in (0, 1):
+        lines += [
+            f' SCF Done:  E(RM062X) =  {energy:.9f}     A.U. after    1 cycles\n',
+            ' Harmonic frequencies (cm**-1), IR intensities (KM/Mole), Raman scattering\n',
+            ' Frequencies --    123.4567               234.5678               345.6789\n',
+            f' Sum of electronic and zero-point Energies=           {energy + 0.05:.6f}\n',
+            f' Sum of electronic and thermal Energies=              {energy + 0.055:.6f}\n',
+        ]
+    if status == 0:
+        lines += [
+            ' 1\\1\\GINC-C3001\\Freq\\RM062X\\CC-pVTZ\\C4H10\\HARRIS.SE\\\n',
+            ' Job cpu time:       0 days  3 hours 12 minutes 45.6 seconds.\n',
+            ' Elapsed time:       0 days  0 hours 12 minutes  3.4 seconds.\n',
+            ' Normal termination of Gaussian 16 at Tue Oct 18 12:34:56 2022.\n',
+        ]
+    elif status == 1:
+        lines += [
+            ' Error termination via Lnk1e in /shared/centos7/gaussian/g16/l9999.exe at Tue Oct 18 12:34:56 2022.\n',
+            ' Job cpu time:       0 days  3 hours 12 minutes 45.6 seconds.\n',
+        ]
+    elif status == 2:
+        lines += [
+            ' All variables have been frozen.\n',
+            ' Error termination via Lnk1e in /shared/centos7/gaussian/g16/l103.exe at Tue Oct 18 12:34:56 2022.\n',
+        ]
+    elif status == 3:
+        lines += [
+            ' Problem with the distance matrix.\n',
+            ' Error termination via Lnk1e in /shared/centos7/gaussian/g16/l202.exe at Tue Oct 18 12:34:56 2022.\n',
+        ]
+    return ''.join(lines)
+
+
+def make_templates(template_dir, log_kb, rng):
+    """Writes N_TEMPLATES logs for each termination status and returns {status: [paths]}
+    """
+    os.makedirs(template_dir, exist_ok=True)
+    templates = {}
+    for status in TERMINATION_MIX:
+        templates[status] = []
+        for k in range(N_TEMPLATES):
+            path = os.path.join(template_dir, f'status_{status}_{k}.log')
+            with open(path, 'w') as f:
+                f.write(make_log_text(status, -158.0 - rng.random(), log_kb))
+            templates[status].append(path)
+    return templates
+
+
+def pick_log(templates, rng):
+    status = rng.choices(list(TERMINATION_MIX.keys()), weights=list(TERMINATION_MIX.values()))[0]
+    return rng.choice(templates[status])
+
+
+def write_array_script(path, n_runs, name):
+    with open(path, 'w') as f:
+        f.write('#!/bin/bash\n')
+        f.write(f'#SBATCH --job-name={name}\n')
+        f.write('#SBATCH --partition=west,short\n')
+        f.write(f'#SBATCH --array=0-{n_runs - 1}%30\n')
+
+
+def make_species(dft_dir, species_index, templates, rng):
+    species_dir = os.path.join(dft_dir, 'thermo', f'species_{species_index:04}')
+    conformer_dir = os.path.join(species_dir, 'conformers')
+    os.makedirs(conformer_dir, exist_ok=True)
+    n_conformers = rng.randint(1, MAX_CONFORMERS)
+    write_array_script(os.path.join(conformer_dir, 'run.sh'), n_conformers, f'conformer_{species_index}')
+    for i in range(n_conformers):
+        open(os.path.join(conformer_dir, f'conformer_{i:04}.com'), 'w').close()
+        staging.stage_file(pick_log(templates, rng), os.path.join(conformer_dir, f'conformer_{i:04}.log'), mode='hardlink')
+
+    rotor_dir = os.path.join(species_dir, 'rotors')
+    os.makedirs(rotor_dir, exist_ok=True)
+    n_rotors = rng.randint(0, MAX_ROTORS)
+    if n_rotors == 0:
+        open(os.path.join(rotor_dir, 'NO_ROTORS.txt'), 'w').close()
+    else:
+        write_array_script(os.path.join(rotor_dir, 'run_rotor_calcs.sh'), n_rotors, f'rotor_{species_index}')
+        for i in range(n_rotors):
+            open(os.path.join(rotor_dir, f'rotor_{i:04}.com'), 'w').close()
+            staging.stage_file(pick_log(templates, rng), os.path.join(rotor_dir, f'rotor_{i:04}.log'), mode='hardlink')
+
+    if rng.random() < FRACTION_THERMO_DONE:
+        library_dir = os.path.join(species_dir, 'arkane', 'RMG_libraries')
+        os.makedirs(library_dir, exist_ok=True)
+        with open(os.path.join(library_dir, 'thermo.py'), 'w') as f:
+            f.write(f'name = "species_{species_index:04}"\n')
+
+
+def make_reaction(dft_dir, reaction_index, templates, rng):
+    reaction_dir = os.path.join(dft_dir, 'kinetics', f'reaction_{reaction_index:04}')
+    for stage in ['shell', 'overall']:
+        stage_dir = os.path.join(reaction_dir, stage)
+        os.makedirs(stage_dir, exist_ok=True)
+        for i in range(rng.randint(1, MAX_TS_RUNS)):
+            staging.stage_file(pick_log(templates, rng), os.path.join(stage_dir, f'fwd_ts_{i:04}.log'), mode='hardlink')
+
+
+def make_dft_dir(dft_dir, scale=1, log_kb=100, seed=0):
+    """Writes the fixture and returns (n_species, n_reactions)
+    """
+    rng = random.Random(seed)
+    n_species = int(N_SPECIES * scale)
+    n_reactions = int(N_REACTIONS * scale)
+    os.makedirs(dft_dir, exist_ok=True)
+    templates = make_templates(os.path.join(dft_dir, 'fixture_templates'), log_kb, rng)
+
+    species_smiles = [f'C{"C" * (i % 7)}[{i}CH2]' for i in range(n_species)]
+    with open(os.path.join(dft_dir, 'species_list.csv'), 'w') as f:
+        f.write(',i,name,SMILES,in_model\n')
+        for i, smiles in enumerate(species_smiles):
+            f.write(f'{i},{i},S{i}({i}),{smiles},True\n')
+    with open(os.path.join(dft_dir, 'reaction_list.csv'), 'w') as f:
+        f.write(',i,name,SMILES,in_model\n')
+        for i in range(n_reactions):
+            a, b, c, d = [rng.randrange(n_species) for k in range(4)]
+            name = f'S{a}({a}) + S{b}({b}) <=> S{c}({c}) + S{d}({d})'
+            smiles = f'{species_smiles[a]}+{species_smiles[b]}_{species_smiles[c]}+{species_smiles[d]}'
+            f.write(f'{i},{i},{name},{smiles},True\n')
+
+    for i in range(n_species):
+        make_species(dft_dir, i, templates, rng)
+    for i in range(n_reactions):
+        make_reaction(dft_dir, i, templates, rng)
+    return n_species, n_reactions
+
+
+if __name__ == '__main__':
+    output_dir = sys.argv[1]
+    scale = 1
+    if len(sys.argv) > 2:
+        scale = float(sys.argv[2])
+    log_kb = 100
+    if len(sys.argv) > 3:
+        log_kb = float(sys.argv[3])
+    n_species, n_reactions = make_dft_dir(output_dir, scale=scale, log_kb=log_kb)
+    print(f'Wrote {n_species} species and {n_reactions} reactions to {output_dir}')
@@ -0,0 +1,93 @@
+# Stand-ins for the chemistry packages so the workflow scripts can be benchmarked on machines
+# without the tst_env environment (laptops, CI)
+# Any module under STUBBED_PACKAGES that can't be imported is replaced by a MagicMock module,
+# so "import rmgpy.species" or "from hotbit import Hotbit" succeed and calls return mocks.
+# Real packages are always used when they are installed.
+#
+# Usage as a launcher: python stubs.py script.py [args]
+import os
+import sys
+import runpy
+import importlib.abc
+import importlib.util
+import importlib.machinery
+from unittest import mock
+
+
+STUBBED_PACKAGES = [
+    'numpy',
+    'pandas',
+    'rmgpy',
+    'arkane',
+    'autotst',
+    'ase',
+    'hotbit',
+    'rdkit',
+    'cclib',
+    'simtk',
+    'job_manager',
+]
+
+
+class StubLoader(importlib.abc.Loader):
+    def create_module(self, spec):
+        module = mock.MagicMock(name=spec.name)
+        module.__path__ = []  # so submodules can be imported from it
+        return module
+
+    def exec_module(self, module):
+        pass
+
+
+class StubFinder(importlib.abc.MetaPathFinder):
+    def __init__(self, packages):
+        self.packages = packages
+
+    def find_spec(self, fullname, path, target=None):
+        if fullname.split('.')[0] not in self.packages:
+            return None
+        return importlib.machinery.ModuleSpec(fullname, StubLoader(), is_package=True)
+
+
+def missing_packages(packages=STUBBED_PACKAGES):
+    """Returns the packages that aren't installed
+    """
+    missing = []
+    for package in packages:
+        spec = importlib.util.find_spec(package)
+        if spec is None or isinstance(spec.loader, StubLoader):
+            missing.append(package)
+    return missing
+
+
+def install(packages=None):
+    """Stubs out the missing packages and returns their names
+    """
+    if packages is None:
+        packages = missing_packages()
+    if packages:
+        # append so anything that is installed is still found first
+        sys.meta_path.append(StubFinder(packages))
+    return packages
+
+
+def run_script(argv):
+    """Runs a script as __main__, like python would, and returns the exit code
+    """
+    script = os.path.abspath(argv[0])
+    sys.argv = [script] + argv[1:]
+    sys.path[0] = os.path.dirname(script)
+    try:
+        runpy.run_path(script, run_name='__main__')
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        return e.code if isinstance(e.code, int) else 1
+    return 0
+
+
+if __name__ == '__main__':
+    install()
+    # everything imported after this marker belongs to the script (see bench_startup.py)
+    print('BENCH_START', file=sys.stderr, flush=True)
+    exit(run_script(sys.argv[1:]))
@@ -0,0 +1,32 @@
+# The bench_status.py sweeps under pytest-benchmark, one benchmark per function and scale
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+import bench_status
+
+
+SWEEP_NAMES = [
+    'job.termination_status',
+    'kineticfun.termination_status',
+    'job.incomplete_conformers',
+    'job.incomplete_rotors',
+    'job.get_lowest_conformer',
+    'kineticfun.shell_complete',
+    'kineticfun.overall_complete',
+    'collect_species',
+]
+
+
+@pytest.mark.parametrize('name', SWEEP_NAMES)
+def test_sweep(benchmark, campaign, name):
+    if name not in campaign['sweeps']:
+        pytest.skip(f'{name} needs the real pandas')
+    function, items = campaign['sweeps'][name]
+    benchmark.extra_info['n_calls'] = len(items)
+
+    def setup():
+        bench_status.reset_state_db()
+        return (function, items), {}
+
+    benchmark.pedantic(bench_status.sweep, setup=setup, rounds=3, iterations=1)
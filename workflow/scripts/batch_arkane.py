@@ -0,0 +1,107 @@
+# Runs many Arkane input directories in one Python process
+# Importing RMG/Arkane takes much longer than a typical thermo or kinetics job, so Arkane is
+# imported once and the jobs are run one after another or in a process pool (forked workers
+# inherit the imported modules).
+#
+# Usage: python batch_arkane.py n_procs [arkane_dir ...]
+# With no directories given, runs every thermo and kinetics arkane directory
+# that has an input.py but no RMG_libraries output yet
+import os
+import sys
+import glob
+import time
+import logging
+import traceback
+import multiprocessing
+
+import pandas as pd
+
+from arkane.main import Arkane
+
+
+try:
+    DFT_DIR = os.environ['DFT_DIR']
+except KeyError:
+    DFT_DIR = "/work/westgroup/harris.se/autoscience/autoscience/butane/dft"
+
+
+def get_arkane_result(arkane_dir):
+    """Path to the RMG library file a finished Arkane job in this directory writes
+    """
+    if os.path.basename(os.path.dirname(os.path.dirname(os.path.abspath(arkane_dir)))) == 'kinetics':
+        return os.path.join(arkane_dir, 'RMG_libraries', 'reactions.py')
+    return os.path.join(arkane_dir, 'RMG_libraries', 'thermo.py')
+
+
+def get_pending_arkane_dirs():
+    """Returns every thermo and kinetics arkane directory with an input file and no result
+    """
+    arkane_dirs = sorted(glob.glob(os.path.join(DFT_DIR, 'thermo', 'species_*', 'arkane'))) + \
+        sorted(glob.glob(os.path.join(DFT_DIR, 'kinetics', 'reaction_*', 'arkane')))
+    return [
+        arkane_dir for arkane_dir in arkane_dirs
+        if os.path.exists(os.path.join(arkane_dir, 'input.py')) and not os.path.exists(get_arkane_result(arkane_dir))
+    ]
+
+
+def run_arkane(arkane_dir):
+    """Runs the input.py in one arkane directory, same as python Arkane.py input.py
+    Returns a dictionary describing how it went
+    """
+    arkane_dir = os.path.abspath(arkane_dir)
+    start = time.time()
+    start_dir = os.getcwd()
+    result = {'arkane_dir': arkane_dir, 'success': False, 'duration': 0.0, 'error': ''}
+    try:
+        # relative Log() paths in the input file are resolved from the input directory
+        os.chdir(arkane_dir)
+        # execute() loads arkane.input_file itself, loading it here too would parse it twice
+        arkane = Arkane(input_file=os.path.join(arkane_dir, 'input.py'), output_directory=arkane_dir)
+        arkane.execute()
+        result['success'] = os.path.exists(get_arkane_result(arkane_dir))
+        if not result['success']:
+            result['error'] = 'no RMG library written'
+    except Exception:
+        result['error'] = traceback.format_exc().strip().splitlines()[-1]
+        with open(os.path.join(arkane_dir, 'batch_arkane_error.log'), 'w') as f:
+            f.write(traceback.format_exc())
+    finally:
+        os.chdir(start_dir)
+        # Arkane adds a log file handler for every job, so remove them before the next one
+        for handler in logging.getLogger().handlers[:]:
+            if isinstance(handler, logging.FileHandler):
+                logging.getLogger().removeHandler(handler)
+                handler.close()
+    result['duration'] = time.time() - start
+    return result
+
+
+def run_batch(arkane_dirs, n_procs=1):
+    """Runs all of the arkane directories and returns a DataFrame with one row per job
+    """
+    if n_procs > 1 and len(arkane_dirs) > 1:
+        with multiprocessing.Pool(processes=n_procs) as pool:
+            # chunksize 1 so one slow kinetics job doesn't hold up a whole chunk
+            results = pool.map(run_arkane, arkane_dirs, chunksize=1)
+    else:
+        results = [run_arkane(arkane_dir) for arkane_dir in arkane_dirs]
+    return pd.DataFrame(results, columns=['arkane_dir', 'success', 'duration', 'error'])
+
+
+if __name__ == '__main__':
+    n_procs = 1
+    if len(sys.argv) > 1:
+        n_procs = int(sys.argv[1])
+    arkane_dirs = sys.argv[2:]
+    if not arkane_dirs:
+        arkane_dirs = get_pending_arkane_dirs()
+    print(f'Running {len(arkane_dirs)} Arkane jobs on {n_procs} processes')
+
+    results = run_batch(arkane_dirs, n_procs=n_procs)
+    for _, row in results.iterrows():
+        print(f"{'done' if row['success'] else 'FAILED'} {row['arkane_dir']} {row['duration']:.1f}s {row['error']}")
+    print(f"{results['success'].sum()} of {len(results)} Arkane jobs succeeded")
+    if len(sys.argv) <= 2:
+        results.to_csv(os.path.join(DFT_DIR, 'batch_arkane_results.csv'), index=False)
+    if not results['success'].all():
+        exit(1)
@@ -0,0 +1,212 @@
+# Merges the Arkane results for every species and reaction into one RMG thermo library,
+# one RMG kinetics library, and a Chemkin file
+# The parsed entries are cached with the modification time of their RMG_libraries file,
+# so each run only reads the Arkane outputs that are new or have changed.
+#
+# DFT_DIR/libraries/thermo/autoscience.py
+# DFT_DIR/libraries/kinetics/autoscience/reactions.py and dictionary.txt
+# DFT_DIR/libraries/chemkin/chem_annotated.inp and species_dictionary.txt
+#
+# Usage: python build_libraries.py [library_name]
+import os
+import sys
+import glob
+import pickle
+
+import pandas as pd
+
+import rmgpy.chemkin
+import rmgpy.species
+import rmgpy.reaction
+import rmgpy.data.base
+import rmgpy.data.thermo
+import rmgpy.data.kinetics
+
+
+try:
+    DFT_DIR = os.environ['DFT_DIR']
+except KeyError:
+    DFT_DIR = "/work/westgroup/harris.se/autoscience/autoscience/butane/dft"
+
+LIBRARY_DIR = os.path.join(DFT_DIR, 'libraries')
+CACHE_FILE = os.path.join(LIBRARY_DIR, 'library_cache.pickle')
+
+
+def load_cache(cache_file=CACHE_FILE):
+    """Returns {"thermo": {RMG_libraries file: (mtime_ns, entries)}, "kinetics": {...}} from the last run
+    """
+    if not os.path.exists(cache_file):
+        return {}
+    try:
+        with open(cache_file, 'rb') as f:
+            return pickle.load(f)
+    except (pickle.UnpicklingError, EOFError, AttributeError):
+        print('Library cache is unreadable, rebuilding from scratch')
+        return {}
+
+
+def save_cache(cache, cache_file=CACHE_FILE):
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    with open(cache_file + '.tmp', 'wb') as f:
+        pickle.dump(cache, f)
+    os.replace(cache_file + '.tmp', cache_file)
+
+
+def read_thermo_entries(thermo_file):
+    """Parses one Arkane RMG_libraries/thermo.py and returns its entries
+    """
+    database = rmgpy.data.thermo.ThermoDatabase()
+    library = rmgpy.data.thermo.ThermoLibrary()
+    library.load(thermo_file, database.local_context, database.global_context)
+    return list(library.entries.values())
+
+
+def read_kinetics_entries(reactions_file):
+    """Parses one Arkane RMG_libraries/reactions.py (and the dictionary.txt next to it)
+    """
+    database = rmgpy.data.kinetics.KineticsDatabase()
+    library = rmgpy.data.kinetics.KineticsLibrary()
+    library.load(reactions_file, database.local_context, database.global_context)
+    return list(library.entries.values())
+
+
+def update_entries(cache, result_files, read_function):
+    """Parses the result files that are new or have changed since they were cached
+    Returns the number of files parsed or removed
+    """
+    n_changed = 0
+    for result_file in result_files:
+        mtime_ns = os.stat(result_file).st_mtime_ns
+        if result_file in cache and cache[result_file][0] == mtime_ns:
+            continue
+        try:
+            cache[result_file] = (mtime_ns, read_function(result_file))
+            n_changed += 1
+        except Exception as e:
+            print(f'Failed to read {result_file}: {e}')
+    # forget results that have been deleted
+    for result_file in [f for f in cache if f not in result_files]:
+        cache.pop(result_file)
+        n_changed += 1
+    return n_changed
+
+
+def get_species_index(thermo_file):
+    # .../thermo/species_XXXX/arkane/RMG_libraries/thermo.py
+    return int(thermo_file.split(os.sep)[-4][-4:])
+
+
+def get_reaction_index(reactions_file):
+    # .../kinetics/reaction_XXXX/arkane/RMG_libraries/reactions.py
+    return int(reactions_file.split(os.sep)[-4][-4:])
+
+
+def build_thermo_library(thermo_cache, library_name):
+    """Makes one thermo library from the cached entries, labeled with the names in species_list.csv
+    Arkane labels each species with its formula, which isn't unique across species
+    """
+    species_df = pd.read_csv(os.path.join(DFT_DIR, 'species_list.csv'))
+    library = rmgpy.data.thermo.ThermoLibrary(name=library_name)
+    library.label = library_name
+    for thermo_file in sorted(thermo_cache, key=get_species_index):
+        species_index = get_species_index(thermo_file)
+        for entry in thermo_cache[thermo_file][1]:
+            label = str(species_df['name'].values[species_index])
+            library.entries[label] = rmgpy.data.base.Entry(
+                index=species_index,
+                label=label,
+                item=entry.item,
+                data=entry.data,
+                short_desc=entry.short_desc,
+                long_desc=f'species_{species_index:04}\n' + entry.long_desc.strip(),
+            )
+    return library
+
+
+def build_kinetics_library(kinetics_cache, library_name):
+    """Makes one kinetics library from the cached entries, indexed by reaction index
+    """
+    library = rmgpy.data.kinetics.KineticsLibrary(name=library_name)
+    library.label = library_name
+    for reactions_file in sorted(kinetics_cache, key=get_reaction_index):
+        reaction_index = get_reaction_index(reactions_file)
+        for entry in kinetics_cache[reactions_file][1]:
+            entry.index = reaction_index
+            library.entries[reaction_index] = entry
+    return library
+
+
+def export_chemkin(thermo_library, kinetics_library, chemkin_dir):
+    """Writes the species with thermo and the reactions whose species all have thermo to Chemkin
+    """
+    species_list = []
+    for entry in thermo_library.entries.values():
+        sp = rmgpy.species.Species(label=entry.label, molecule=[entry.item], thermo=entry.data)
+        species_list.append(sp)
+
+    def get_species(molecule):
+        for sp in species_list:
+            if sp.is_isomorphic(molecule):
+                return sp
+        return None
+
+    reaction_list = []
+    for entry in kinetics_library.entries.values():
+        reaction = entry.item
+        reactants = [get_species(sp.molecule[0]) for sp in reaction.reactants]
+        products = [get_species(sp.molecule[0]) for sp in reaction.products]
+        if None in reactants + products:
+            print(f'Leaving reaction {entry.index} {reaction} out of Chemkin file, missing thermo')
+            continue
+        reaction_list.append(rmgpy.reaction.Reaction(
+            reactants=reactants,
+            products=products,
+            kinetics=entry.data,
+            reversible=reaction.reversible,
+        ))
+
+    os.makedirs(chemkin_dir, exist_ok=True)
+    rmgpy.chemkin.save_chemkin_file(os.path.join(chemkin_dir, 'chem_annotated.inp'), species_list, reaction_list)
+    rmgpy.chemkin.save_species_dictionary(os.path.join(chemkin_dir, 'species_dictionary.txt'), species_list)
+    return len(species_list), len(reaction_list)
+
+
+def build_libraries(library_name='autoscience'):
+    cache = load_cache()
+    thermo_cache = cache.get('thermo', {})
+    kinetics_cache = cache.get('kinetics', {})
+
+    thermo_files = sorted(glob.glob(os.path.join(DFT_DIR, 'thermo', 'species_*', 'arkane', 'RMG_libraries', 'thermo.py')))
+    reactions_files = sorted(glob.glob(os.path.join(DFT_DIR, 'kinetics', 'reaction_*', 'arkane', 'RMG_libraries', 'reactions.py')))
+    n_thermo = update_entries(thermo_cache, thermo_files, read_thermo_entries)
+    n_kinetics = update_entries(kinetics_cache, reactions_files, read_kinetics_entries)
+    print(f'{n_thermo} thermo results and {n_kinetics} kinetics results changed')
+
+    thermo_library_file = os.path.join(LIBRARY_DIR, 'thermo', f'{library_name}.py')
+    kinetics_library_file = os.path.join(LIBRARY_DIR, 'kinetics', library_name, 'reactions.py')
+    if n_thermo + n_kinetics == 0 and os.path.exists(thermo_library_file) and os.path.exists(kinetics_library_file):
+        print('Libraries are up to date')
+        return
+
+    thermo_library = build_thermo_library(thermo_cache, library_name)
+    os.makedirs(os.path.dirname(thermo_library_file), exist_ok=True)
+    thermo_library.save(thermo_library_file)
+
+    kinetics_library = build_kinetics_library(kinetics_cache, library_name)
+    os.makedirs(os.path.dirname(kinetics_library_file), exist_ok=True)
+    kinetics_library.save(kinetics_library_file)
+    kinetics_library.save_dictionary(os.path.join(os.path.dirname(kinetics_library_file), 'dictionary.txt'))
+
+    n_species, n_reactions = export_chemkin(thermo_library, kinetics_library, os.path.join(LIBRARY_DIR, 'chemkin'))
+    print(f'Wrote {len(thermo_library.entries)} thermo entries and {len(kinetics_library.entries)} kinetics entries')
+    print(f'Chemkin file has {n_species} species and {n_reactions} reactions')
+
+    # save the cache last so a failed export gets redone next time
+    save_cache({'thermo': thermo_cache, 'kinetics': kinetics_cache})
+
+
+if __name__ == '__main__':
+    library_name = 'autoscience'
+    if len(sys.argv) > 1:
+        library_name = sys.argv[1]
+    build_libraries(library_name)
@@ -0,0 +1,441 @@
+# Campaign throughput report: where the core-hours and wall time of a campaign go
+# Joins SLURM accounting (sacct) with the directory state of every species and reaction and the
+# stage events from events.py. Only file names and modification times are looked at - the Gaussian
+# logs are not read again.
+#
+# Writes to output_dir:
+#   stage_usage.csv       per stage: jobs, core-hours, queue wait percentiles, restart rate and
+#                         the time the drivers spent waiting on their jobs
+#   queue_wait.csv        number of jobs per stage in each queue wait bucket
+#   completions.csv       species thermo and reaction kinetics finished per day
+#   critical_path.csv     species without thermo, ranked by the number of unfinished reactions they block
+#   campaign_report.html  all of the above
+#
+# Usage: python campaign_report.py [output_dir] [sacct_file]
+# sacct_file is saved sacct output (or a stand-in with the same columns), made with
+#   sacct -P -X -S <campaign start> -o JobID,JobName,Comment,State,Submit,Start,End,ElapsedRaw,AllocCPUS
+# Without it, sacct is run for jobs since SACCT_START (default 2022-01-01)
+import os
+import re
+import sys
+import csv
+import html
+import time
+import datetime
+import statistics
+import subprocess
+
+import model_lists
+import events
+
+
+try:
+    DFT_DIR = os.environ['DFT_DIR']
+except KeyError:
+    DFT_DIR = "/work/westgroup/harris.se/autoscience/autoscience/butane/dft"
+
+SACCT_FIELDS = ['JobID', 'JobName', 'Comment', 'State', 'Submit', 'Start', 'End', 'ElapsedRaw', 'AllocCPUS']
+
+# job names set by species_thermo.py, species_rotors.py, refine_rotors.py, job.py and kineticfun.py
+JOB_NAME_REGEX = re.compile(r'g16_(cf|rotors_refine|rotors?|shell_restart|shell|center|overall|irc)_(\d+)$')
+JOB_NAME_STAGES = {
+    'cf': ('species', 'conformers'),
+    'rotor': ('species', 'rotors'),
+    'rotors': ('species', 'rotors'),
+    'rotors_refine': ('species', 'rotors'),
+    'shell': ('reaction', 'shell'),
+    'shell_restart': ('reaction', 'shell'),
+    'center': ('reaction', 'center'),
+    'overall': ('reaction', 'overall'),
+    'irc': ('reaction', 'irc'),
+}
+
+# the Snakemake SLURM executor names jobs after the run and puts the rule in the comment
+COMMENT_REGEX = re.compile(r'rule_(\w+?)_wildcards_(\d+)')
+RULE_STAGES = {
+    'conformer_inputs': ('species', 'conformer_search'),
+    'g16_conformer': ('species', 'conformers'),
+    'g16_rotor': ('species', 'rotors'),
+    'arkane_thermo': ('species', 'arkane'),
+    'ts_search': ('reaction', 'ts_driver'),  # run_ts.py, which submits the Gaussian jobs and waits
+    'arkane_kinetics': ('reaction', 'arkane'),
+}
+
+SPECIES_STAGES = ['conformer_search', 'conformers', 'rotors', 'arkane']
+REACTION_STAGES = ['ts_driver', 'shell', 'center', 'overall', 'irc', 'arkane']
+# stages that write a restart.sh when jobs have to be resubmitted
+RESTART_STAGES = {'species': ['conformers', 'rotors'], 'reaction': ['shell', 'center', 'overall']}
+
+# upper edges in hours
+QUEUE_WAIT_BUCKETS = [(1 / 6, '<10min'), (1, '<1h'), (6, '<6h'), (24, '<1d'), (72, '<3d'), (float('inf'), '>=3d')]
+
+
+def parse_time(time_str):
+    """Seconds since the epoch for a sacct timestamp, or None for Unknown/None
+    """
+    try:
+        return datetime.datetime.fromisoformat(time_str).timestamp()
+    except ValueError:
+        return None
+
+
+def classify_job(job_name, comment):
+    """Returns (kind, index, stage, restart) for a SLURM job, or None if it isn't a workflow job
+    """
+    match = JOB_NAME_REGEX.match(job_name)
+    if match:
+        kind, stage = JOB_NAME_STAGES[match.group(1)]
+        return kind, int(match.group(2)), stage, 'restart' in match.group(1)
+    match = COMMENT_REGEX.match(comment)
+    if match and match.group(1) in RULE_STAGES:
+        kind, stage = RULE_STAGES[match.group(1)]
+        return kind, int(match.group(2)), stage, False
+    return None
+
+
+def read_sacct(sacct_file=None, start_date=None):
+    """Returns a list of dictionaries, one per workflow job (each array task is a job)
+    Reads saved sacct -P output if sacct_file is given, otherwise runs sacct
+    """
+    if sacct_file:
+        with open(sacct_file, 'r') as f:
+            lines = f.read().splitlines()
+    else:
+        if start_date is None:
+            start_date = os.environ.get('SACCT_START', '2022-01-01')
+        cmd = ['sacct', '-P', '-X', '-S', start_date, '-o', ','.join(SACCT_FIELDS)]
+        try:
+            proc = subprocess.run(cmd, capture_output=True, text=True)
+        except FileNotFoundError:
+            print('sacct not found, reporting without SLURM accounting')
+            return []
+        lines = proc.stdout.splitlines()
+
+    if not lines:
+        return []
+    header = lines[0].split('|')
+    jobs = []
+    for line in lines[1:]:
+        record = dict(zip(header, line.split('|')))
+        job = classify_job(record.get('JobName', ''), record.get('Comment', ''))
+        if job is None:
+            continue
+        submit = parse_time(record['Submit'])
+        start = parse_time(record['Start'])
+        end = parse_time(record['End'])
+        if submit is None or start is None:
+            continue  # still pending
+        elapsed = int(record['ElapsedRaw'] or 0)
+        kind, index, stage, restart = job
+        jobs.append({
+            'job_id': record['JobID'],
+            'kind': kind,
+            'index': index,
+            'stage': stage,
+            'restart': restart,
+            'state': record['State'].split()[0],  # 'CANCELLED by 123' -> 'CANCELLED'
+            'submit': submit,
+            'start': start,
+            'end': end,
+            'core_hours': elapsed * int(record['AllocCPUS'] or 0) / 3600.0,
+            'queue_wait': (start - submit) / 3600.0,
+        })
+    return jobs
+
+
+def get_mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def get_species_state(species_index):
+    """Stage of one species from which files exist, plus when its thermo finished
+    """
+    species_dir = os.path.join(DFT_DIR, 'thermo', f'species_{species_index:04}')
+    conformer_dir = os.path.join(species_dir, 'conformers')
+    rotor_dir = os.path.join(species_dir, 'rotors')
+    state = {
+        'index': species_index,
+        'done': get_mtime(os.path.join(species_dir, 'arkane', 'RMG_libraries', 'thermo.py')),
+        'restarted': {
+            'conformers': os.path.exists(os.path.join(conformer_dir, 'restart.sh')),
+            'rotors': os.path.exists(os.path.join(rotor_dir, 'restart.sh')),
+        },
+        'started': {
+            'conformers': os.path.exists(os.path.join(conformer_dir, 'run.sh')),
+            'rotors': os.path.exists(os.path.join(rotor_dir, 'run_rotor_calcs.sh')) or
+            os.path.exists(os.path.join(rotor_dir, 'NO_ROTORS.txt')),
+        },
+    }
+    if state['done']:
+        state['stage'] = 'complete'
+    elif os.path.exists(os.path.join(rotor_dir, 'rotors.done')) or os.path.exists(os.path.join(rotor_dir, 'NO_ROTORS.txt')):
+        state['stage'] = 'arkane'
+    elif os.path.exists(os.path.join(rotor_dir, 'lowest_conformer.txt')) or os.path.exists(os.path.join(conformer_dir, 'conformers.done')):
+        state['stage'] = 'rotors'
+    elif state['started']['conformers']:
+        state['stage'] = 'conformers'
+    else:
+        state['stage'] = 'conformer_search'
+    return state
+
+
+def get_reaction_state(reaction_index):
+    reaction_dir = os.path.join(DFT_DIR, 'kinetics', f'reaction_{reaction_index:04}')
+    state = {
+        'index': reaction_index,
+        'done': get_mtime(os.path.join(reaction_dir, 'arkane', 'RMG_libraries', 'reactions.py')),
+        'restarted': {},
+        'started': {},
+    }
+    for stage in ['shell', 'center', 'overall']:
+        stage_dir = os.path.join(reaction_dir, stage)
+        state['started'][stage] = os.path.isdir(stage_dir)
+        state['restarted'][stage] = os.path.exists(os.path.join(stage_dir, 'restart.sh'))
+    return state
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile, None for an empty list
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def get_stage_usage(jobs, species_states, reaction_states, event_list):
+    """One row per (kind, stage) with the SLURM usage, restarts and driver waiting time
+    """
+    # time the drivers (job.py, kineticfun.py) spent waiting on submitted jobs, from wait_for_job
+    driver_wait = {}
+    restart_events = set()
+    for event in event_list:
+        key = (event['kind'], event['stage'])
+        if event['event'] == 'job_finished':
+            driver_wait[key] = driver_wait.get(key, 0.0) + event.get('duration', 0.0) / 3600.0
+        elif event['event'] == 'restart_start':
+            restart_events.add((event['kind'], event['stage'], event['index']))
+
+    rows = []
+    for kind, stages, states in [
+        ('species', SPECIES_STAGES, species_states),
+        ('reaction', REACTION_STAGES, reaction_states),
+    ]:
+        for stage in stages:
+            stage_jobs = [job for job in jobs if job['kind'] == kind and job['stage'] == stage]
+            queue_waits = [job['queue_wait'] for job in stage_jobs]
+            row = {
+                'kind': kind,
+                'stage': stage,
+                'jobs': len(stage_jobs),
+                'failed_jobs': len([job for job in stage_jobs if job['state'] not in ('COMPLETED', 'RUNNING')]),
+                'core_hours': sum([job['core_hours'] for job in stage_jobs]),
+                'queue_wait_p50_h': percentile(queue_waits, 0.5),
+                'queue_wait_p90_h': percentile(queue_waits, 0.9),
+                'queue_wait_max_h': max(queue_waits) if queue_waits else None,
+                'driver_wait_h': driver_wait.get((kind, stage), 0.0),
+            }
+            if stage in RESTART_STAGES[kind]:
+                started = [state for state in states if state['started'][stage]]
+                restarted = [
+                    state for state in started
+                    if state['restarted'][stage] or (kind, stage, state['index']) in restart_events
+                ]
+                row['items_started'] = len(started)
+                row['items_restarted'] = len(restarted)
+                row['restart_rate'] = len(restarted) / len(started) if started else None
+            rows.append(row)
+    return rows
+
+
+def get_queue_wait_histogram(jobs):
+    rows = []
+    for kind, stages in [('species', SPECIES_STAGES), ('reaction', REACTION_STAGES)]:
+        for stage in stages:
+            row = {'kind': kind, 'stage': stage}
+            for upper, label in QUEUE_WAIT_BUCKETS:
+                row[label] = 0
+            for job in jobs:
+                if job['kind'] != kind or job['stage'] != stage:
+                    continue
+                for upper, label in QUEUE_WAIT_BUCKETS:
+                    if job['queue_wait'] < upper:
+                        row[label] += 1
+                        break
+            rows.append(row)
+    return rows
+
+
+def get_completions_per_day(species_states, reaction_states):
+    counts = {}
+    for key, states in [('species', species_states), ('reactions', reaction_states)]:
+        for state in states:
+            if state['done']:
+                day = time.strftime('%Y-%m-%d', time.localtime(state['done']))
+                counts.setdefault(day, {'species': 0, 'reactions': 0})[key] += 1
+    rows = []
+    total_species = 0
+    total_reactions = 0
+    for day in sorted(counts):
+        total_species += counts[day]['species']
+        total_reactions += counts[day]['reactions']
+        rows.append({
+            'date': day,
+            'species': counts[day]['species'],
+            'reactions': counts[day]['reactions'],
+            'species_total': total_species,
+            'reactions_total': total_reactions,
+        })
+    return rows
+
+
+def get_stage_durations(jobs):
+    """Median wall time in hours from first submission to last job end of each species stage
+    """
+    spans = {}
+    for job in jobs:
+        if job['kind'] != 'species' or job['end'] is None:
+            continue
+        key = (job['stage'], job['index'])
+        first, last = spans.get(key, (job['submit'], job['end']))
+        spans[key] = (min(first, job['submit']), max(last, job['end']))
+    durations = {}
+    for (stage, index), (first, last) in spans.items():
+        durations.setdefault(stage, []).append((last - first) / 3600.0)
+    return {stage: statistics.median(values) for stage, values in durations.items()}
+
+
+def get_critical_path(species_states, reaction_states, jobs):
+    """Species without thermo, ranked by how many unfinished reactions are waiting on them
+    Also estimates how long each needs to finish from the median time of its remaining stages
+    """
+    species_list = model_lists.read_list(os.path.join(DFT_DIR, 'species_list.csv'))
+    reaction_list = model_lists.read_list(os.path.join(DFT_DIR, 'reaction_list.csv'))
+    smiles2species = {row['SMILES']: row['i'] for row in species_list}
+    species_by_index = {state['index']: state for state in species_states}
+    reaction_done = {state['index']: state['done'] for state in reaction_states}
+
+    blocked = {}
+    for row in reaction_list:
+        if reaction_done.get(row['i']):
+            continue
+        reactants, products = row['SMILES'].split('_')
+        for smiles in set(reactants.split('+') + products.split('+')):
+            species_index = smiles2species.get(smiles)
+            if species_index is None or species_by_index[species_index]['done']:
+                continue
+            blocked.setdefault(species_index, []).append(row['i'])
+
+    stage_durations = get_stage_durations(jobs)
+    rows = []
+    for species_index, reactions in blocked.items():
+        stage = species_by_index[species_index]['stage']
+        remaining = SPECIES_STAGES[SPECIES_STAGES.index(stage):]
+        rows.append({
+            'species_index': species_index,
+            'smiles': species_list[species_index]['SMILES'],
+            'reactions_blocked': len(reactions),
+            'stage': stage,
+            'estimated_hours_left': sum([stage_durations.get(s, 0.0) for s in remaining]),
+        })
+    rows.sort(key=lambda row: (-row['reactions_blocked'], -row['estimated_hours_left']))
+    return rows
+
+
+def format_value(value):
+    if isinstance(value, float):
+        return f'{value:.2f}'
+    if value is None:
+        return ''
+    return str(value)
+
+
+def write_csv(rows, path):
+    columns = list(rows[0].keys()) if rows else []
+    for row in rows:
+        columns += [key for key in row if key not in columns]
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({key: format_value(value) for key, value in row.items()})
+    return path
+
+
+def html_table(rows):
+    if not rows:
+        return '<p>none</p>\n'
+    columns = list(rows[0].keys())
+    for row in rows:
+        columns += [key for key in row if key not in columns]
+    lines = ['<table>', '<tr>' + ''.join([f'<th>{html.escape(column)}</th>' for column in columns]) + '</tr>']
+    for row in rows:
+        lines.append('<tr>' + ''.join([f'<td>{html.escape(format_value(row.get(column)))}</td>' for column in columns]) + '</tr>')
+    lines.append('</table>')
+    return '\n'.join(lines) + '\n'
+
+
+def write_html(sections, path):
+    with open(path, 'w') as f:
+        f.write('<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>Campaign report</title>\n')
+        f.write('<style>body{font-family:sans-serif} table{border-collapse:collapse;margin-bottom:2em} '
+                'td,th{border:1px solid #ccc;padding:2px 8px;text-align:right}</style></head><body>\n')
+        f.write(f'<h1>Campaign report</h1>\n<p>{html.escape(DFT_DIR)}, {time.strftime("%Y-%m-%d %H:%M")}</p>\n')
+        for title, summary, rows in sections:
+            f.write(f'<h2>{html.escape(title)}</h2>\n')
+            if summary:
+                f.write(f'<p>{html.escape(summary)}</p>\n')
+            f.write(html_table(rows))
+        f.write('</body></html>\n')
+    return path
+
+
+if __name__ == '__main__':
+    output_dir = DFT_DIR
+    if len(sys.argv) > 1:
+        output_dir = sys.argv[1]
+    sacct_file = None
+    if len(sys.argv) > 2:
+        sacct_file = sys.argv[2]
+    os.makedirs(output_dir, exist_ok=True)
+
+    jobs = read_sacct(sacct_file)
+    species_states = [
+        get_species_state(row['i']) for row in model_lists.read_list(os.path.join(DFT_DIR, 'species_list.csv'))
+    ]
+    reaction_states = [
+        get_reaction_state(row['i']) for row in model_lists.read_list(os.path.join(DFT_DIR, 'reaction_list.csv'))
+    ]
+    event_list = events.read_events()
+
+    stage_usage = get_stage_usage(jobs, species_states, reaction_states, event_list)
+    queue_wait = get_queue_wait_histogram(jobs)
+    completions = get_completions_per_day(species_states, reaction_states)
+    critical_path = get_critical_path(species_states, reaction_states, jobs)
+
+    total_core_hours = sum([job['core_hours'] for job in jobs])
+    critical_summary = ''
+    if critical_path:
+        longest = max(critical_path, key=lambda row: row['estimated_hours_left'])
+        critical_summary = (
+            f"{len(critical_path)} species without thermo are blocking kinetics. Slowest to finish: "
+            f"species {longest['species_index']} ({longest['smiles']}) at {longest['stage']}, "
+            f"about {longest['estimated_hours_left']:.1f} h left"
+        )
+
+    print(write_csv(stage_usage, os.path.join(output_dir, 'stage_usage.csv')))
+    print(write_csv(queue_wait, os.path.join(output_dir, 'queue_wait.csv')))
+    print(write_csv(completions, os.path.join(output_dir, 'completions.csv')))
+    print(write_csv(critical_path, os.path.join(output_dir, 'critical_path.csv')))
+    print(write_html([
+        ('Usage by stage', f'{len(jobs)} jobs, {total_core_hours:.1f} core-hours', stage_usage),
+        ('Queue wait (jobs per bucket)', '', queue_wait),
+        ('Completions per day', '', completions),
+        ('Critical path to kinetics', critical_summary, critical_path),
+    ], os.path.join(output_dir, 'campaign_report.html')))
+    print(f'{len(jobs)} jobs, {total_core_hours:.1f} core-hours')
+    if critical_summary:
+        print(critical_summary)
@@ -0,0 +1,251 @@
+# Functions to collect the state of every species and reaction in one sweep of DFT_DIR
+# Usage: python campaign_status.py [output_dir]
+# writes species_status and reaction_status tables (parquet if pyarrow is installed, otherwise csv)
+import os
+import sys
+import json
+
+import pandas as pd
+
+import gaussian_log
+
+
+try:
+    DFT_DIR = os.environ['DFT_DIR']
+except KeyError:
+    DFT_DIR = "/work/westgroup/harris.se/autoscience/autoscience/butane/dft"
+
+STATUS_CACHE_FILE = os.path.join(DFT_DIR, 'log_status_cache.json')
+
+# kineticfun.shell_complete and overall_complete rerun logs that ended in a generic Error termination,
+# only the errors 2-5 count as finished
+KINETICS_RERUN_STATUSES = [1]
+
+
+class LogStatusCache():
+    """Termination status of every log file seen so far, keyed by path
+    An entry is reused as long as the size and modification time of the log haven't changed
+    """
+    def __init__(self, cache_file=STATUS_CACHE_FILE):
+        self.cache_file = cache_file
+        self.entries = {}
+        self.changed = False
+        if cache_file and os.path.exists(cache_file):
+            try:
+                with open(cache_file, 'r') as f:
+                    self.entries = json.load(f)
+            except ValueError:
+                self.entries = {}
+
+    def get_status(self, entry):
+        """Takes an os.DirEntry for a log file and returns its termination status
+        """
+        stat = entry.stat()
+        cached = self.entries.get(entry.path)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime:
+            return cached[2]
+        status = gaussian_log.termination_status(entry.path)
+        self.entries[entry.path] = [stat.st_size, stat.st_mtime, status]
+        self.changed = True
+        return status
+
+    def save(self):
+        if not self.cache_file or not self.changed:
+            return
+        tmp_file = self.cache_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_file, self.cache_file)
+        self.changed = False
+
+
+def scan_dir(path):
+    """Returns {filename: os.DirEntry} for a directory, or {} if it doesn't exist
+    """
+    try:
+        with os.scandir(path) as it:
+            return {entry.name: entry for entry in it}
+    except (FileNotFoundError, NotADirectoryError):
+        return {}
+
+
+def get_array_size(slurm_array_file):
+    """Number of tasks a SLURM array script was meant to run, like job.get_n_runs
+    """
+    with open(slurm_array_file, 'r') as f:
+        for line in f:
+            if 'SBATCH --array=' in line:
+                array_str = line.split('--array=')[-1].split('%')[0].strip()
+                return 1 + max([int(token.split('-')[-1]) for token in array_str.split(',')])
+    return 0
+
+
+def read_flag_file(path):
+    """Returns the stripped contents of a small result file like irc_result.txt, or None
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return f.read().strip()
+
+
+def count_statuses(entries, prefix, cache, rerun_statuses=()):
+    """Counts the finished and unfinished Gaussian logs in one directory listing
+    Logs with a status in rerun_statuses terminated but will be run again
+    Returns (#normal termination, #terminated with error, #not terminated, #to rerun)
+    """
+    n_normal = 0
+    n_error = 0
+    n_running = 0
+    n_rerun = 0
+    for name, entry in entries.items():
+        if not (name.startswith(prefix) and name.endswith('.log')):
+            continue
+        status = cache.get_status(entry)
+        if status == 0:
+            n_normal += 1
+        elif status == -1:
+            n_running += 1
+        elif status in rerun_statuses:
+            n_rerun += 1
+        else:
+            n_error += 1
+    return n_normal, n_error, n_running, n_rerun
+
+
+def get_species_status(species_index, cache):
+    """Returns a dictionary with the state of each thermo stage for one species
+    """
+    species_dir = os.path.join(DFT_DIR, 'thermo', f'species_{species_index:04}')
+    conformer_entries = scan_dir(os.path.join(species_dir, 'conformers'))
+    rotor_entries = scan_dir(os.path.join(species_dir, 'rotors'))
+    arkane_entries = scan_dir(os.path.join(species_dir, 'arkane'))
+
+    row = {'i': species_index}
+
+    # conformers - finished means terminated, with or without error (same as job.incomplete_conformers)
+    n_planned = 0
+    if 'run.sh' in conformer_entries:
+        n_planned = get_array_size(conformer_entries['run.sh'].path)
+    n_normal, n_error, n_running, n_rerun = count_statuses(conformer_entries, 'conformer_', cache)
+    row['conformers_planned'] = n_planned
+    row['conformers_normal'] = n_normal
+    row['conformers_error'] = n_error
+    if n_planned == 0:
+        row['conformers'] = 'not started'
+    elif n_normal + n_error >= n_planned:
+        row['conformers'] = 'complete'
+    else:
+        row['conformers'] = 'running'
+
+    # rotors
+    rotor_inputs = [name for name in rotor_entries if name.startswith('rotor_') and len(name) == 14 and name.endswith('.com')]
+    n_normal, n_error, n_running, n_rerun = count_statuses(
+        {name: entry for name, entry in rotor_entries.items() if len(name) == 14}, 'rotor_', cache
+    )
+    row['lowest_conformer'] = any([name.startswith('conformer_') and name.endswith('.log') for name in rotor_entries])
+    row['rotors_planned'] = len(rotor_inputs)
+    row['rotors_normal'] = n_normal
+    row['rotors_error'] = n_error
+    if 'NO_ROTORS.txt' in rotor_entries:
+        row['rotors'] = 'no rotors'
+    elif len(rotor_inputs) == 0:
+        row['rotors'] = 'not started'
+    elif n_normal + n_error >= len(rotor_inputs):
+        row['rotors'] = 'complete'
+    else:
+        row['rotors'] = 'running'
+
+    # arkane
+    if os.path.exists(os.path.join(species_dir, 'arkane', 'RMG_libraries', 'thermo.py')):
+        row['arkane'] = 'complete'
+    elif 'input.py' in arkane_entries:
+        row['arkane'] = 'setup'
+    else:
+        row['arkane'] = 'not started'
+    return row
+
+
+def get_reaction_status(reaction_index, cache, use_reverse=False):
+    """Returns a dictionary with the state of each kinetics stage for one reaction
+    Uses the same completion rules as kineticfun.shell_complete and kineticfun.overall_complete
+    """
+    reaction_dir = os.path.join(DFT_DIR, 'kinetics', f'reaction_{reaction_index:04}')
+    prefix = 'rev_ts_' if use_reverse else 'fwd_ts_'
+
+    row = {'i': reaction_index}
+    for stage in ['shell', 'center', 'overall']:
+        entries = scan_dir(os.path.join(reaction_dir, stage))
+        n_normal, n_error, n_running, n_rerun = count_statuses(entries, prefix, cache, KINETICS_RERUN_STATUSES)
+        row[f'{stage}_normal'] = n_normal
+        row[f'{stage}_error'] = n_error
+        row[f'{stage}_running'] = n_running
+        row[f'{stage}_rerun'] = n_rerun
+        if n_normal + n_error + n_running + n_rerun == 0:
+            row[stage] = 'not started'
+        elif n_running > 0:
+            row[stage] = 'running'
+        elif n_rerun > 0:
+            row[stage] = 'rerun'  # kineticfun will submit these again
+        elif stage == 'shell' and n_normal == 0:
+            row[stage] = 'failed'  # no useable shell optimization
+        else:
+            row[stage] = 'complete'
+
+    arkane_dir = os.path.join(reaction_dir, 'arkane')
+    arkane_entries = scan_dir(arkane_dir)
+    if os.path.exists(os.path.join(arkane_dir, 'RMG_libraries', 'reactions.py')):
+        row['arkane'] = 'complete'
+    elif 'input.py' in arkane_entries:
+        row['arkane'] = 'setup'
+    else:
+        row['arkane'] = 'not started'
+    row['vibrational_analysis'] = read_flag_file(os.path.join(arkane_dir, 'vibrational_analysis_check.txt'))
+    row['irc'] = read_flag_file(os.path.join(reaction_dir, 'irc', 'irc_result.txt'))
+    return row
+
+
+def collect_status(cache_file=STATUS_CACHE_FILE):
+    """Walks DFT_DIR/thermo and DFT_DIR/kinetics once
+    Returns two DataFrames: species status and reaction status, one row per index in the lists
+    """
+    cache = LogStatusCache(cache_file)
+
+    species_df = pd.read_csv(os.path.join(DFT_DIR, 'species_list.csv'))
+    species_rows = [get_species_status(int(i), cache) for i in species_df['i'].values]
+    species_status = species_df[['i', 'name', 'SMILES']].merge(pd.DataFrame(species_rows), on='i')
+
+    reaction_df = pd.read_csv(os.path.join(DFT_DIR, 'reaction_list.csv'))
+    reaction_rows = [get_reaction_status(int(i), cache) for i in reaction_df['i'].values]
+    reaction_status = reaction_df[['i', 'name', 'SMILES']].merge(pd.DataFrame(reaction_rows), on='i')
+
+    cache.save()
+    return species_status, reaction_status
+
+
+def save_table(df, path_without_extension):
+    """Saves as parquet if pyarrow is available, otherwise as csv. Returns the path written
+    """
+    try:
+        import pyarrow  # noqa: F401
+        path = path_without_extension + '.parquet'
+        df.to_parquet(path)
+    except ImportError:
+        path = path_without_extension + '.csv'
+        df.to_csv(path, index=False)
+    return path
+
+
+if __name__ == '__main__':
+    output_dir = DFT_DIR
+    if len(sys.argv) > 1:
+        output_dir = sys.argv[1]
+
+    species_status, reaction_status = collect_status()
+    print(save_table(species_status, os.path.join(output_dir, 'species_status')))
+    print(save_table(reaction_status, os.path.join(output_dir, 'reaction_status')))
+
+    for stage in ['conformers', 'rotors', 'arkane']:
+        print(f'species {stage}:', species_status[stage].value_counts().to_dict())
+    for stage in ['shell', 'center', 'overall', 'arkane']:
+        print(f'reactions {stage}:', reaction_status[stage].value_counts().to_dict())
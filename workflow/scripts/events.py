@@ -0,0 +1,186 @@
+# Structured event log for the workflow stages
+# Every process writes JSON lines to its own file in DFT_DIR/events/ through one buffered handle,
+# instead of opening and appending to conformers.log, shell.log etc. for every message.
+# Each event has the species/reaction index, the stage, what happened, a timestamp, the SLURM job
+# of the process writing it and, where it applies, the submitted SLURM job and a duration.
+#
+# wait_for_job replaces job_manager's wait so the time a submitted job spends in the queue, the time
+# it runs, and the time the driver spends polling are recorded separately.
+#
+# Usage: python events.py [species|reaction] [index]     prints the events for one item
+import os
+import sys
+import json
+import time
+import glob
+import atexit
+import socket
+import subprocess
+import contextlib
+
+
+try:
+    DFT_DIR = os.environ['DFT_DIR']
+except KeyError:
+    DFT_DIR = "/work/westgroup/harris.se/autoscience/autoscience/butane/dft"
+
+HOSTNAME = socket.gethostname()
+
+_handle = None
+_handle_key = None
+
+
+def get_event_dir():
+    # read when the event is written, so scripts that change DFT_DIR after import
+    # (e.g. the benchmarks) don't write into the campaign's event log
+    return os.path.join(os.environ.get('DFT_DIR', DFT_DIR), 'events')
+
+
+def _get_handle():
+    global _handle, _handle_key
+    key = (os.getpid(), get_event_dir())
+    if _handle is None or _handle_key != key:
+        if _handle is not None and _handle_key[0] == os.getpid():
+            _handle.close()
+        os.makedirs(key[1], exist_ok=True)
+        path = os.path.join(key[1], f'{HOSTNAME}_{os.getpid()}_{int(time.time())}.jsonl')
+        _handle = open(path, 'a', buffering=1 << 16)
+        _handle_key = key
+    return _handle
+
+
+def flush():
+    if _handle is not None and _handle_key[0] == os.getpid():
+        _handle.flush()
+
+
+atexit.register(flush)
+# empty the buffer before forking so the child doesn't write the parent's events a second time
+os.register_at_fork(before=flush)
+
+
+def log_event(kind, index, stage, event, duration=None, job_id=None, message=None, **fields):
+    """Writes one event
+    kind is 'species' or 'reaction', event is e.g. 'start', 'end', 'submitted', 'message'
+    """
+    record = {
+        'time': time.time(),
+        'kind': kind,
+        'index': int(index),
+        'stage': stage,
+        'event': event,
+        'host': HOSTNAME,
+        'pid': os.getpid(),
+        'slurm_job_id': os.environ.get('SLURM_JOB_ID'),
+    }
+    if duration is not None:
+        record['duration'] = duration
+    if job_id is not None:
+        record['job_id'] = str(job_id)
+    if message is not None:
+        record['message'] = message.strip()
+    record.update(fields)
+    handle = _get_handle()
+    handle.write(json.dumps(record) + '\n')
+    # stage boundaries are what reports need, so don't leave them sitting in the buffer
+    if event != 'message':
+        handle.flush()
+
+
+class StageLog:
+    """Events for one stage of one species or reaction, e.g. StageLog('species', 12, 'conformers')
+    """
+    def __init__(self, kind, index, stage):
+        self.kind = kind
+        self.index = index
+        self.stage = stage
+
+    def event(self, event, **fields):
+        log_event(self.kind, self.index, self.stage, event, **fields)
+
+    def message(self, message):
+        log_event(self.kind, self.index, self.stage, 'message', message=message)
+
+    @contextlib.contextmanager
+    def timed(self, name):
+        """Records {name}_start and {name}_end (or {name}_error) with the duration
+        """
+        start = time.time()
+        self.event(f'{name}_start')
+        try:
+            yield
+        except BaseException as e:
+            self.event(f'{name}_error', duration=time.time() - start, error=f'{type(e).__name__}: {e}')
+            raise
+        self.event(f'{name}_end', duration=time.time() - start)
+
+    def wait_for_job(self, job_id, check_interval=60):
+        """Polls squeue until every task of the job has left the queue
+        Records when the job starts running (queue_wait) and finishes (run_time), and the
+        time spent polling
+        squeue errors other than an unknown job ID (e.g. slurmctld timeouts) are retried
+        """
+        start = time.time()
+        running_since = None
+        n_polls = 0
+        while True:
+            n_polls += 1
+            proc = subprocess.run(
+                ['squeue', '-h', '-j', str(job_id), '-o', '%T'], capture_output=True, text=True
+            )
+            states = proc.stdout.split()
+            if proc.returncode == 0 and not states:
+                break  # finished
+            if proc.returncode != 0:
+                if 'Invalid job id' in proc.stderr:
+                    break  # finished and purged from the queue
+                self.event('squeue_error', job_id=job_id, message=proc.stderr)
+                time.sleep(check_interval)
+                continue
+            if running_since is None and ('RUNNING' in states or 'COMPLETING' in states):
+                running_since = time.time()
+                self.event('job_running', job_id=job_id, queue_wait=running_since - start)
+            time.sleep(check_interval)
+
+        end = time.time()
+        fields = {
+            'job_id': job_id,
+            'duration': end - start,
+            'n_polls': n_polls,
+            'queue_wait': (running_since - start) if running_since is not None else end - start,
+        }
+        if running_since is not None:
+            # only as accurate as the polling interval
+            fields['run_time'] = end - running_since
+        self.event('job_finished', **fields)
+
+
+def read_events(event_dir=None):
+    """Returns every event in the event directory, oldest first
+    """
+    if event_dir is None:
+        event_dir = get_event_dir()
+    events = []
+    for event_file in glob.glob(os.path.join(event_dir, '*.jsonl')):
+        with open(event_file, 'r') as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except json.JSONDecodeError:
+                    pass  # partial last line of a process that is still writing or was killed
+    return sorted(events, key=lambda event: event['time'])
+
+
+if __name__ == '__main__':
+    kind = sys.argv[1] if len(sys.argv) > 1 else None
+    index = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    for event in read_events():
+        if kind is not None and event['kind'] != kind:
+            continue
+        if index is not None and event['index'] != index:
+            continue
+        timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(event['time']))
+        details = event.get('message', '')
+        if 'duration' in event:
+            details += f" {event['duration']:.1f}s"
+        print(f"{timestamp} {event['kind']}_{event['index']:04} {event['stage']:12s} {event['event']:20s} {details}")
@@ -0,0 +1,73 @@
+# Functions for reading the termination status and energy of a Gaussian log
+# Every status check in the workflow (kineticfun, campaign_status, result_store, ts_index) goes
+# through here, so they all agree on what a log's status is
+import os
+import collections
+
+
+# the status is decided by the last TAIL_LINES lines of the log
+TAIL_LINES = 20
+
+
+def get_status_from_lines(lines):
+    """Returns the termination status from the last lines of a Gaussian log, oldest first:
+    0 for Normal termination
+    1 for Error termination not covered below
+    2 for Error termination - due to all degrees of freedom being frozen
+    3 for Error termination - Problem with the distance matrix.
+    4 for No NMR shielding tensors so no spin-rotation constants
+    5 for manual skip
+    -1 for no termination
+    """
+    error_termination = False
+    for line in reversed(lines):
+        if 'Normal termination' in line:
+            return 0
+        elif 'Error termination' in line:
+            error_termination = True
+        elif 'All variables have been frozen' in line:
+            return 2
+        elif 'Problem with the distance matrix' in line:
+            return 3
+        elif 'No NMR shielding tensors so no spin-rotation constants' in line:
+            return 4
+        elif 'MANUAL SKIP' in line.upper():
+            return 5
+    if error_termination:
+        return 1
+    return -1
+
+
+def read_tail(log_file, n_lines=TAIL_LINES, block_size=8192):
+    """Returns the last n_lines lines of a file without reading the rest of it
+    """
+    with open(log_file, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b''
+        while position > 0 and data.count(b'\n') <= n_lines:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+    return data.decode(errors='ignore').splitlines()[-n_lines:]
+
+
+def termination_status(log_file):
+    """Termination status of a Gaussian log, see get_status_from_lines for the codes
+    """
+    return get_status_from_lines(read_tail(log_file))
+
+
+def summarize_log(log_file):
+    """Reads a Gaussian log once and returns (termination status, last SCF energy in Hartree)
+    Energy is None if no SCF cycle finished
+    """
+    energy = None
+    tail = collections.deque(maxlen=TAIL_LINES)
+    with open(log_file, 'r', errors='ignore') as f:
+        for line in f:
+            if 'SCF Done:' in line:
+                energy = float(line.split('=')[1].split()[0])
+            tail.append(line)
+    return get_status_from_lines(list(tail)), energy
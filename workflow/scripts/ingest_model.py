@@ -0,0 +1,292 @@
+# Reads the RMG Chemkin model once and writes both species_list.csv and reaction_list.csv
+# The parsed species and reactions are pickled, keyed by a hash of the chemkin, dictionary and
+# transport files, so regenerating the lists for an unchanged model doesn't reparse the mechanism.
+# A diff against the previous lists is written to model_diff.csv
+#
+# Indices are stable across model updates: entries already in the lists keep their index
+# (matched by SMILES, then by isomorphism), new entries are appended, and entries that left
+# the model stay in the lists with in_model=False, so the species_XXXX and reaction_XXXX
+# directories always point at the same species and reactions.
+#
+# Usage: python ingest_model.py [chem.inp species_dictionary.txt tran.dat]
+import os
+import sys
+import pickle
+import hashlib
+
+import pandas as pd
+import rmgpy.chemkin
+import rmgpy.species
+import rmgpy.molecule
+
+
+chemkin_path = "/work/westgroup/harris.se/autoscience/autoscience_workflow/resources/nheptane1/chem.inp"
+dictionary_path = "/work/westgroup/harris.se/autoscience/autoscience_workflow/resources/nheptane1/species_dictionary.txt"
+transport_path = "/work/westgroup/harris.se/autoscience/autoscience_workflow/resources/nheptane1/tran.dat"
+
+
+def hash_files(paths):
+    """sha256 of the contents of all of the files together
+    """
+    sha = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha.update(block)
+    return sha.hexdigest()
+
+
+def load_model(chemkin_path, dictionary_path, transport_path, cache_dir=None):
+    """Same as rmgpy.chemkin.load_chemkin_file, but reuses the parsed model if the files haven't changed
+    The cache goes in a model_cache folder next to the chemkin file unless cache_dir is given
+    Returns (species_list, reaction_list)
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(chemkin_path)), 'model_cache')
+    key = hash_files([chemkin_path, dictionary_path, transport_path])
+    cache_file = os.path.join(cache_dir, f'model_{key[:16]}.pickle')
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, 'rb') as f:
+                return pickle.load(f)
+        except (pickle.UnpicklingError, EOFError, AttributeError):
+            print(f'Model cache {cache_file} is unreadable, reparsing the model')
+
+    species_list, reaction_list = rmgpy.chemkin.load_chemkin_file(
+        chemkin_path,
+        dictionary_path=dictionary_path,
+        transport_path=transport_path
+    )
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(cache_file + '.tmp', 'wb') as f:
+        pickle.dump((species_list, reaction_list), f)
+    os.replace(cache_file + '.tmp', cache_file)
+    return species_list, reaction_list
+
+
+def get_smiles(species_or_molecule, smiles_cache):
+    """SMILES of a species or molecule, computed once per object
+    """
+    key = id(species_or_molecule)
+    if key not in smiles_cache:
+        if isinstance(species_or_molecule, rmgpy.species.Species):
+            smiles_cache[key] = species_or_molecule.molecule[0].to_smiles()
+        else:
+            smiles_cache[key] = species_or_molecule.to_smiles()
+    return smiles_cache[key]
+
+
+# Copied from AutoTST: reaction.get_label()
+def reaction2SMILES(reaction, smiles_cache):
+    reactants = '+'.join([get_smiles(react, smiles_cache) for react in reaction.reactants])
+    products = '+'.join([get_smiles(prod, smiles_cache) for prod in reaction.products])
+    return reactants + '_' + products
+
+
+def make_species_table(species_list, smiles_cache):
+    entries = []
+    for i, species in enumerate(species_list):
+        entries.append([i, str(species), get_smiles(species, smiles_cache)])
+    return pd.DataFrame(entries, columns=['i', 'name', 'SMILES'])
+
+
+def make_reaction_table(reaction_list, smiles_cache):
+    def species_sort(sp):
+        return get_smiles(sp, smiles_cache)
+
+    entries = []
+    for i, reaction in enumerate(reaction_list):
+        reaction.products.sort(key=species_sort)
+        reaction.reactants.sort(key=species_sort)
+        entries.append([i, str(reaction), reaction2SMILES(reaction, smiles_cache)])
+    return pd.DataFrame(entries, columns=['i', 'name', 'SMILES'])
+
+
+def match_species(old_df, species_list, smiles_cache):
+    """Finds the old index of each species in the new model
+    Matches on SMILES first, then by isomorphism (which also catches resonance structures)
+    Returns {new species position: old index}
+    """
+    old_by_smiles = {}
+    for i, smiles in zip(old_df['i'].values, old_df['SMILES'].values):
+        old_by_smiles.setdefault(smiles, []).append(int(i))
+
+    matches = {}
+    unmatched = []
+    for j, species in enumerate(species_list):
+        smiles = get_smiles(species, smiles_cache)
+        if old_by_smiles.get(smiles):
+            matches[j] = old_by_smiles[smiles].pop(0)
+        else:
+            unmatched.append(j)
+
+    remaining = [(i, smiles) for smiles, indices in old_by_smiles.items() for i in indices]
+    if unmatched and remaining:
+        old_species = {}
+        for i, smiles in remaining:
+            old_species[i] = rmgpy.species.Species(smiles=smiles)
+            old_species[i].generate_resonance_structures()
+        for j in unmatched:
+            for i in list(old_species.keys()):
+                if species_list[j].is_isomorphic(old_species[i], strict=False):
+                    matches[j] = i
+                    old_species.pop(i)
+                    break
+    return matches
+
+
+def translate_reaction_smiles(reaction_smiles, species_smiles_map):
+    """Rewrites a reactant1+reactant2_product1+product2 SMILES with the species SMILES from the map
+    Species missing from the map are left as they are
+    """
+    reactants, products = reaction_smiles.split('_')
+    reactants = [species_smiles_map.get(sp, sp) for sp in reactants.split('+')]
+    products = [species_smiles_map.get(sp, sp) for sp in products.split('+')]
+    return '+'.join(reactants) + '_' + '+'.join(products)
+
+
+def match_reactions(old_df, reaction_df, species_smiles_map):
+    """Finds the old index of each reaction in the new model
+    Matches on the reaction SMILES after translating each species to the SMILES it had in the
+    old species list, in either direction
+    Returns {new reaction position: old index}
+    """
+    def reaction_key(reaction_smiles, reverse=False):
+        reactants, products = translate_reaction_smiles(reaction_smiles, species_smiles_map).split('_')
+        reactants = sorted(reactants.split('+'))
+        products = sorted(products.split('+'))
+        if reverse:
+            return '+'.join(products) + '_' + '+'.join(reactants)
+        return '+'.join(reactants) + '_' + '+'.join(products)
+
+    old_by_key = {}
+    for i, smiles in zip(old_df['i'].values, old_df['SMILES'].values):
+        old_by_key.setdefault(reaction_key(smiles), []).append(int(i))
+
+    matches = {}
+    for j, smiles in enumerate(reaction_df['SMILES'].values):
+        for key in [reaction_key(smiles), reaction_key(smiles, reverse=True)]:
+            if old_by_key.get(key):
+                matches[j] = old_by_key[key].pop(0)
+                break
+    return matches
+
+
+def remap_table(old_df, new_df, matches):
+    """Builds the new list with stable indices
+    Matched entries keep their old index and SMILES (the SMILES their calculations were run with)
+    but take the new name. New entries are appended. Old entries missing from the model are kept
+    with in_model=False so row position still equals the index
+    """
+    rows = {}
+    for i, name, smiles in zip(old_df['i'].values, old_df['name'].values, old_df['SMILES'].values):
+        rows[int(i)] = [int(i), name, smiles, False]
+
+    next_index = max(rows.keys(), default=-1) + 1
+    for j, (name, smiles) in enumerate(zip(new_df['name'].values, new_df['SMILES'].values)):
+        if j in matches:
+            rows[matches[j]][1] = name
+            rows[matches[j]][3] = True
+        else:
+            rows[next_index] = [next_index, name, smiles, True]
+            next_index += 1
+
+    return pd.DataFrame([rows[i] for i in sorted(rows)], columns=['i', 'name', 'SMILES', 'in_model'])
+
+
+def diff_tables(old_df, new_df, kind):
+    """Compares two species or reaction tables by SMILES
+    Returns a DataFrame with one row per entry that was added, removed, or changed index
+    """
+    if 'in_model' in old_df.columns:
+        old_df = old_df[old_df['in_model']]
+    if 'in_model' in new_df.columns:
+        new_df = new_df[new_df['in_model']]
+    old_index = dict(zip(old_df['SMILES'].values, old_df['i'].values))
+    new_index = dict(zip(new_df['SMILES'].values, new_df['i'].values))
+    new_names = dict(zip(new_df['SMILES'].values, new_df['name'].values))
+    old_names = dict(zip(old_df['SMILES'].values, old_df['name'].values))
+
+    rows = []
+    for smiles, i in new_index.items():
+        if smiles not in old_index:
+            rows.append([kind, 'added', None, i, new_names[smiles], smiles])
+        elif old_index[smiles] != i:
+            rows.append([kind, 'moved', old_index[smiles], i, new_names[smiles], smiles])
+    for smiles, i in old_index.items():
+        if smiles not in new_index:
+            rows.append([kind, 'removed', i, None, old_names[smiles], smiles])
+    return pd.DataFrame(rows, columns=['kind', 'change', 'old_i', 'new_i', 'name', 'SMILES'])
+
+
+def read_table(path):
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=['i', 'name', 'SMILES', 'in_model'])
+    df = pd.read_csv(path, index_col=0)
+    if 'in_model' not in df.columns:
+        df['in_model'] = True
+    return df
+
+
+def remap_to_previous(species_list, species_df, reaction_df, old_species_df, old_reaction_df, smiles_cache):
+    """Gives the species and reactions of the new model the indices they had in the old lists
+    Returns the remapped (species_df, reaction_df)
+    """
+    species_matches = match_species(old_species_df, species_list, smiles_cache)
+    new_species_df = remap_table(old_species_df, species_df, species_matches)
+
+    # the SMILES each new species had in the old list, for matching reactions
+    old_smiles = dict(zip(old_species_df['i'].values, old_species_df['SMILES'].values))
+    species_smiles_map = {
+        species_df['SMILES'].values[j]: old_smiles[i] for j, i in species_matches.items()
+    }
+    reaction_matches = match_reactions(old_reaction_df, reaction_df, species_smiles_map)
+
+    # appended reactions are written with the SMILES their species have in the species list,
+    # not the ones the new model happened to generate
+    reaction_df = reaction_df.copy()
+    reaction_df['SMILES'] = [
+        translate_reaction_smiles(smiles, species_smiles_map) for smiles in reaction_df['SMILES'].values
+    ]
+    new_reaction_df = remap_table(old_reaction_df, reaction_df, reaction_matches)
+    return new_species_df, new_reaction_df
+
+
+def ingest_model(chemkin_path, dictionary_path, transport_path, output_dir='.'):
+    """Writes species_list.csv, reaction_list.csv and model_diff.csv to output_dir
+    """
+    species_list, reaction_list = load_model(chemkin_path, dictionary_path, transport_path)
+
+    smiles_cache = {}
+    species_df = make_species_table(species_list, smiles_cache)
+    reaction_df = make_reaction_table(reaction_list, smiles_cache)
+
+    species_csv = os.path.join(output_dir, 'species_list.csv')
+    reaction_csv = os.path.join(output_dir, 'reaction_list.csv')
+    old_species_df = read_table(species_csv)
+    old_reaction_df = read_table(reaction_csv)
+
+    species_df, reaction_df = remap_to_previous(
+        species_list, species_df, reaction_df, old_species_df, old_reaction_df, smiles_cache
+    )
+
+    diff_df = pd.concat([
+        diff_tables(old_species_df, species_df, 'species'),
+        diff_tables(old_reaction_df, reaction_df, 'reaction'),
+    ], ignore_index=True)
+
+    species_df.to_csv(species_csv)
+    reaction_df.to_csv(reaction_csv)
+    diff_df.to_csv(os.path.join(output_dir, 'model_diff.csv'), index=False)
+
+    print(f'{len(species_df)} species and {len(reaction_df)} reactions')
+    for (kind, change), count in diff_df.groupby(['kind', 'change']).size().items():
+        print(f'{count} {kind} {change}')
+    return species_df, reaction_df, diff_df
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 3:
+        chemkin_path, dictionary_path, transport_path = sys.argv[1:4]
+    ingest_model(chemkin_path, dictionary_path, transport_path)
@@ -0,0 +1,136 @@
+# Classifies every reaction in reaction_list.csv into its RMG family with AutoTST
+# Results go into DFT_DIR/kinetics/reaction_families.csv, one row per reaction index, with the family,
+# the labeled atoms of the forward TS (label:atom index), and the reason a reaction can't be run.
+# Reactions are spread across a process pool. AutoTST keeps the RMG database on the Reaction class,
+# so each worker loads it once and reuses it for every reaction it classifies.
+# Only reactions that are missing from the table or whose SMILES changed are classified.
+#
+# Usage: python classify_reactions.py [n_procs]
+import os
+import sys
+import multiprocessing
+
+import pandas as pd
+
+
+try:
+    DFT_DIR = os.environ['DFT_DIR']
+except KeyError:
+    DFT_DIR = "/work/westgroup/harris.se/autoscience/autoscience/butane/dft"
+
+FAMILY_TABLE = os.path.join(DFT_DIR, 'kinetics', 'reaction_families.csv')
+FAMILY_COLUMNS = ['i', 'SMILES', 'family', 'labeled_atoms', 'skip_reason']
+
+
+def classify_reaction(reaction_index, reaction_smiles):
+    """Labels one reaction with AutoTST and returns a row of the family table
+    """
+    import autotst.reaction
+
+    row = {'i': reaction_index, 'SMILES': reaction_smiles, 'family': None, 'labeled_atoms': None, 'skip_reason': None}
+    if "[C-]#[O+]" in reaction_smiles:  # might be able to get by with replacing it as [C]#[O]
+        row['skip_reason'] = 'contains CO'
+        return row
+
+    try:
+        reaction = autotst.reaction.Reaction(label=reaction_smiles)
+        reaction.get_labeled_reaction()
+    except AssertionError:
+        row['skip_reason'] = 'no matching family'
+        return row
+    except Exception as e:
+        row['skip_reason'] = f'labeling failed: {type(e).__name__}'
+        return row
+    row['family'] = reaction.rmg_reaction.family
+
+    try:
+        ts = reaction.ts['forward'][0]
+        row['labeled_atoms'] = ' '.join([
+            f'{atom.label}:{i}' for i, atom in enumerate(ts.rmg_molecule.atoms) if atom.label
+        ])
+    except Exception as e:
+        row['skip_reason'] = f'TS construction failed: {type(e).__name__}'
+    return row
+
+
+def _classify_reaction(args):
+    return classify_reaction(*args)
+
+
+def read_family_table():
+    """Returns the family table indexed by reaction index, empty if it hasn't been made
+    """
+    if not os.path.exists(FAMILY_TABLE):
+        return pd.DataFrame(columns=FAMILY_COLUMNS).set_index('i')
+    return pd.read_csv(FAMILY_TABLE, index_col='i')
+
+
+def get_family_row(reaction_index, family_table=None):
+    """Returns the row of the family table for one reaction, or None if it hasn't been classified
+    """
+    if family_table is None:
+        family_table = read_family_table()
+    if reaction_index not in family_table.index:
+        return None
+    return family_table.loc[reaction_index]
+
+
+def get_skip_reason(reaction_index, family_table=None):
+    """Reason the reaction can't be run, or None if it can (or hasn't been classified yet)
+    """
+    row = get_family_row(reaction_index, family_table=family_table)
+    if row is None or pd.isna(row['skip_reason']):
+        return None
+    return row['skip_reason']
+
+
+def get_labeled_atoms(reaction_index, family_table=None):
+    """Returns {label: atom index} for the forward TS, or None if unknown
+    """
+    row = get_family_row(reaction_index, family_table=family_table)
+    if row is None or pd.isna(row['labeled_atoms']):
+        return None
+    return {token.split(':')[0]: int(token.split(':')[1]) for token in row['labeled_atoms'].split()}
+
+
+def get_reactions_in_family(family, family_table=None):
+    """Returns the indices of all runnable reactions in an RMG family
+    """
+    if family_table is None:
+        family_table = read_family_table()
+    in_family = (family_table['family'] == family) & family_table['skip_reason'].isna()
+    return list(family_table.index[in_family])
+
+
+def classify_reactions(n_procs=None):
+    """Classifies the reactions that are new or changed and updates the family table
+    """
+    reaction_df = pd.read_csv(os.path.join(DFT_DIR, 'reaction_list.csv'))
+    family_table = read_family_table()
+
+    todo = []
+    for reaction_index, reaction_smiles in zip(reaction_df['i'].values, reaction_df['SMILES'].values):
+        if reaction_index in family_table.index and family_table.loc[reaction_index, 'SMILES'] == reaction_smiles:
+            continue
+        todo.append((int(reaction_index), reaction_smiles))
+    print(f'Classifying {len(todo)} reactions')
+    if not todo:
+        return family_table
+
+    with multiprocessing.Pool(processes=n_procs) as pool:
+        rows = pool.map(_classify_reaction, todo, chunksize=8)
+
+    new_rows = pd.DataFrame(rows, columns=FAMILY_COLUMNS).set_index('i')
+    family_table = pd.concat([family_table.drop(index=new_rows.index, errors='ignore'), new_rows]).sort_index()
+    family_table.to_csv(FAMILY_TABLE + '.tmp')
+    os.replace(FAMILY_TABLE + '.tmp', FAMILY_TABLE)
+    return family_table
+
+
+if __name__ == '__main__':
+    n_procs = None
+    if len(sys.argv) > 1:
+        n_procs = int(sys.argv[1])
+    family_table = classify_reactions(n_procs=n_procs)
+    print(family_table['family'].value_counts())
+    print(f"{family_table['skip_reason'].notna().sum()} reactions can't be run")
@@ -0,0 +1,53 @@
+# Functions for writing Gaussian input files in a single pass
+# calc.write_input() followed by reading the file back in to fix the spacing
+# costs three file operations per conformer, which is slow on the shared filesystem
+import io
+import os
+
+
+def render_input(calc, atoms):
+    """Returns the text of the Gaussian .com file for an ASE Gaussian calculator
+    Matches what calc.write_input(atoms) writes, except the double blank line
+    ASE leaves between the xyz block and the mod-redundant section is removed
+    """
+    import ase.io.gaussian
+    buffer = io.StringIO()
+    ase.io.gaussian.write_gaussian_in(buffer, atoms, properties=None, **calc.parameters)
+    lines = buffer.getvalue().splitlines(keepends=True)
+
+    # Get rid of double-space between xyz block and mod-redundant section
+    for j in range(1, len(lines)):
+        if lines[j] == '\n' and lines[j - 1] == '\n':
+            lines = lines[0:j - 1] + lines[j:]
+            break
+    return ''.join(lines)
+
+
+def write_inputs(inputs, fsync=True):
+    """Writes a batch of input files, each one opened exactly once
+    inputs is a dictionary of {filepath: text}, e.g. all of the .com files for one array job
+    If fsync is True, the files and their directories are synced to disk once at the end
+    so the inputs are guaranteed to be there before the array job is submitted
+    """
+    handles = []
+    try:
+        for path, text in inputs.items():
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            f = open(path, 'w')
+            handles.append(f)
+            f.write(text)
+        for f in handles:
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+    finally:
+        for f in handles:
+            f.close()
+
+    if fsync:
+        for directory in set([os.path.dirname(path) for path in inputs.keys()]):
+            dir_fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
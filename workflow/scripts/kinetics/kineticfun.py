@@ -1,26 +1,25 @@
 # Functions for running a kinetics job using this workflow
-import pandas as pd
-import numpy as np
+# AutoTST, ASE, RMG and Hotbit are imported inside the functions that use them, so status checks
+# and index lookups don't pay for importing them
 import re
 import os
+import sys
 import glob
-import numpy as np
 import subprocess
-import autotst.reaction
-import autotst.calculator.vibrational_analysis
-import autotst.calculator.gaussian
 try:
     import job_manager
 except ImportError:
     pass
-try:
-    from hotbit import Hotbit  # TODO - move this and other autoTST dependencies elsewhere
-except ImportError:
-    pass
-import ase.io.gaussian
-import ase.calculators.lj
-import rmgpy.reaction
-import rmgpy.species
+
+import gaussian_input
+import ts_index
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import result_store
+import model_lists
+import events
+import gaussian_log
+import state_db
 
 
 
@@ -32,6 +31,13 @@ except KeyError:
     DFT_DIR = "/work/westgroup/harris.se/autoscience/autoscience/butane/dft"
 
 
+def get_stage_name(stage, use_reverse=False):
+    # forward and reverse TS searches are tracked separately in the state database
+    if use_reverse:
+        return stage + '_reverse'
+    return stage
+
+
 def ordered_array_str(list_of_indices):
     # convenient script for putting a list of task numbers into a string that can be used for a SLURM array job
     # assume it's sorted
@@ -65,13 +71,14 @@ def get_num_reactions():
     """Function to lookup number of reactions in the reaction_list.csv
     """
     reaction_csv = os.path.join(DFT_DIR, 'reaction_list.csv')
-    reaction_df = pd.read_csv(reaction_csv)
-    return reaction_df.i.values[-1]
+    return model_lists.get_last_index(reaction_csv)
 
 
 def reaction2smiles(reaction):
     """Takes an RMG reaction and returns the smiles representation
     """
+    import rmgpy.species
+    import rmgpy.molecule
     string = ""
     for react in reaction.reactants:
         if isinstance(react, rmgpy.species.Species):
@@ -92,6 +99,8 @@ def reaction2smiles(reaction):
 def smiles2reaction(reaction_smiles):
     """Takes the reaction smiles and produces a corresponding rmg reaction
     """
+    import rmgpy.reaction
+    import rmgpy.species
     reaction = rmgpy.reaction.Reaction()
     reactants = []
     products = []
@@ -145,9 +154,7 @@ def reaction_index2smiles(reaction_index):
     looks up the results in the reaction_list.csv
     """
     reaction_csv = os.path.join(DFT_DIR, 'reaction_list.csv')
-    reaction_df = pd.read_csv(reaction_csv)
-    reaction_smiles = reaction_df['SMILES'].values[reaction_index]
-    return reaction_smiles
+    return model_lists.get_value(reaction_csv, reaction_index, 'SMILES')
 
 
 def reaction_smiles2index(reaction_smiles):
@@ -157,17 +164,16 @@ def reaction_smiles2index(reaction_smiles):
     """
     # first check to see if the exact smiles is in the CSV
     reaction_csv = os.path.join(DFT_DIR, 'reaction_list.csv')
-    reaction_df = pd.read_csv(reaction_csv)
-    if reaction_smiles in reaction_df['SMILES'].values:
-        idx = np.where(reaction_df['SMILES'].values == reaction_smiles)[0][0]
-        return reaction_df['i'].values[idx]
+    reaction_index = model_lists.find_index(reaction_csv, 'SMILES', reaction_smiles)
+    if reaction_index is not None:
+        return reaction_index
     else:
         # use rmgpy.reaction to check for isomorphism
         ref_reaction = smiles2reaction(reaction_smiles)
-        for i in range(0, len(reaction_df)):
-            csv_reaction = smiles2reaction(reaction_df['SMILES'].values[i])
+        for row in model_lists.read_list(reaction_csv):
+            csv_reaction = smiles2reaction(row['SMILES'])
             if ref_reaction.is_isomorphic(csv_reaction):
-                return i
+                return row['i']
     # reaction not found
     return -1
 
@@ -179,38 +185,10 @@ def termination_status(log_file):
     2 for Error termination - due to all degrees of freedom being frozen
     3 for Error termination - Problem with the distance matrix.
     4 for No NMR shielding tensors so no spin-rotation constants  # TODO debug this instead of ignoring it
+    5 for manual skip
     -1 for no termination
     """
-    error_termination = False
-    with open(log_file, 'rb') as f:
-        f.seek(0, os.SEEK_END)
-        normal_termination = False
-        error_termination = False
-        for i in range(0, 20):
-            try:
-                f.seek(-2, os.SEEK_CUR)
-                while f.read(1) != b'\n':
-                    f.seek(-2, os.SEEK_CUR)
-            except OSError:
-                f.seek(0)
-            saved_position = f.tell()
-            last_line = f.readline().decode()
-            f.seek(saved_position, os.SEEK_SET)
-            if 'Normal termination' in last_line:
-                return 0
-            elif 'Error termination' in last_line:
-                error_termination = True
-            elif 'All variables have been frozen' in last_line:
-                return 2
-            elif 'Problem with the distance matrix' in last_line:
-                return 3
-            elif 'No NMR shielding tensors so no spin-rotation constants' in last_line:
-                return 4
-            elif 'MANUAL SKIP' in last_line.upper():
-                return 5
-        if error_termination:
-            return 1
-        return -1
+    return gaussian_log.termination_status(log_file)
 
 
 def shell_complete(reaction_index, use_reverse=False):
@@ -220,7 +198,9 @@ def shell_complete(reaction_index, use_reverse=False):
     shell_dir = os.path.join(reaction_base_dir, 'shell')
     if not os.path.exists(shell_dir):
         return False
-    logfile = os.path.join(shell_dir, 'shell.log')
+    if state_db.is_complete('reaction', reaction_index, get_stage_name('shell', use_reverse)):
+        return True
+    stage_log = events.StageLog('reaction', reaction_index, 'shell')
 
     # Check for already finished shell logfiles
     # first, return if all of them have finished
@@ -244,13 +224,13 @@ def shell_complete(reaction_index, use_reverse=False):
                 good_runs.append(run_index)
             elif status == 2 or status == 3 or status == 4 or status == 5:
                 # print('Shell optimization already ran')
-                with open(logfile, 'a') as f:
-                    f.write('Shell optimization already ran\n')
+                stage_log.message('Shell optimization already ran')
             else:
                 matches = re.search(shell_label[:-8] + '([0-9]{4})', shell_opt_log)
                 run_index = int(matches[1])
                 incomplete_indices.append(run_index)
     if not incomplete_indices and len(good_runs) > 0:
+        state_db.set_status('reaction', reaction_index, get_stage_name('shell', use_reverse), 'complete', result_path=shell_dir)
         return True  # only if there's at least one useable run
     return False
 
@@ -258,11 +238,14 @@ def shell_complete(reaction_index, use_reverse=False):
 def run_TS_shell_calc(reaction_index, use_reverse=False, max_combos=300, max_conformers=12):
     """Start an optimization keeping the reaction center fixed
     """
+    import autotst.reaction
+    import autotst.calculator.gaussian
+    from hotbit import Hotbit
     reaction_base_dir = os.path.join(DFT_DIR, 'kinetics', f'reaction_{reaction_index:04}')
     os.makedirs(reaction_base_dir, exist_ok=True)
     shell_dir = os.path.join(reaction_base_dir, 'shell')
     os.makedirs(shell_dir, exist_ok=True)
-    logfile = os.path.join(shell_dir, 'shell.log')
+    stage_log = events.StageLog('reaction', reaction_index, 'shell')
 
     # Check for already finished shell logfiles
     # first, return if all of them have finished
@@ -280,8 +263,7 @@ def run_TS_shell_calc(reaction_index, use_reverse=False, max_combos=300, max_con
             status = termination_status(shell_opt_log)
             if status == 0 or status == 2 or status == 3 or status == 4 or status == 5:
                 print('Shell optimization already ran')
-                with open(logfile, 'a') as f:
-                    f.write('Shell optimization already ran\n')
+                stage_log.message('Shell optimization already ran')
             else:
                 matches = re.search(shell_label[:-8] + '([0-9]{4})', shell_opt_log)
                 run_index = int(matches[1])
@@ -290,33 +272,30 @@ def run_TS_shell_calc(reaction_index, use_reverse=False, max_combos=300, max_con
         return True  # only if all of them ran
 
     print('Constructing reaction in AutoTST...')
-    with open(logfile, 'a') as f:
-        f.write('Constructing reaction in AutoTST...\n')
+    stage_log.message('Constructing reaction in AutoTST...')
     reaction_smiles = reaction_index2smiles(reaction_index)
-    reaction = autotst.reaction.Reaction(label=reaction_smiles)
-    reaction.ts[direction][0].get_molecules()
-    reaction.generate_conformers(ase_calculator=Hotbit(), max_combos=max_combos, max_conformers=max_conformers)
+    with stage_log.timed('conformer_generation'):
+        reaction = autotst.reaction.Reaction(label=reaction_smiles)
+        reaction.ts[direction][0].get_molecules()
+        reaction.generate_conformers(ase_calculator=Hotbit(), max_combos=max_combos, max_conformers=max_conformers)
     print('Done generating conformers in AutoTST...')
     print(f'{len(reaction.ts[direction])} conformers found')
-    with open(logfile, 'a') as f:
-        f.write('Done generating conformers in AutoTST...\n')
-        f.write(f'{len(reaction.ts[direction])} conformers found' + '\n')
+    stage_log.message('Done generating conformers in AutoTST...')
+    stage_log.message(f'{len(reaction.ts[direction])} conformers found')
 
     # Do the shell calculations
     # write Gaussian input files
     slurm_array_idx = []
+    gaussian_inputs = {}
     restart = False
     for i in range(0, len(reaction.ts[direction])):
         if i not in incomplete_indices and len(shell_gaussian_logs) > 0:
-            with open(logfile, 'a') as f:
-                f.write(f'skipping completed shell {i}' + '\n')
+            stage_log.message(f'skipping completed shell {i}')
             restart = True
             continue
 
         shell_label = shell_label[:-8] + f'{i:04}.log'
         # TODO if the thing already ran, do not rerun it
-        slurm_array_idx.append(i)
-
         ts = reaction.ts[direction][i]
         gaussian = autotst.calculator.gaussian.Gaussian(conformer=ts)
         calc = gaussian.get_shell_calc()
@@ -325,21 +304,20 @@ def run_TS_shell_calc(reaction_index, use_reverse=False, max_combos=300, max_con
         calc.parameters.pop('scratch')
         calc.parameters.pop('multiplicity')
         calc.parameters['mult'] = ts.rmg_molecule.multiplicity
-        calc.write_input(ts.ase_molecule)
-
-        # Get rid of double-space between xyz block and mod-redundant section
-        double_space = False
-        lines = []
-        with open(os.path.join(shell_dir, calc.label + '.com'), 'r') as f:
-            lines = f.readlines()
-            for j in range(1, len(lines)):
-                if lines[j] == '\n' and lines[j - 1] == '\n':
-                    double_space = True
-                    break
-        if double_space:
-            lines = lines[0:j - 1] + lines[j:]
-            with open(os.path.join(shell_dir, calc.label + '.com'), 'w') as f:
-                f.writelines(lines)
+        com_file = os.path.join(shell_dir, calc.label + '.com')
+        gaussian_inputs[com_file] = gaussian_input.render_input(calc, ts.ase_molecule)
+
+        # don't resubmit a calculation that has already been run
+        if result_store.restore(com_file, gaussian_inputs[com_file]):
+            print(f'Restored shell {i} from the result store')
+            stage_log.message(f'Restored shell {i} from the result store')
+            continue
+        slurm_array_idx.append(i)
+
+    # write all of the input files in one batch
+    gaussian_input.write_inputs(gaussian_inputs)
+    if not slurm_array_idx:
+        return True  # everything came from the result store
 
     # make the shell slurm script
     slurm_run_file = os.path.join(shell_dir, f'run_shell_opt.sh')
@@ -386,27 +364,38 @@ def run_TS_shell_calc(reaction_index, use_reverse=False, max_combos=300, max_con
     slurm_file_writer.write_file()
 
     # submit the job
-    with open(logfile, 'a') as f:
-        f.write('Submitting shell optimization job\n')
+    stage_log.message('Submitting shell optimization job')
     start_dir = os.getcwd()
     os.chdir(shell_dir)
     shell_job = job_manager.SlurmJob()
     slurm_cmd = f"sbatch {slurm_run_file}"
     shell_job.submit(slurm_cmd)
+    stage_log.event('submitted', job_id=shell_job.job_id)
+    state_db.set_status(
+        'reaction', reaction_index, get_stage_name('shell', use_reverse), 'running', job_id=shell_job.job_id, new_attempt=True
+    )
 
     # only wait after all jobs have been submitted
     os.chdir(start_dir)
-    shell_job.wait(check_interval=60)
+    stage_log.wait_for_job(shell_job.job_id, check_interval=60)
+    result_store.record_directory(shell_dir, shell_label[:-8] + '*.com')
+    # record how the jobs ended so the stage doesn't stay running
+    if not shell_complete(reaction_index, use_reverse=use_reverse):
+        state_db.set_status('reaction', reaction_index, get_stage_name('shell', use_reverse), 'failed')
 
 
 def run_TS_center_calc(reaction_index, use_reverse=False, max_combos=300, max_conformers=12):
     """Start a constrained saddle search with the reaction center fixed
     """
+    import autotst.reaction
+    import autotst.calculator.gaussian
+    import ase.io.gaussian
+    from hotbit import Hotbit
     reaction_base_dir = os.path.join(DFT_DIR, 'kinetics', f'reaction_{reaction_index:04}')
     shell_dir = os.path.join(reaction_base_dir, 'shell')
     center_dir = os.path.join(reaction_base_dir, 'center')
     os.makedirs(center_dir, exist_ok=True)
-    logfile = os.path.join(center_dir, 'center.log')
+    stage_log = events.StageLog('reaction', reaction_index, 'center')
 
     # Check for already finished center logfiles
     # first, return if all of them have finished
@@ -428,8 +417,7 @@ def run_TS_center_calc(reaction_index, use_reverse=False, max_combos=300, max_co
             status = termination_status(center_opt_log)
             if status == 0 or status == 2 or status == 3 or status == 4 or status == 5:
                 print('Center saddle point already ran')
-                with open(logfile, 'a') as f:
-                    f.write('Center saddle point already ran\n')
+                stage_log.message('Center saddle point already ran')
             else:
                 matches = re.search(shell_label[:-8] + '([0-9]{4})', center_opt_log)
                 run_index = int(matches[1])
@@ -438,17 +426,16 @@ def run_TS_center_calc(reaction_index, use_reverse=False, max_combos=300, max_co
         return True  # only if all of them ran
 
     print('Constructing reaction in AutoTST...')
-    with open(logfile, 'a') as f:
-        f.write('Constructing reaction in AutoTST...\n')
+    stage_log.message('Constructing reaction in AutoTST...')
     reaction_smiles = reaction_index2smiles(reaction_index)
-    reaction = autotst.reaction.Reaction(label=reaction_smiles)
-    reaction.ts[direction][0].get_molecules()
-    reaction.generate_conformers(ase_calculator=Hotbit(), max_combos=max_combos, max_conformers=max_conformers)
+    with stage_log.timed('conformer_generation'):
+        reaction = autotst.reaction.Reaction(label=reaction_smiles)
+        reaction.ts[direction][0].get_molecules()
+        reaction.generate_conformers(ase_calculator=Hotbit(), max_combos=max_combos, max_conformers=max_conformers)
     print('Done generating conformers in AutoTST...')
     print(f'{len(reaction.ts[direction])} conformers found')
-    with open(logfile, 'a') as f:
-        f.write('Done generating conformers in AutoTST...\n')
-        f.write(f'{len(reaction.ts[direction])} conformers found' + '\n')
+    stage_log.message('Done generating conformers in AutoTST...')
+    stage_log.message(f'{len(reaction.ts[direction])} conformers found')
     # TODO - a way to export the reaction conformers from the shell run so we don't have to repeat it here?
 
     # define incomplete indices
@@ -464,6 +451,7 @@ def run_TS_center_calc(reaction_index, use_reverse=False, max_combos=300, max_co
 
     restart = False
     slurm_array_idx = []
+    gaussian_inputs = {}
     for i in range(0, len(reaction.ts[direction])):
         if i not in incomplete_indices and len(center_gaussian_logs) > 0:
             print(f'Skipping completed index {i}')
@@ -477,8 +465,7 @@ def run_TS_center_calc(reaction_index, use_reverse=False, max_combos=300, max_co
         status = termination_status(shell_opt)
         if status != 0:
             print(f'Skipping unconverged shell {i}')
-            with open(logfile, 'a') as f:
-                f.write(f'Skipping unconverged shell {i}')
+            stage_log.message(f'Skipping unconverged shell {i}')
             continue
 
         try:
@@ -490,8 +477,6 @@ def run_TS_center_calc(reaction_index, use_reverse=False, max_combos=300, max_co
             if len(reaction.ts[direction][i]._ase_molecule) > 3:
                 raise ValueError('Shell optimization failed to converge. Rerun it!')
 
-        slurm_array_idx.append(i)
-
         ts = reaction.ts[direction][i]
         gaussian = autotst.calculator.gaussian.Gaussian(conformer=ts)
         # calc = gaussian.get_overall_calc()
@@ -501,21 +486,20 @@ def run_TS_center_calc(reaction_index, use_reverse=False, max_combos=300, max_co
         calc.parameters.pop('scratch')
         calc.parameters.pop('multiplicity')
         calc.parameters['mult'] = ts.rmg_molecule.multiplicity
-        calc.write_input(ts.ase_molecule)
-
-        # Get rid of double-space between xyz block and mod-redundant section
-        double_space = False
-        lines = []
-        with open(os.path.join(center_dir, calc.label + '.com'), 'r') as f:
-            lines = f.readlines()
-            for j in range(1, len(lines)):
-                if lines[j] == '\n' and lines[j - 1] == '\n':
-                    double_space = True
-                    break
-        if double_space:
-            lines = lines[0:j - 1] + lines[j:]
-            with open(os.path.join(center_dir, calc.label + '.com'), 'w') as f:
-                f.writelines(lines)
+        com_file = os.path.join(center_dir, calc.label + '.com')
+        gaussian_inputs[com_file] = gaussian_input.render_input(calc, ts.ase_molecule)
+
+        # don't resubmit a calculation that has already been run
+        if result_store.restore(com_file, gaussian_inputs[com_file]):
+            print(f'Restored center {i} from the result store')
+            stage_log.message(f'Restored center {i} from the result store')
+            continue
+        slurm_array_idx.append(i)
+
+    # write all of the input files in one batch
+    gaussian_input.write_inputs(gaussian_inputs)
+    if not slurm_array_idx:
+        return True  # everything came from the result store
 
     # make the overall slurm script
     slurm_run_file = os.path.join(center_dir, f'run_center_opt.sh')
@@ -555,18 +539,33 @@ def run_TS_center_calc(reaction_index, use_reverse=False, max_combos=300, max_co
     center_job = job_manager.SlurmJob()
     slurm_cmd = f"sbatch {slurm_run_file}"
     center_job.submit(slurm_cmd)
+    stage_log.event('submitted', job_id=center_job.job_id)
+    state_db.set_status(
+        'reaction', reaction_index, get_stage_name('center', use_reverse), 'running', job_id=center_job.job_id, new_attempt=True
+    )
 
     # only wait once all jobs have been submitted
     os.chdir(start_dir)
-    center_job.wait(check_interval=60)
+    stage_log.wait_for_job(center_job.job_id, check_interval=60)
+    result_store.record_directory(center_dir, center_label[:-8] + '*.com')
+    # complete once every saddle search has terminated and at least one is usable, same as the shell
+    statuses = [
+        termination_status(center_log) for center_log in glob.glob(os.path.join(center_dir, center_label[:-8] + '*.log'))
+    ]
+    if 0 in statuses and not any(status == 1 or status == -1 for status in statuses):
+        state_db.set_status('reaction', reaction_index, get_stage_name('center', use_reverse), 'complete', result_path=center_dir)
+    else:
+        state_db.set_status('reaction', reaction_index, get_stage_name('center', use_reverse), 'failed')
 
 
 def overall_complete(reaction_index, use_reverse=False):
+    if state_db.is_complete('reaction', reaction_index, get_stage_name('overall', use_reverse)):
+        return True  # the TS index was written when it was recorded as complete
     reaction_base_dir = os.path.join(DFT_DIR, 'kinetics', f'reaction_{int(reaction_index):04}')
     os.makedirs(reaction_base_dir, exist_ok=True)
     overall_dir = os.path.join(reaction_base_dir, 'overall')
 
-    logfile = os.path.join(overall_dir, 'overall.log')
+    stage_log = events.StageLog('reaction', reaction_index, 'overall')
 
     overall_label = 'fwd_ts_0000.log'
     direction = 'forward'
@@ -585,21 +584,23 @@ def overall_complete(reaction_index, use_reverse=False):
             print(status, overall_ts_log)
             if status == 0:
                 print(f'Overall TS optimization already ran for reaction {overall_ts_log}')
-                with open(logfile, 'a') as f:
-                    f.write(f'Overall TS optimization already ran for reaction {overall_ts_log}' + '\n')
+                stage_log.message(f'Overall TS optimization already ran for reaction {overall_ts_log}')
             elif status == 2 or status == 3 or status == 4 or status == 5:  # completed but with error
                 matches = re.search(overall_label[:-8] + '([0-9]{4})', overall_ts_log)
                 run_index = int(matches[1])
                 # incomplete_indices.append(run_index)
                 print(f'Overall TS optimization ran with error for {overall_ts_log}')
-                with open(logfile, 'a') as f:
-                    f.write(f'Overall TS optimization ran with error for {overall_ts_log}' + '\n')
+                stage_log.message(f'Overall TS optimization ran with error for {overall_ts_log}')
             else:
                 matches = re.search(overall_label[:-8] + '([0-9]{4})', overall_ts_log)
                 run_index = int(matches[1])
                 incomplete_indices.append(run_index)
     print(incomplete_indices)
     if not incomplete_indices and len(overall_gaussian_logs) > 0:
+        # the TS energy index is kept up to date by run_TS_overall_calc, this is only a check
+        state_db.set_status(
+            'reaction', reaction_index, get_stage_name('overall', use_reverse), 'complete', result_path=overall_dir
+        )
         return True
     return False
 
@@ -607,6 +608,10 @@ def overall_complete(reaction_index, use_reverse=False):
 def run_TS_overall_calc(reaction_index, use_reverse=False, max_combos=300, max_conformers=12):
     """Start a TS optimization from the geometry of the shell calculation
     """
+    import autotst.reaction
+    import autotst.calculator.gaussian
+    import ase.io.gaussian
+    from hotbit import Hotbit
     reaction_base_dir = os.path.join(DFT_DIR, 'kinetics', f'reaction_{reaction_index:04}')
     os.makedirs(reaction_base_dir, exist_ok=True)
 
@@ -614,7 +619,7 @@ def run_TS_overall_calc(reaction_index, use_reverse=False, max_combos=300, max_c
     overall_dir = os.path.join(reaction_base_dir, 'overall')
     os.makedirs(overall_dir, exist_ok=True)
 
-    logfile = os.path.join(overall_dir, 'overall.log')
+    stage_log = events.StageLog('reaction', reaction_index, 'overall')
 
     overall_label = 'fwd_ts_0000.log'
     direction = 'forward'
@@ -629,17 +634,16 @@ def run_TS_overall_calc(reaction_index, use_reverse=False, max_combos=300, max_c
         return True
 
     print('Constructing reaction in AutoTST...')
-    with open(logfile, 'a') as f:
-        f.write('Constructing reaction in AutoTST...\n')
+    stage_log.message('Constructing reaction in AutoTST...')
     reaction_smiles = reaction_index2smiles(reaction_index)
-    reaction = autotst.reaction.Reaction(label=reaction_smiles)
-    reaction.ts[direction][0].get_molecules()
-    reaction.generate_conformers(ase_calculator=Hotbit(), max_combos=max_combos, max_conformers=max_conformers)
+    with stage_log.timed('conformer_generation'):
+        reaction = autotst.reaction.Reaction(label=reaction_smiles)
+        reaction.ts[direction][0].get_molecules()
+        reaction.generate_conformers(ase_calculator=Hotbit(), max_combos=max_combos, max_conformers=max_conformers)
     print('Done generating conformers in AutoTST...')
     print(f'{len(reaction.ts[direction])} conformers found')
-    with open(logfile, 'a') as f:
-        f.write('Done generating conformers in AutoTST...\n')
-        f.write(f'{len(reaction.ts[direction])} conformers found' + '\n')
+    stage_log.message('Done generating conformers in AutoTST...')
+    stage_log.message(f'{len(reaction.ts[direction])} conformers found')
     # TODO - a way to export the reaction conformers from the shell run so we don't have to repeat it here?
 
     # define incomplete indices
@@ -655,6 +659,7 @@ def run_TS_overall_calc(reaction_index, use_reverse=False, max_combos=300, max_c
 
     restart = False
     slurm_array_idx = []
+    gaussian_inputs = {}
     for i in range(0, len(reaction.ts[direction])):
         if i not in incomplete_indices and len(overall_gaussian_logs) > 0:
             print(f'Skipping completed index {i}')
@@ -666,16 +671,14 @@ def run_TS_overall_calc(reaction_index, use_reverse=False, max_combos=300, max_c
         
         if not os.path.exists(shell_opt):
             print(f'WHY does it think this shell log should exist??? {shell_opt}')
-            with open(logfile, 'a') as f:
-                f.write(f'WHY does it think this shell log should exist??? {shell_opt}')
+            stage_log.message(f'WHY does it think this shell log should exist??? {shell_opt}')
             continue
 
         # skip shell conformers that didn't converge
         status = termination_status(shell_opt)
         if status != 0:
             print(f'Skipping unconverged shell {i}')
-            with open(logfile, 'a') as f:
-                f.write(f'Skipping unconverged shell {i}')
+            stage_log.message(f'Skipping unconverged shell {i}')
             continue
 
         try:
@@ -687,8 +690,6 @@ def run_TS_overall_calc(reaction_index, use_reverse=False, max_combos=300, max_c
             if len(reaction.ts[direction][i]._ase_molecule) > 3:
                 raise ValueError('Shell optimization failed to converge. Rerun it!')
 
-        slurm_array_idx.append(i)
-
         ts = reaction.ts[direction][i]
         gaussian = autotst.calculator.gaussian.Gaussian(conformer=ts)
         calc = gaussian.get_overall_calc()
@@ -697,21 +698,21 @@ def run_TS_overall_calc(reaction_index, use_reverse=False, max_combos=300, max_c
         calc.parameters.pop('scratch')
         calc.parameters.pop('multiplicity')
         calc.parameters['mult'] = ts.rmg_molecule.multiplicity
-        calc.write_input(ts.ase_molecule)
-
-        # Get rid of double-space between xyz block and mod-redundant section
-        double_space = False
-        lines = []
-        with open(os.path.join(overall_dir, calc.label + '.com'), 'r') as f:
-            lines = f.readlines()
-            for j in range(1, len(lines)):
-                if lines[j] == '\n' and lines[j - 1] == '\n':
-                    double_space = True
-                    break
-        if double_space:
-            lines = lines[0:j - 1] + lines[j:]
-            with open(os.path.join(overall_dir, calc.label + '.com'), 'w') as f:
-                f.writelines(lines)
+        com_file = os.path.join(overall_dir, calc.label + '.com')
+        gaussian_inputs[com_file] = gaussian_input.render_input(calc, ts.ase_molecule)
+
+        # don't resubmit a calculation that has already been run
+        if result_store.restore(com_file, gaussian_inputs[com_file]):
+            print(f'Restored overall {i} from the result store')
+            stage_log.message(f'Restored overall {i} from the result store')
+            continue
+        slurm_array_idx.append(i)
+
+    # write all of the input files in one batch
+    gaussian_input.write_inputs(gaussian_inputs)
+    if not slurm_array_idx:
+        ts_index.update_ts_index(reaction_index, use_reverse=use_reverse)
+        return True  # everything came from the result store
 
     # make the overall slurm script
     slurm_run_file = os.path.join(overall_dir, f'run_overall_opt.sh')
@@ -741,7 +742,10 @@ def run_TS_overall_calc(reaction_index, use_reverse=False, max_combos=300, max_c
         'RUN_i=$(printf "%04.0f" $(($SLURM_ARRAY_TASK_ID)))\n',
         f'fname="{overall_label[:-8]}' + '${RUN_i}.com"\n\n',
 
-        'g16 $fname\n',
+        'g16 $fname\n\n',
+
+        '# add this TS energy to the index\n',
+        f'python {os.path.abspath(ts_index.__file__)} {reaction_index}' + (' --reverse\n' if use_reverse else '\n'),
     ]
     slurm_file_writer.write_file()
 
@@ -751,14 +755,28 @@ def run_TS_overall_calc(reaction_index, use_reverse=False, max_combos=300, max_c
     overall_job = job_manager.SlurmJob()
     slurm_cmd = f"sbatch {slurm_run_file}"
     overall_job.submit(slurm_cmd)
+    stage_log.event('submitted', job_id=overall_job.job_id)
+    state_db.set_status(
+        'reaction', reaction_index, get_stage_name('overall', use_reverse), 'running', job_id=overall_job.job_id, new_attempt=True
+    )
 
     # only wait once all jobs have been submitted
     os.chdir(start_dir)
-    overall_job.wait(check_interval=60)
+    stage_log.wait_for_job(overall_job.job_id, check_interval=60)
+    result_store.record_directory(overall_dir, overall_label[:-8] + '*.com')
+    ts_index.update_ts_index(reaction_index, use_reverse=use_reverse)
+    if not overall_complete(reaction_index, use_reverse=use_reverse):
+        state_db.set_status('reaction', reaction_index, get_stage_name('overall', use_reverse), 'failed')
 
 
 def arkane_complete(reaction_index):
-    return os.path.exists(os.path.join(DFT_DIR, 'kinetics', f'reaction_{reaction_index:04}', 'arkane', 'RMG_libraries', 'reactions.py'))
+    if state_db.is_complete('reaction', reaction_index, 'arkane'):
+        return True
+    arkane_result = os.path.join(DFT_DIR, 'kinetics', f'reaction_{reaction_index:04}', 'arkane', 'RMG_libraries', 'reactions.py')
+    if os.path.exists(arkane_result):
+        state_db.set_status('reaction', reaction_index, 'arkane', 'complete', result_path=arkane_result)
+        return True
+    return False
 
 
 def run_arkane_job(reaction_index):
@@ -788,18 +806,16 @@ def run_arkane_job(reaction_index):
     # apparently subprocess.call is blocking and subprocess.Popen is not
     proc = subprocess.call(cmd_pieces)
 
-    # Run the arkane job
-    start_dir = os.getcwd()
-    os.chdir(arkane_dir)
-    # arkane_job = job_manager.SlurmJob()
-    slurm_cmd = f"sbatch run_arkane.sh"
-    slurm_pieces = slurm_cmd.split()
-    proc = subprocess.call(slurm_pieces)
-    # arkane_job.submit(slurm_cmd)
+    # Run the arkane job here instead of submitting run_arkane.sh
+    batch_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'batch_arkane.py')
+    proc = subprocess.call(['python', batch_script, '1', arkane_dir])
+    return arkane_complete(reaction_index)
 
 
 def run_vibrational_analysis(reaction_smiles, reaction_logfile):
     # runs the vibrational analysis check for a given TS, returns True if the TS is confirmed
+    import autotst.reaction
+    import autotst.calculator.vibrational_analysis
     reaction = autotst.reaction.Reaction(label=reaction_smiles)
     va = autotst.calculator.vibrational_analysis.VibrationalAnalysis(
         transitionstate=reaction.ts['forward'][0], log_file=reaction_logfile
@@ -811,6 +827,9 @@ def run_vibrational_analysis(reaction_smiles, reaction_logfile):
 def vibrational_analysis_confirms_ts(reaction_index):
     # Check whether TS is confirmed by vibrational analysis alone
     # If confirmed, there will be a vibrational_analysis_check.txt file in the arkane directory with True
+    status = state_db.get_status('reaction', reaction_index, 'vibrational_analysis')
+    if status in ('complete', 'failed'):
+        return status == 'complete'
     reaction_dir = os.path.join(DFT_DIR, 'kinetics', f'reaction_{reaction_index:04}')
     vib_file = os.path.join(reaction_dir, 'arkane', 'vibrational_analysis_check.txt')
 
@@ -819,6 +838,10 @@ def vibrational_analysis_confirms_ts(reaction_index):
 
     with open(vib_file, 'r') as f:
         vib_check = f.read()
+    state_db.set_status(
+        'reaction', reaction_index, 'vibrational_analysis', 'complete' if vib_check == 'True' else 'failed',
+        result_path=vib_file
+    )
     if vib_check == 'True':
         return True
     return False
@@ -826,11 +849,14 @@ def vibrational_analysis_confirms_ts(reaction_index):
 
 def run_IRC_check(reaction_index, force_irc=False):
     # TODO get this to run using only smiles
+    import autotst.reaction
+    import autotst.calculator.gaussian
+    import ase.io.gaussian
     reaction_smiles = reaction_index2smiles(reaction_index)
     print(f'starting run_IRC_check for reaction {reaction_index} {reaction_smiles}')
     reaction_dir = os.path.join(DFT_DIR, 'kinetics', f'reaction_{reaction_index:04}')
     irc_dir = os.path.join(reaction_dir, 'irc')
-    logfile = os.path.join(irc_dir, 'irc.log')
+    stage_log = events.StageLog('reaction', reaction_index, 'irc')
     os.makedirs(irc_dir, exist_ok=True)
 
     # Try the vibrational analysis check first
@@ -843,8 +869,13 @@ def run_IRC_check(reaction_index, force_irc=False):
     vib_check_result = run_vibrational_analysis(reaction_smiles, reaction_logfile)
     # save result to file
     # with open(os.path.join(irc_dir, 'vibrational_analysis_check.txt'), 'w') as f:  # maybe it does belong in irc folder
-    with open(os.path.join(reaction_dir, 'arkane', 'vibrational_analysis_check.txt'), 'w') as f:
+    vib_file = os.path.join(reaction_dir, 'arkane', 'vibrational_analysis_check.txt')
+    with open(vib_file, 'w') as f:
         f.write(str(vib_check_result))
+    state_db.set_status(
+        'reaction', reaction_index, 'vibrational_analysis', 'complete' if vib_check_result else 'failed',
+        result_path=vib_file
+    )
 
     if vib_check_result and not force_irc:
         # IRC check is confirmed with vibrational analysis
@@ -855,18 +886,21 @@ def run_IRC_check(reaction_index, force_irc=False):
     # TODO check for previous run of IRC
 
     # figure out if we need to restart the IRC
-    if os.path.exists(os.path.join(irc_dir, 'irc_result.txt')):
-        with open(irc_dir, 'irc_result.txt', 'r') as f:
+    if state_db.is_complete('reaction', reaction_index, 'irc'):
+        return True
+    irc_result_file = os.path.join(irc_dir, 'irc_result.txt')
+    if os.path.exists(irc_result_file):
+        with open(irc_result_file, 'r') as f:
             irc_result = f.read()
         if irc_result == 'True':
+            state_db.set_status('reaction', reaction_index, 'irc', 'complete', result_path=irc_result_file)
             return True
         else:
             # TODO - restart the IRC
             pass
 
     print('Constructing reaction in AutoTST...')
-    with open(logfile, 'a') as f:
-        f.write('Constructing reaction in AutoTST...\n')
+    stage_log.message('Constructing reaction in AutoTST...')
 
     reaction = autotst.reaction.Reaction(label=reaction_smiles)
     direction = 'forward'
@@ -877,9 +911,8 @@ def run_IRC_check(reaction_index, force_irc=False):
 
     print('Done generating conformers in AutoTST...')
     print(f'{len(reaction.ts[direction])} conformers found')
-    with open(logfile, 'a') as f:
-        f.write('Done generating conformers in AutoTST...\n')
-        f.write(f'{len(reaction.ts[direction])} conformers found' + '\n')
+    stage_log.message('Done generating conformers in AutoTST...')
+    stage_log.message(f'{len(reaction.ts[direction])} conformers found')
     # TODO - a way to export the reaction conformers from the shell run so we don't have to repeat it here?
 
     # get the conformer index associated with the reaction log file
@@ -938,7 +971,21 @@ def run_IRC_check(reaction_index, force_irc=False):
     irc_job = job_manager.SlurmJob()
     slurm_cmd = f"sbatch {slurm_run_file}"
     irc_job.submit(slurm_cmd)
+    stage_log.event('submitted', job_id=irc_job.job_id)
+    state_db.set_status('reaction', reaction_index, 'irc', 'running', job_id=irc_job.job_id, new_attempt=True)
 
     # only wait once all jobs have been submitted
     os.chdir(start_dir)
-    irc_job.wait(check_interval=60)
+    stage_log.wait_for_job(irc_job.job_id, check_interval=60)
+
+    # whether the IRC connects the right species goes in irc_result.txt, which is checked separately,
+    # so a finished IRC goes back to pending until then and one that didn't finish is failed
+    irc_log = os.path.join(irc_dir, irc_label)
+    if os.path.exists(irc_result_file):
+        with open(irc_result_file, 'r') as f:
+            irc_status = 'complete' if f.read() == 'True' else 'failed'
+        state_db.set_status('reaction', reaction_index, 'irc', irc_status, result_path=irc_result_file)
+    elif os.path.exists(irc_log) and termination_status(irc_log) == 0:
+        state_db.set_status('reaction', reaction_index, 'irc', 'pending')
+    else:
+        state_db.set_status('reaction', reaction_index, 'irc', 'failed')
@@ -1,27 +1,15 @@
-import kineticfun
+# Lists the H abstraction reactions using the family table from classify_reactions.py
+import sys
+import classify_reactions
 
-import autotst.species
-import autotst.reaction
-import autotst.calculator.gaussian
 
+n_procs = None
+if len(sys.argv) > 1:
+    n_procs = int(sys.argv[1])
 
-N = kineticfun.get_num_reactions()
-h_abstractions = []
-for reaction_index in range(0, N):
-    reaction_smiles = kineticfun.reaction_index2smiles(reaction_index)
-    if "[C-]#[O+]" in reaction_smiles:  # might be able to get by with replacing it as [C]#[O]
-        print(f'skipping {reaction_smiles}')
-        continue
+# classifies any reactions that aren't in the table yet
+family_table = classify_reactions.classify_reactions(n_procs=n_procs)
 
-    # print(reaction_smiles)
-    reaction = autotst.reaction.Reaction(label=reaction_smiles)
-    try:
-        reaction.get_labeled_reaction()
-    except AssertionError:
-        print(f'skipping {reaction_smiles}')
-        continue
-    print(reaction_smiles, '\t', reaction.rmg_reaction.family)
-    h_abstractions.append(f'{reaction_index}:' + '\t' + f'{reaction_smiles}' + '\t' + f'{reaction.rmg_reaction.family}')
-
-for reaction in h_abstractions:
-    print(reaction)
+for reaction_index, row in family_table.iterrows():
+    if row['family'] == 'H_Abstraction' and classify_reactions.get_skip_reason(reaction_index, family_table) is None:
+        print(f'{reaction_index}:' + '\t' + f'{row["SMILES"]}' + '\t' + f'{row["family"]}')
@@ -1,6 +1,7 @@
 # script to run with infinite time on west partition and go through one kinetics calculation
 import sys
 import kineticfun
+import classify_reactions
 
 
 reaction_index = int(sys.argv[1])
@@ -10,6 +11,11 @@ if kineticfun.arkane_complete(reaction_index):
     print(f'Kinetics already calculated for reaction {reaction_index}')
     exit(0)
 
+skip_reason = classify_reactions.get_skip_reason(reaction_index)
+if skip_reason:
+    print(f'Skipping reaction {reaction_index}: {skip_reason}')
+    exit(0)
+
 # kineticfun.run_TS_shell_calc(reaction_index, use_reverse=True)
 # kineticfun.run_TS_overall_calc(reaction_index, use_reverse=True)
 combos = 300
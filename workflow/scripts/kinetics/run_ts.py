@@ -0,0 +1,19 @@
+# script to run the TS searches for one reaction (shell and overall optimizations) without Arkane
+# used by the Snakemake kinetics rules, which run Arkane as a separate step
+import sys
+import kineticfun
+import ts_index
+
+
+reaction_index = int(sys.argv[1])
+print(kineticfun.reaction_index2smiles(reaction_index))
+
+combos = 300
+kineticfun.run_TS_shell_calc(reaction_index, max_combos=combos, max_conformers=12)
+kineticfun.run_TS_overall_calc(reaction_index, max_combos=combos, max_conformers=12)
+
+# make sure the index exists even if every overall job had already finished
+ts_index.update_ts_index(reaction_index)
+if ts_index.lowest_energy_ts(reaction_index) is None:
+    print(f'No overall TS optimization finished for reaction {reaction_index}')
+    exit(1)
@@ -1,9 +1,6 @@
 import os
 import glob
-import shutil
 
-import arkane.ess.gaussian
-import arkane.exceptions
 import autotst.reaction
 import rmgpy.chemkin
 
@@ -11,10 +8,13 @@ import rmgpy.chemkin
 
 import sys
 import kineticfun
+import ts_index
 
 sys.path.append('/work/westgroup/harris.se/autoscience/autoscience_workflow/workflow/scripts/thermo/')
 sys.path.append('/work/westgroup/harris.se/autoscience/autoscience_workflow/workflow/scripts/kinetics/')
+sys.path.append('/work/westgroup/harris.se/autoscience/autoscience_workflow/workflow/scripts/')
 import job
+import staging
 
 
 def get_reaction_label(rmg_reaction):
@@ -71,20 +71,10 @@ reaction.ts[direction][0].get_molecules()
 # reaction.generate_conformers(ase_calculator=Hotbit())  # probably have to add this back in for multiple TS handling
 
 
-# pick the lowest energy transition state:
-TS_logs = glob.glob(os.path.join(overall_dir, f'fwd_ts_*.log'))
-TS_log = ''
-lowest_energy = 0
-for logfile in TS_logs:
-    try:
-        g_reader = arkane.ess.gaussian.GaussianLog(logfile)
-        energy = g_reader.load_energy()
-        if energy < lowest_energy:
-            lowest_energy = energy
-            TS_log = logfile
-    except arkane.exceptions.LogError:
-        print(f'skipping bad logfile {logfile}')
-        continue
+# pick the lowest energy transition state from the index written when the overall jobs finished
+TS_log = ts_index.lowest_energy_ts(reaction_index)
+if TS_log is None:
+    raise OSError(f'No completed overall TS optimization for reaction {reaction_index}')
 
 # ----------------------------------------------------------------- #
 # write the input file
@@ -125,12 +115,9 @@ for reactant in reaction.rmg_reaction.reactants + reaction.rmg_reaction.products
 
     species_file = os.path.join(f'species_{species_index:04}', os.path.basename(glob.glob(os.path.join(species_arkane_dir, 'conformer_*.py'))[0]))
 
-    try:
-        shutil.copytree(species_arkane_dir, os.path.join(arkane_dir, f'species_{species_index:04}'))
-    except FileExistsError:
-        pass
+    # link the species files in instead of copying them - use staging.export_bundle to get a portable copy
+    staging.stage_tree(species_arkane_dir, os.path.join(arkane_dir, f'species_{species_index:04}'))
 
-    # TODO - copy the species into the destination so the arkane calculation can be copied and redone elsewhere
     lines.append(f'species("{species_name}", "{species_file}", structure=SMILES("{species_smiles}"))\n')
     lines.append(f'thermo("{species_name}", "NASA")\n\n')
 
@@ -146,7 +133,7 @@ lines.append('\n')
 TS_name = 'TS'
 TS_file = 'TS.py'
 TS_arkane_path = os.path.join(arkane_dir, TS_file)
-shutil.copy(TS_log, arkane_dir)
+staging.stage_file(TS_log, arkane_dir)
 
 lines.append(f'transitionState("{TS_name}", "{TS_file}")\n')
 
@@ -0,0 +1,132 @@
+# Functions for keeping an index of the overall TS optimizations for a reaction
+# overall/ts_energies.csv has one row per TS log with its termination status and final SCF energy,
+# so choosing the lowest energy TS is a lookup instead of parsing every log with Arkane
+#
+# Usage: python ts_index.py reaction_index [--reverse]
+import os
+import csv
+import sys
+import glob
+import fcntl
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import gaussian_log
+
+
+try:
+    DFT_DIR = os.environ['DFT_DIR']
+except KeyError:
+    DFT_DIR = "/work/westgroup/harris.se/autoscience/autoscience/butane/dft"
+
+INDEX_COLUMNS = ['log', 'size', 'mtime_ns', 'status', 'energy']
+
+
+def get_index_file(reaction_index):
+    return os.path.join(DFT_DIR, 'kinetics', f'reaction_{int(reaction_index):04}', 'overall', 'ts_energies.csv')
+
+
+def read_ts_index(reaction_index):
+    """Returns the index as a list of row dictionaries, empty if it hasn't been written yet
+    """
+    index_file = get_index_file(reaction_index)
+    if not os.path.exists(index_file):
+        return []
+    with open(index_file, 'r', newline='') as f:
+        rows = list(csv.DictReader(f))
+    for row in rows:
+        row['size'] = int(row['size'])
+        row['mtime_ns'] = int(row['mtime_ns'])
+        row['status'] = int(row['status'])
+        row['energy'] = float(row['energy']) if row['energy'] else None
+    return rows
+
+
+def write_ts_index(reaction_index, rows):
+    # every writer gets its own temporary file so concurrent array tasks can't clobber each other's
+    index_file = get_index_file(reaction_index)
+    fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(index_file), prefix='ts_energies_', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=INDEX_COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(tmp_file, index_file)
+    except BaseException:
+        os.remove(tmp_file)
+        raise
+
+
+def update_ts_index(reaction_index, use_reverse=False):
+    """Adds new or changed overall TS logs to the index and writes it back out
+    Logs whose size and modification time haven't changed are not read again
+    Returns the updated index
+    """
+    overall_dir = os.path.dirname(get_index_file(reaction_index))
+    if not os.path.exists(overall_dir):
+        return []
+
+    # each overall array task runs this when its optimization finishes, so hold a lock over the
+    # whole read-modify-write or one task's rows can be lost to another's
+    with open(get_index_file(reaction_index) + '.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        return _update_ts_index(reaction_index, use_reverse=use_reverse)
+
+
+def _update_ts_index(reaction_index, use_reverse=False):
+    overall_dir = os.path.dirname(get_index_file(reaction_index))
+    prefix = 'rev_ts_' if use_reverse else 'fwd_ts_'
+
+    known = {row['log']: row for row in read_ts_index(reaction_index)}
+
+    rows = []
+    changed = False
+    for logfile in sorted(glob.glob(os.path.join(overall_dir, prefix + '*.log'))):
+        log = os.path.basename(logfile)
+        stat = os.stat(logfile)
+        if log in known and known[log]['size'] == stat.st_size and known[log]['mtime_ns'] == stat.st_mtime_ns:
+            rows.append(known.pop(log))
+            continue
+        known.pop(log, None)
+        status, energy = gaussian_log.summarize_log(logfile)
+        rows.append({'log': log, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'status': status, 'energy': energy})
+        changed = True
+
+    # keep the entries for the other direction
+    for log, row in known.items():
+        if log.startswith(prefix):
+            changed = True  # log was deleted
+        else:
+            rows.append(row)
+
+    if changed:
+        write_ts_index(reaction_index, rows)
+    return rows
+
+
+def get_ts_ranking(reaction_index, use_reverse=False):
+    """Returns the normally terminated TS log rows sorted from lowest to highest energy
+    """
+    prefix = 'rev_ts_' if use_reverse else 'fwd_ts_'
+    index = update_ts_index(reaction_index, use_reverse=use_reverse)
+    ranking = [
+        row for row in index
+        if row['status'] == 0 and row['energy'] is not None and row['log'].startswith(prefix)
+    ]
+    return sorted(ranking, key=lambda row: row['energy'])
+
+
+def lowest_energy_ts(reaction_index, use_reverse=False):
+    """Returns the full path to the lowest energy TS log, or None if no overall optimization finished
+    """
+    ranking = get_ts_ranking(reaction_index, use_reverse=use_reverse)
+    if len(ranking) == 0:
+        return None
+    return os.path.join(os.path.dirname(get_index_file(reaction_index)), ranking[0]['log'])
+
+
+if __name__ == '__main__':
+    reaction_index = int(sys.argv[1])
+    use_reverse = '--reverse' in sys.argv[2:]
+    for row in get_ts_ranking(reaction_index, use_reverse=use_reverse):
+        print(row['log'], row['energy'])
@@ -0,0 +1,161 @@
+# Fast TS check across many reactions before running Arkane
+# For each reaction, reads arkane/fwd_*.log once, checks that there is exactly one imaginary frequency
+# and that its normal mode moves the labeled reacting atoms (*1, *2, *3).
+# The reactions are spread across a process pool and the results go into one table.
+#
+# Usage: python ts_screen.py [n_workers] [reaction_index ...]
+import os
+import sys
+import glob
+import concurrent.futures
+
+import numpy as np
+import pandas as pd
+
+import classify_reactions
+
+
+try:
+    DFT_DIR = os.environ['DFT_DIR']
+except KeyError:
+    DFT_DIR = "/work/westgroup/harris.se/autoscience/autoscience/butane/dft"
+
+SCREEN_RESULTS_FILE = os.path.join(DFT_DIR, 'kinetics', 'ts_screen_results.csv')
+
+
+def read_normal_modes(logfile):
+    """Reads the frequencies and normal mode displacements from a Gaussian freq log
+    Returns (frequencies in cm^-1, displacements with shape (n_modes, n_atoms, 3))
+    Only the last frequency calculation in the log is kept
+    """
+    frequencies = []
+    modes = []
+    with open(logfile, 'r') as f:
+        line = f.readline()
+        while line:
+            if 'Harmonic frequencies (cm**-1)' in line:
+                frequencies = []
+                modes = []
+            elif 'Frequencies --' in line and 'Frequencies ---' not in line:
+                block_frequencies = [float(token) for token in line.split()[2:]]
+                n_block = len(block_frequencies)
+                # skip ahead to the displacement table
+                while line and ('Atom' not in line or 'AN' not in line):
+                    line = f.readline()
+                block_modes = [[] for i in range(0, n_block)]
+                line = f.readline()
+                tokens = line.split()
+                while len(tokens) == 2 + 3 * n_block:
+                    for j in range(0, n_block):
+                        block_modes[j].append([float(x) for x in tokens[2 + 3 * j: 5 + 3 * j]])
+                    line = f.readline()
+                    tokens = line.split()
+                frequencies += block_frequencies
+                modes += block_modes
+                continue
+            line = f.readline()
+    return np.array(frequencies), np.array(modes)
+
+
+def get_reacting_atoms(reaction_smiles):
+    """Returns the indices of the labeled atoms (*1, *2, *3...) in the forward TS made by AutoTST
+    The TS log was written from this TS, so the atom order matches the log
+    AutoTST keeps the RMG database on the class, so it's only loaded once per process
+    """
+    import autotst.reaction
+
+    reaction = autotst.reaction.Reaction(label=reaction_smiles)
+    reaction.get_labeled_reaction()
+    ts = reaction.ts['forward'][0]
+    return [i for i, atom in enumerate(ts.rmg_molecule.atoms) if atom.label and atom.label.startswith('*')]
+
+
+def screen_ts(reaction_index, reaction_smiles, reacting_atoms=None, min_reacting_fraction=0.5):
+    """Checks one TS log. Returns a dictionary that becomes one row of the results table
+    The TS passes if it has one imaginary frequency, the atom that moves the most in that mode
+    is a reacting atom, and at least min_reacting_fraction of the motion is on the reacting atoms
+    """
+    result = {
+        'i': reaction_index,
+        'SMILES': reaction_smiles,
+        'log': None,
+        'n_imaginary': None,
+        'imaginary_frequency': None,
+        'reacting_fraction': None,
+        'valid': False,
+        'reason': '',
+    }
+    logs = glob.glob(os.path.join(DFT_DIR, 'kinetics', f'reaction_{reaction_index:04}', 'arkane', 'fwd_*.log'))
+    if len(logs) != 1:
+        result['reason'] = f'expected 1 TS log in arkane, found {len(logs)}'
+        return result
+    result['log'] = os.path.basename(logs[0])
+
+    try:
+        frequencies, modes = read_normal_modes(logs[0])
+    except (ValueError, IndexError):
+        result['reason'] = 'could not read frequencies'
+        return result
+    imaginary = np.where(frequencies < 0.0)[0]
+    result['n_imaginary'] = len(imaginary)
+    if len(imaginary) != 1:
+        result['reason'] = f'{len(imaginary)} imaginary frequencies'
+        return result
+    result['imaginary_frequency'] = frequencies[imaginary[0]]
+
+    try:
+        if reacting_atoms is None:
+            reacting_atoms = get_reacting_atoms(reaction_smiles)
+    except Exception as e:
+        result['reason'] = f'could not label reaction: {e}'
+        return result
+    if not reacting_atoms:
+        result['reason'] = 'no labeled atoms'
+        return result
+
+    displacement = np.sum(modes[imaginary[0]] ** 2, axis=1)
+    result['reacting_fraction'] = np.sum(displacement[reacting_atoms]) / np.sum(displacement)
+    if np.argmax(displacement) not in reacting_atoms:
+        result['reason'] = 'largest displacement is not on a reacting atom'
+    elif result['reacting_fraction'] < min_reacting_fraction:
+        result['reason'] = 'imaginary mode is not localized on the reacting atoms'
+    else:
+        result['valid'] = True
+    return result
+
+
+def screen_reactions(reaction_indices, n_workers=None):
+    """Screens many reactions across a process pool and returns the results as a DataFrame
+    """
+    reaction_df = pd.read_csv(os.path.join(DFT_DIR, 'reaction_list.csv'))
+    reaction_smiles = [reaction_df['SMILES'].values[i] for i in reaction_indices]
+
+    # use the labeled atoms from classify_reactions.py where available instead of rebuilding the TS
+    family_table = classify_reactions.read_family_table()
+    reacting_atoms = []
+    for i in reaction_indices:
+        labeled_atoms = classify_reactions.get_labeled_atoms(i, family_table=family_table)
+        reacting_atoms.append(sorted(labeled_atoms.values()) if labeled_atoms else None)
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=n_workers) as executor:
+        results = list(executor.map(screen_ts, reaction_indices, reaction_smiles, reacting_atoms, chunksize=4))
+    return pd.DataFrame(results)
+
+
+if __name__ == '__main__':
+    n_workers = None
+    if len(sys.argv) > 1:
+        n_workers = int(sys.argv[1])
+
+    if len(sys.argv) > 2:
+        reaction_indices = [int(i) for i in sys.argv[2:]]
+    else:
+        # every reaction that has a TS staged for Arkane
+        reaction_logs = glob.glob(os.path.join(DFT_DIR, 'kinetics', 'reaction_*', 'arkane', 'fwd_*.log'))
+        reaction_indices = sorted(set([
+            int(os.path.basename(os.path.dirname(os.path.dirname(log)))[-4:]) for log in reaction_logs
+        ]))
+
+    results = screen_reactions(reaction_indices, n_workers=n_workers)
+    results.to_csv(SCREEN_RESULTS_FILE, index=False)
+    print(f'{np.sum(results["valid"])} of {len(results)} TS passed, results written to {SCREEN_RESULTS_FILE}')
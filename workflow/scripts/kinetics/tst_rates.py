@@ -0,0 +1,247 @@
+# Conventional transition state theory rates straight from the Gaussian logs
+# This is the calculation from example_tst_kinetics.ipynb turned into array operations,
+# so rates for many reactions over any temperature grid come out of a few numpy calls.
+# It is meant for quick screening - Arkane is still the reference for the final kinetics.
+#
+# Usage: python tst_rates.py [output.csv]
+# fits k(T) for every reaction with a finished TS and writes the Arrhenius parameters
+import os
+import sys
+import glob
+
+import numpy as np
+import pandas as pd
+
+
+try:
+    DFT_DIR = os.environ['DFT_DIR']
+except KeyError:
+    DFT_DIR = "/work/westgroup/harris.se/autoscience/autoscience/butane/dft"
+
+# Constants, SI units
+kb = 1.380649e-23  # J/K
+h = 6.62607015e-34  # J s
+c = 29979245800.0  # speed of light in cm/s
+N_av = 6.02214076e23  # 1/mol
+R = 8.31446261815324  # J/mol K
+amu = 1.66053906660e-27  # kg
+hartree = 4.3597447222071e-18  # J
+
+FREQUENCY_SCALE_FACTOR = 0.982  # M06-2X/cc-pVTZ, same as the Arkane inputs
+
+
+def read_log_record(logfile):
+    """Parses the parts of a Gaussian freq job log that TST needs
+    Returns a dictionary with
+    E0: sum of electronic and zero-point energies (Hartree)
+    mass: molecular mass (amu)
+    multiplicity: spin multiplicity, used as the electronic degeneracy
+    symmetry: rotational symmetry number
+    rotational_temperatures: array of 0 (atom), 1 (linear) or 3 (nonlinear) values in K
+    frequencies: real frequencies (cm^-1)
+    imaginary_frequencies: imaginary frequencies as negative numbers (cm^-1)
+    """
+    record = {
+        'E0': None,
+        'mass': None,
+        'multiplicity': 1,
+        'symmetry': 1.0,
+        'rotational_temperatures': np.array([]),
+        'frequencies': [],
+        'imaginary_frequencies': [],
+    }
+    frequencies = []
+    with open(logfile, 'r') as f:
+        for line in f:
+            if 'Multiplicity =' in line:
+                record['multiplicity'] = int(line.split()[-1])
+            elif 'Harmonic frequencies (cm**-1)' in line:
+                frequencies = []  # only keep the last frequency calculation in the log
+            elif 'Frequencies --' in line and 'Frequencies ---' not in line:
+                frequencies += [float(token) for token in line.split()[2:]]
+            elif 'Molecular mass:' in line:
+                record['mass'] = float(line.split()[2])
+            elif 'Rotational symmetry number' in line:
+                record['symmetry'] = float(line.split()[-1].rstrip('.'))
+            elif 'Rotational temperature' in line and '(Kelvin)' in line:
+                record['rotational_temperatures'] = np.array([float(token) for token in line.split('(Kelvin)')[-1].split()])
+            elif 'Sum of electronic and zero-point Energies=' in line:
+                record['E0'] = float(line.split()[-1])
+
+    record['frequencies'] = np.array([freq for freq in frequencies if freq > 0.0])
+    record['imaginary_frequencies'] = np.array([freq for freq in frequencies if freq <= 0.0])
+    if record['E0'] is None or record['mass'] is None:
+        raise ValueError(f'{logfile} does not contain a finished frequency calculation')
+    return record
+
+
+def log_partition_functions(records, T, frequency_scale_factor=FREQUENCY_SCALE_FACTOR):
+    """ln of the molecular partition function per unit volume (1/m^3) of each record
+    The vibrational partition function is referenced to the zero-point level, to go with E0
+    Returns an array of shape (len(records), len(T))
+    """
+    T = np.atleast_1d(np.asarray(T, dtype=float))
+    n_species = len(records)
+
+    masses = np.array([record['mass'] for record in records]) * amu
+    electronic = np.array([record['multiplicity'] for record in records], dtype=float)
+    symmetry = np.array([record['symmetry'] for record in records])
+
+    # translation per unit volume
+    ln_q = 1.5 * np.log(2.0 * np.pi * np.outer(masses, kb * T) / (h * h))
+    ln_q += np.log(electronic)[:, None]
+
+    # rotation
+    for i, record in enumerate(records):
+        theta = record['rotational_temperatures']
+        if len(theta) == 1:  # linear
+            ln_q[i] += np.log(T / (symmetry[i] * theta[0]))
+        elif len(theta) == 3:
+            ln_q[i] += np.log(np.sqrt(np.pi * T ** 3 / np.prod(theta)) / symmetry[i])
+
+    # vibration - pad the frequencies into one matrix, padding contributes a factor of 1
+    max_freqs = max([len(record['frequencies']) for record in records] + [1])
+    vib_temps = np.full((n_species, max_freqs), np.inf)
+    for i, record in enumerate(records):
+        vib_temps[i, :len(record['frequencies'])] = record['frequencies']
+    vib_temps = h * c * frequency_scale_factor * vib_temps / kb
+    ln_q -= np.sum(np.log1p(-np.exp(-vib_temps[:, :, None] / T[None, None, :])), axis=1)
+
+    return ln_q
+
+
+def tst_rate_coefficients(reactions, T, frequency_scale_factor=FREQUENCY_SCALE_FACTOR, tunneling=None):
+    """Evaluates k(T) for many reactions at once
+    reactions is a list of (list of reactant records, TS record)
+    Records that are the same object (e.g. OH in many reactions) are only evaluated once.
+    tunneling can be None or 'wigner'
+    Returns an array of shape (len(reactions), len(T)), in (m^3/mol)^(n-1)/s for molecularity n
+    """
+    T = np.atleast_1d(np.asarray(T, dtype=float))
+
+    # collect the unique species so each partition function is evaluated once
+    records = []
+    record_index = {}
+
+    def get_index(record):
+        if id(record) not in record_index:
+            record_index[id(record)] = len(records)
+            records.append(record)
+        return record_index[id(record)]
+
+    n_reactions = len(reactions)
+    ts_indices = np.array([get_index(ts) for _, ts in reactions], dtype=int)
+    reactant_rows = [[get_index(r) for r in reactants] for reactants, _ in reactions]
+
+    reactant_matrix = np.zeros((n_reactions, len(records)))
+    for i, row in enumerate(reactant_rows):
+        for j in row:
+            reactant_matrix[i, j] += 1.0
+    molecularity = reactant_matrix.sum(axis=1)
+
+    ln_q = log_partition_functions(records, T, frequency_scale_factor=frequency_scale_factor)
+    E0 = np.array([record['E0'] for record in records]) * hartree
+    barriers = E0[ts_indices] - reactant_matrix @ E0
+
+    ln_k = np.log(kb * T / h)[None, :] + ln_q[ts_indices] - reactant_matrix @ ln_q
+    ln_k -= barriers[:, None] / (kb * T[None, :])
+    ln_k += ((molecularity - 1.0) * np.log(N_av))[:, None]
+
+    if tunneling == 'wigner':
+        imaginary = np.array([
+            abs(ts['imaginary_frequencies'][0]) if len(ts['imaginary_frequencies']) else 0.0 for _, ts in reactions
+        ]) * frequency_scale_factor
+        u = h * c * imaginary[:, None] / (kb * T[None, :])
+        ln_k += np.log1p(u * u / 24.0)
+
+    return np.exp(ln_k)
+
+
+def fit_arrhenius(T, k):
+    """Least squares fit of k = A T^n exp(-Ea/RT) for every row of k at once
+    Returns arrays A (units of k), n, and Ea (J/mol)
+    """
+    T = np.asarray(T, dtype=float)
+    design = np.column_stack([np.ones_like(T), np.log(T), -1.0 / (R * T)])
+    coefficients, _, _, _ = np.linalg.lstsq(design, np.log(np.atleast_2d(k)).T, rcond=None)
+    return np.exp(coefficients[0]), coefficients[1], coefficients[2]
+
+
+def get_species_log(species_index):
+    """The lowest energy conformer log used for the species' Arkane calculation
+    """
+    logs = glob.glob(os.path.join(DFT_DIR, 'thermo', f'species_{species_index:04}', 'arkane', 'conformer_*.log'))
+    if not logs:
+        return None
+    return logs[0]
+
+
+def get_ts_log(reaction_index):
+    """The TS log used for the reaction's Arkane calculation
+    """
+    logs = glob.glob(os.path.join(DFT_DIR, 'kinetics', f'reaction_{reaction_index:04}', 'arkane', 'fwd_ts_*.log'))
+    if not logs:
+        return None
+    return logs[0]
+
+
+def screen_all_reactions(T=np.linspace(300, 2000, 50)):
+    """Computes TST rates for every reaction that has a TS and thermo for all of its reactants
+    Returns a DataFrame with the modified Arrhenius fit for each reaction
+    """
+    species_df = pd.read_csv(os.path.join(DFT_DIR, 'species_list.csv'))
+    reaction_df = pd.read_csv(os.path.join(DFT_DIR, 'reaction_list.csv'))
+    smiles2index = {smiles: i for i, smiles in zip(species_df['i'].values, species_df['SMILES'].values)}
+
+    species_records = {}
+
+    def get_species_record(species_index):
+        if species_index not in species_records:
+            logfile = get_species_log(species_index)
+            species_records[species_index] = None
+            if logfile:
+                try:
+                    species_records[species_index] = read_log_record(logfile)
+                except ValueError:
+                    # e.g. the frequency calculation hasn't finished, skip its reactions like a bad TS
+                    print(f'skipping bad logfile {logfile}')
+        return species_records[species_index]
+
+    reactions = []
+    reaction_indices = []
+    for reaction_index, reaction_smiles in zip(reaction_df['i'].values, reaction_df['SMILES'].values):
+        ts_log = get_ts_log(reaction_index)
+        if ts_log is None:
+            continue
+        reactant_smiles = reaction_smiles.split('_')[0].split('+')
+        if not all([smiles in smiles2index for smiles in reactant_smiles]):
+            continue
+        reactants = [get_species_record(smiles2index[smiles]) for smiles in reactant_smiles]
+        if None in reactants:
+            continue
+        try:
+            ts = read_log_record(ts_log)
+        except ValueError:
+            print(f'skipping bad logfile {ts_log}')
+            continue
+        reactions.append((reactants, ts))
+        reaction_indices.append(reaction_index)
+
+    k = tst_rate_coefficients(reactions, T)
+    A, n, Ea = fit_arrhenius(T, k)
+    return pd.DataFrame({
+        'i': reaction_indices,
+        'A': A,
+        'n': n,
+        'Ea (kJ/mol)': Ea / 1000.0,
+        'k(1000K)': tst_rate_coefficients(reactions, [1000.0])[:, 0],
+    })
+
+
+if __name__ == '__main__':
+    output_file = os.path.join(DFT_DIR, 'kinetics', 'tst_screen.csv')
+    if len(sys.argv) > 1:
+        output_file = sys.argv[1]
+    df = screen_all_reactions()
+    df.to_csv(output_file, index=False)
+    print(f'TST rates for {len(df)} reactions written to {output_file}')
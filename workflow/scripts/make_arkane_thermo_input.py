@@ -1,7 +1,6 @@
 import os
 import sys
 import glob
-import shutil
 
 import cclib.io
 import pandas as pd
@@ -11,6 +10,10 @@ import autotst.species
 
 import job_manager
 
+import staging
+
+import rotor_scan
+
 
 # Read in the species
 DFT_DIR = os.environ['DFT_DIR']
@@ -38,10 +41,10 @@ if len(conformer_files) > 1:
 elif len(conformer_files) == 0:
     print(f'Conformer files not found. Did you remember to run the rotors?')
 
-# copy to the arkane folder
+# stage in the arkane folder
 arkane_dir = os.path.join(species_base_dir, 'arkane')
 os.makedirs(arkane_dir, exist_ok=True)
-shutil.copy(conformer_files[0], arkane_dir)
+staging.stage_file(conformer_files[0], arkane_dir)
 conformer_file = os.path.join(arkane_dir, os.path.basename(conformer_files[0]))
 
 
@@ -57,11 +60,18 @@ new_cf.update_coords_from(mol_type="ase")
 torsions = new_cf.get_torsions()
 n_rotors = len(torsions)
 
-# copy all of the rotor files into the arkane dir
-for i, torsion in enumerate(torsions):
+# equivalent rotors share the scan of one representative rotor
+equivalents = rotor_scan.read_equivalent_torsions(rotor_dir, n_rotors)
+
+# stage all of the rotor files in the arkane dir
+for i in sorted(set(equivalents)):
     # TODO check for valid output
     torfile = os.path.join(rotor_dir, f'rotor_{i:04}.log')
-    shutil.copy(torfile, arkane_dir)
+    if rotor_scan.is_coarse_scan(os.path.join(rotor_dir, f'rotor_{i:04}.com')):
+        # adaptive scan - merge the coarse and refined points into one ScanLog file
+        # this raises if any refinement is missing or unfinished rather than fitting a scan with holes in it
+        torfile = rotor_scan.merge_scan(rotor_dir, i)
+    staging.stage_file(torfile, arkane_dir)
 
 
 def get_rotor_info(conformer, torsion, torsion_index):
@@ -70,7 +80,10 @@ def get_rotor_info(conformer, torsion, torsion_index):
     # Adjusted since mol's IDs start from 0 while Arkane's start from 1
     tor_center_adj = [j + 1, k + 1]
 
-    tor_log = f'rotor_{torsion_index:04}.log'
+    scan_index = equivalents[torsion_index]
+    tor_log = f"Log('rotor_{scan_index:04}.log')"
+    if os.path.exists(os.path.join(arkane_dir, f'rotor_{scan_index:04}_scan.txt')):
+        tor_log = f"ScanLog('rotor_{scan_index:04}_scan.txt')"
     top_IDs = []
     for num, tf in enumerate(torsion.mask):
         if tf:
@@ -79,7 +92,7 @@ def get_rotor_info(conformer, torsion, torsion_index):
     # Adjusted to start from 1 instead of 0
     top_IDs_adj = [ID + 1 for ID in top_IDs]
 
-    info = f"     HinderedRotor(scanLog=Log('{tor_log}'), pivots={tor_center_adj}, top={top_IDs_adj}, fit='fourier'),"
+    info = f"     HinderedRotor(scanLog={tor_log}, pivots={tor_center_adj}, top={top_IDs_adj}, fit='fourier'),"
 
     return info
 
@@ -3,7 +3,6 @@
 import os
 import sys
 import glob
-import shutil
 
 import cclib.io
 import pandas as pd
@@ -11,6 +10,8 @@ import ase.io.gaussian
 
 import job_manager
 
+import staging
+
 import rmgpy.species
 
 
@@ -39,10 +40,10 @@ if len(conformer_files) > 1:
 elif len(conformer_files) == 0:
     print(f'Conformer files not found. Did you remember to run the rotors?')
 
-# copy to the arkane folder
+# stage in the arkane folder
 arkane_dir = os.path.join(species_base_dir, 'arkane')
 os.makedirs(arkane_dir, exist_ok=True)
-shutil.copy(conformer_files[0], arkane_dir)
+staging.stage_file(conformer_files[0], arkane_dir)
 conformer_file = os.path.join(arkane_dir, os.path.basename(conformer_files[0]))
 
 
@@ -0,0 +1,52 @@
+# Lookups in species_list.csv and reaction_list.csv using only the standard library
+# job.py and kineticfun.py are imported by many short status/bookkeeping steps, and reading the
+# lists with pandas costs more than the lookup itself. The parsed rows are kept for as long as
+# the file doesn't change, so repeated lookups in one process only read the list once.
+import os
+import csv
+
+
+_list_cache = {}
+
+
+def read_list(csv_file):
+    """Returns the rows of a species or reaction list as dictionaries, with 'i' as an int
+    Row position equals the index (see ingest_model.py)
+    """
+    stat = os.stat(csv_file)
+    key = (stat.st_size, stat.st_mtime_ns)
+    if csv_file in _list_cache and _list_cache[csv_file][0] == key:
+        return _list_cache[csv_file][1]
+
+    with open(csv_file, 'r', newline='') as f:
+        rows = list(csv.DictReader(f))
+    for row in rows:
+        row.pop('', None)  # the DataFrame index column
+        row['i'] = int(row['i'])
+    _list_cache[csv_file] = (key, rows)
+    return rows
+
+
+def get_value(csv_file, index, column):
+    """Value of one column for the entry with this index
+    """
+    rows = read_list(csv_file)
+    if index < len(rows) and rows[index]['i'] == index:
+        return rows[index][column]
+    for row in rows:
+        if row['i'] == index:
+            return row[column]
+    raise IndexError(f'No entry {index} in {csv_file}')
+
+
+def find_index(csv_file, column, value):
+    """Index of the first entry with this value in the column, or None
+    """
+    for row in read_list(csv_file):
+        if row[column] == value:
+            return row['i']
+    return None
+
+
+def get_last_index(csv_file):
+    return read_list(csv_file)[-1]['i']
@@ -0,0 +1,92 @@
+# Script to refine the coarse rotor scans written by species_rotors.py --adaptive
+# Only the points one fine step either side of the minima and barriers of each coarse scan are run,
+# at the final level of theory (rotor_scan.FINAL_ROUTE)
+# Snakemake runs this after the coarse scans finish (see the rotor_refine_inputs checkpoint)
+# pass --no-submit to only write the inputs, e.g. when Snakemake runs the Gaussian jobs itself
+import os
+import sys
+import glob
+
+import job_manager
+
+import rotor_scan
+
+
+DFT_DIR = os.environ['DFT_DIR']
+species_index = int(sys.argv[1])
+print(f'Species index is {species_index}')
+submit = '--no-submit' not in sys.argv[2:]
+
+species_base_dir = os.path.join(DFT_DIR, 'thermo', f'species_{species_index:04}')
+rotor_dir = os.path.join(species_base_dir, 'rotors')
+
+# species scanned without --adaptive have nothing to refine
+coarse_files = [
+    com_file for com_file in sorted(glob.glob(os.path.join(rotor_dir, 'rotor_????.com')))
+    if rotor_scan.is_coarse_scan(com_file)
+]
+if len(coarse_files) == 0:
+    print('No coarse rotor scans found. Did you run species_rotors.py --adaptive?')
+    exit(0)
+
+print("generating refinement gaussian input files")
+refine_files = []
+for coarse_file in coarse_files:
+    torsion_index = int(os.path.basename(coarse_file)[6:10])
+    try:
+        refine_files += rotor_scan.write_refinement_files(rotor_dir, torsion_index)
+    except ValueError as e:
+        # a coarse scan that ended in an error can't be refined, the Arkane input will report it
+        print(e)
+
+# the array tasks look up their input by line number
+refine_list_file = os.path.join(rotor_dir, 'refine_inputs.txt')
+with open(refine_list_file, 'w') as f:
+    for refine_file in refine_files:
+        f.write(os.path.basename(refine_file) + '\n')
+
+n_refine = len(refine_files)
+print(f'{n_refine} refinement points to run')
+if n_refine == 0:
+    exit(0)
+
+
+# Make a slurm script to run all rotor refinements
+slurm_run_file = os.path.join(rotor_dir, 'run_rotor_refine.sh')
+slurm_settings = {
+    '--job-name': f'g16_rotors_refine_{species_index}',
+    '--error': 'error.log',
+    '--nodes': 1,
+    '--partition': 'west,short',
+    '--mem': '20Gb',
+    '--time': '24:00:00',
+    '--cpus-per-task': 16,
+    '--array': f'0-{n_refine - 1}%20',
+}
+
+slurm_file_writer = job_manager.SlurmJobFile(
+    full_path=slurm_run_file,
+)
+slurm_file_writer.settings = slurm_settings
+slurm_file_writer.content = [
+    'export GAUSS_SCRDIR=/scratch/harris.se/guassian_scratch\n',
+    'mkdir -p $GAUSS_SCRDIR\n',
+    'module load gaussian/g16\n',
+    'source /shared/centos7/gaussian/g16/bsd/g16.profile\n\n',
+
+    'fname=$(sed -n "$(($SLURM_ARRAY_TASK_ID + 1))p" refine_inputs.txt)\n\n',
+
+    'g16 $fname\n',
+]
+slurm_file_writer.write_file()
+
+if not submit:
+    exit(0)
+
+# submit the job
+start_dir = os.getcwd()
+os.chdir(rotor_dir)
+gaussian_rotors_job = job_manager.SlurmJob()
+slurm_cmd = f"sbatch {slurm_run_file}"
+gaussian_rotors_job.submit(slurm_cmd)
+os.chdir(start_dir)
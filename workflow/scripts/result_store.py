@@ -0,0 +1,183 @@
+# Content-addressed store of finished Gaussian calculations shared by thermo and kinetics
+# Each calculation is keyed by a hash of its input file with the link0 lines (%chk, %mem...)
+# and the title removed, so the key depends only on the route (method, basis, job type),
+# charge, multiplicity, geometry and any constraints.
+#
+# DFT_DIR/result_store/ab/abcdef....log   read-only copy of the Gaussian log
+# DFT_DIR/result_store/ab/abcdef....json  parsed summary of the log
+#
+# The store keeps its own copy of each log rather than a link, because a rerun of the job
+# truncates the working log in place and would take the stored one with it.
+# Before an input is submitted, restore() checks the store and copies the stored log in place,
+# next to a .restored marker, so the same calculation is never run twice.
+#
+# Usage: python result_store.py record directory [pattern]
+import os
+import sys
+import json
+import glob
+import shutil
+import hashlib
+import tempfile
+import datetime
+
+import gaussian_log
+
+
+try:
+    DFT_DIR = os.environ['DFT_DIR']
+except KeyError:
+    DFT_DIR = "/work/westgroup/harris.se/autoscience/autoscience/butane/dft"
+
+STORE_DIR = os.path.join(DFT_DIR, 'result_store')
+
+# calculations that finished and would finish the same way if rerun
+# 1 (error) and -1 (no termination) can be node failures or timeouts, 5 is a manual skip
+STORABLE_STATUSES = [0, 2, 3, 4]
+
+
+def get_key(com_text):
+    """Returns the store key for the text of a Gaussian input file
+    Returns None if the result depends on a checkpoint file (geom=check, guess=read),
+    since the input alone doesn't determine the calculation then
+    """
+    lines = [' '.join(line.split()) for line in com_text.splitlines()]
+    lines = [line for line in lines if not line.startswith('%')]
+
+    sections = [[]]
+    for line in lines:
+        if line:
+            sections[-1].append(line)
+        elif sections[-1]:
+            sections.append([])
+    if len(sections) < 3:
+        raise ValueError('Gaussian input must have route, title and molecule sections')
+
+    route = ' '.join(sections[0]).lower()
+    if 'check' in route or 'read' in route:
+        return None
+
+    # skip the title, sections[1]
+    normalized = '\n\n'.join([route] + ['\n'.join(section) for section in sections[2:] if section])
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def get_store_paths(key):
+    """Returns (log path, summary path) for a key
+    """
+    base = os.path.join(STORE_DIR, key[:2], key)
+    return base + '.log', base + '.json'
+
+
+def summarize_log(log_file):
+    """Reads a Gaussian log once and returns a dictionary with its termination status
+    (same codes as kineticfun.termination_status) and the last SCF energy in Hartree
+    """
+    status, energy = gaussian_log.summarize_log(log_file)
+    return {'status': status, 'energy': energy}
+
+
+def lookup(com_text):
+    """Returns the path to the stored log for this input, or None if it has never been run
+    """
+    key = get_key(com_text)
+    if key is None:
+        return None
+    log_path, summary_path = get_store_paths(key)
+    if os.path.exists(log_path) and os.path.exists(summary_path):
+        return log_path
+    return None
+
+
+def get_restored_marker(com_file):
+    # written next to a log that came from the store, so the run scripts know not to rerun it
+    return os.path.splitext(com_file)[0] + '.restored'
+
+
+def copy_file(src, dst, mode=None):
+    """Copies src to dst through a temporary file in the same directory, so dst is never partial
+    The copy gets a new modification time. mode sets its permissions
+    """
+    fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(dst)), suffix='.tmp')
+    os.close(fd)
+    try:
+        shutil.copyfile(src, tmp_file)
+        if mode is not None:
+            os.chmod(tmp_file, mode)
+        os.replace(tmp_file, dst)
+    except BaseException:
+        os.remove(tmp_file)
+        raise
+    return dst
+
+
+def restore(com_file, com_text=None):
+    """If the calculation for com_file is in the store, copies its log next to com_file
+    Returns True if the log was restored, meaning the job doesn't need to be submitted
+    """
+    if com_text is None:
+        with open(com_file, 'r') as f:
+            com_text = f.read()
+    marker = get_restored_marker(com_file)
+    stored_log = lookup(com_text)
+    if stored_log is None:
+        if os.path.exists(marker):
+            os.remove(marker)  # left from an earlier input that was in the store
+        return False
+    # a fresh copy is newer than the input, so Snakemake doesn't run the job again either
+    copy_file(stored_log, os.path.splitext(com_file)[0] + '.log', mode=0o644)
+    with open(marker, 'w') as f:
+        f.write(stored_log + '\n')
+    return True
+
+
+def store(com_file, log_file=None):
+    """Adds a finished calculation to the store
+    Returns the key, or None if the calculation isn't finished or can't be keyed
+    """
+    if log_file is None:
+        log_file = os.path.splitext(com_file)[0] + '.log'
+    if not os.path.exists(com_file) or not os.path.exists(log_file):
+        return None
+    with open(com_file, 'r') as f:
+        key = get_key(f.read())
+    if key is None:
+        return None
+
+    log_path, summary_path = get_store_paths(key)
+    if os.path.exists(summary_path):
+        return key  # already stored
+
+    summary = summarize_log(log_file)
+    if summary['status'] not in STORABLE_STATUSES:
+        return None
+
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+    copy_file(log_file, log_path, mode=0o444)
+    summary['key'] = key
+    summary['source'] = os.path.abspath(log_file)
+    summary['stored'] = datetime.datetime.now().isoformat()
+    with open(summary_path + '.tmp', 'w') as f:
+        json.dump(summary, f)
+    os.replace(summary_path + '.tmp', summary_path)  # the summary marks the entry as complete
+    return key
+
+
+def record_directory(directory, pattern='*.com'):
+    """Stores every finished calculation in a directory. Returns the number of calculations stored
+    """
+    n_stored = 0
+    for com_file in sorted(glob.glob(os.path.join(directory, pattern))):
+        if store(com_file) is not None:
+            n_stored += 1
+    return n_stored
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3 or sys.argv[1] != 'record':
+        print('Usage: python result_store.py record directory [pattern]')
+        sys.exit(1)
+    pattern = '*.com'
+    if len(sys.argv) > 3:
+        pattern = sys.argv[3]
+    print(f'{record_directory(sys.argv[2], pattern)} calculations in the store for {sys.argv[2]}')
@@ -1,33 +1,46 @@
+import os
+import sys
+import glob
+
 import numpy as np
 
+import gaussian_log
+
 import autotst.species
 
 import zmatrix  # https://github.com/wutobias/r2z
+from rdkit import Chem
 from simtk import unit
 
 
-def write_scan_file(fname, conformer, torsion_index, degree_delta=20.0):
-    """Function to write a Gaussian rotor scan
-    Takes an autoTST conformer and a rotor index
+def get_scan_header(conformer, route="#P m062x/cc-pVTZ", title="Gaussian input for a rotor scan"):
+    """Returns the link 0, route, title and charge/multiplicity lines for a rotor scan
     """
-
-    # header
-    scan_job_lines = [
+    return [
         "%mem=5GB",
         "%nprocshared=48",
-        "#P m062x/cc-pVTZ",
+        route,
         "Opt=(CalcFC,ModRedun)",
         "",
-        "Gaussian input for a rotor scan",
+        title,
         "",
         f"0 {conformer.rmg_molecule.multiplicity}",
     ]
+
+
+def build_zmatrix_block(conformer):
+    """Builds the z-matrix geometry and variable block for a conformer
+    Returns the ZMatrix object (needed to convert atom indices) and the list of lines
+    that go between the charge/multiplicity line and the scan coordinate.
+    The block is the same for every torsion of the species, so build it once and reuse it.
+    """
     rdmol = conformer._rdkit_molecule
     cart_crds = np.array(rdmol.GetConformers()[0].GetPositions()) * unit.angstrom
     zm = zmatrix.ZMatrix(conformer._rdkit_molecule)
 
     zm_text = zm.build_pretty_zcrds(cart_crds)
     zm_lines = zm_text.splitlines()
+    geometry_lines = []
     bonds = []
     angles = []
     dihedrals = []
@@ -36,7 +49,6 @@ def write_scan_file(fname, conformer, torsion_index, degree_delta=20.0):
     d = 1
     for line in zm_lines:
         tokens = line.split()
-        # print(line)
         if len(tokens) == 1:
             pass
         elif len(tokens) == 3:
@@ -64,37 +76,16 @@ def write_scan_file(fname, conformer, torsion_index, degree_delta=20.0):
         else:
             raise NotImplementedError
 
-        scan_job_lines.append(' '.join(tokens))
+        geometry_lines.append(' '.join(tokens))
 
-    scan_job_lines.append("")
-    for bond in bonds:
-        scan_job_lines.append(bond)
-    for angle in angles:
-        scan_job_lines.append(angle)
-    for dihedral in dihedrals:
-        scan_job_lines.append(dihedral)
-    scan_job_lines.append("")
+    block_lines = geometry_lines + [""] + bonds + angles + dihedrals + [""]
+    return zm, block_lines
 
-    # # bond order and connectivity - not sure if this is needed
-    # rdkit_bonds = zm.rdmol.GetBonds()
-    # bond_list = [f'{i + 1}' for i in range(0, len(rdkit_bonds))]
-    # for bond in rdkit_bonds:
-    #     bond_start = zm.a2z(bond.GetBeginAtomIdx())
-    #     bond_end = zm.a2z(bond.GetEndAtomIdx())
-    #     bond_order = bond.GetBondTypeAsDouble()
-    #     bond_list[bond_start] += f' {bond_end + 1} {bond_order}'
-    # for bond in bond_list:
-    #     scan_job_lines.append(bond)
-    # scan_job_lines.append("")
-
-    # dihedral to scan
-    indices = conformer.torsions[torsion_index].atom_indices
 
-    # # don't convert to z-matrix index??
-    # first = indices[0] + 1
-    # second = indices[1] + 1
-    # third = indices[2] + 1
-    # fourth = indices[3] + 1
+def get_scan_coordinate(zm, conformer, torsion_index, degree_delta=20.0):
+    """Returns the ModRedundant line that scans one torsion through 360 degrees
+    """
+    indices = conformer.torsions[torsion_index].atom_indices
 
     # convert to z-matrix index
     first = zm.a2z(indices[0]) + 1
@@ -103,9 +94,426 @@ def write_scan_file(fname, conformer, torsion_index, degree_delta=20.0):
     fourth = zm.a2z(indices[3]) + 1
 
     N_increments = int(360.0 / degree_delta)
-    scan_job_lines.append(f"D {first} {second} {third} {fourth} S {N_increments} {float(degree_delta)}")
+    return f"D {first} {second} {third} {fourth} S {N_increments} {float(degree_delta)}"
+
 
+def write_scan_file(fname, conformer, torsion_index, degree_delta=20.0):
+    """Function to write a Gaussian rotor scan
+    Takes an autoTST conformer and a rotor index
+    """
+    zm, block_lines = build_zmatrix_block(conformer)
+    scan_job_lines = get_scan_header(conformer) + block_lines
+    scan_job_lines.append(get_scan_coordinate(zm, conformer, torsion_index, degree_delta=degree_delta))
     scan_job_lines.append("")
     with open(fname, 'w') as f:
         for line in scan_job_lines:
             f.write(line + '\n')
+
+
+def write_scan_files(rotor_dir, conformer, torsion_indices=None, degree_delta=20.0, link1=False, route="#P m062x/cc-pVTZ"):
+    """Function to write the Gaussian rotor scans for every torsion of a species
+    The z-matrix block is built once and stamped into each rotor_XXXX.com file.
+    If link1 is True, also writes rotors_link1.com, which runs all of the scans
+    in sequence as one multi-step Gaussian job. Use split_link1_log() on its output
+    to recover the individual rotor_XXXX.log files that Arkane expects.
+    route sets the level of theory
+    Returns the list of files written
+    """
+    if torsion_indices is None:
+        torsion_indices = range(0, len(conformer.torsions))
+
+    zm, block_lines = build_zmatrix_block(conformer)
+    header_lines = get_scan_header(conformer, route=route)
+
+    written = []
+    link1_jobs = []
+    for i in torsion_indices:
+        scan_coordinate = get_scan_coordinate(zm, conformer, i, degree_delta=degree_delta)
+        job_text = '\n'.join(header_lines + block_lines + [scan_coordinate, ""]) + '\n'
+        link1_jobs.append(job_text)
+
+        fname = os.path.join(rotor_dir, f'rotor_{i:04}.com')
+        with open(fname, 'w') as f:
+            f.write(job_text)
+        written.append(fname)
+
+    if link1 and link1_jobs:
+        fname = os.path.join(rotor_dir, 'rotors_link1.com')
+        with open(fname, 'w') as f:
+            f.write('--Link1--\n'.join(link1_jobs))
+        written.append(fname)
+
+    return written
+
+
+def get_equivalent_torsions(conformer):
+    """Groups torsions that are chemically equivalent, e.g. the methyl rotors of a symmetric top
+    Two torsions are equivalent if their pivot atoms and the atoms on either side of the
+    bond have the same canonical ranks (the same ranking ZMatrix uses).
+    Returns a list mapping each torsion index to the index of the torsion that represents its class
+    """
+    rank = list(Chem.CanonicalRankAtoms(conformer._rdkit_molecule, breakTies=False))
+    representatives = {}
+    equivalents = []
+    for i, torsion in enumerate(conformer.torsions):
+        _, j, k, _ = torsion.atom_indices
+        top = tuple(sorted([rank[atom] for atom, tf in enumerate(torsion.mask) if tf]))
+        rest = tuple(sorted([rank[atom] for atom, tf in enumerate(torsion.mask) if not tf]))
+        key = (tuple(sorted([rank[j], rank[k]])), tuple(sorted([top, rest])))
+        if key not in representatives:
+            representatives[key] = i
+        equivalents.append(representatives[key])
+    return equivalents
+
+
+def write_equivalent_torsions(rotor_dir, equivalents):
+    """Saves the torsion -> representative torsion map as rotor_equivalents.txt
+    """
+    with open(os.path.join(rotor_dir, 'rotor_equivalents.txt'), 'w') as f:
+        for i, representative in enumerate(equivalents):
+            f.write(f'{i} {representative}\n')
+
+
+def read_equivalent_torsions(rotor_dir, n_torsions):
+    """Reads the map written by write_equivalent_torsions
+    If there's no map, every torsion represents itself
+    """
+    equivalents = list(range(0, n_torsions))
+    equivalents_file = os.path.join(rotor_dir, 'rotor_equivalents.txt')
+    if not os.path.exists(equivalents_file):
+        return equivalents
+    with open(equivalents_file, 'r') as f:
+        for line in f:
+            tokens = line.split()
+            if len(tokens) == 2:
+                equivalents[int(tokens[0])] = int(tokens[1])
+    return equivalents
+
+
+def split_link1_log(link1_log, rotor_dir, torsion_indices):
+    """Splits the output of a Link1 rotor job into one rotor_XXXX.log per torsion
+    Each step of a Link1 job starts with its own 'Entering Gaussian System' banner.
+    torsion_indices must be in the same order that the steps were written
+    """
+    preamble = []
+    steps = []
+    with open(link1_log, 'r') as f:
+        for line in f:
+            if 'Entering Gaussian System' in line:
+                steps.append([])
+            if steps:
+                steps[-1].append(line)
+            else:
+                preamble.append(line)
+    if steps:
+        steps[0] = preamble + steps[0]
+
+    written = []
+    for i, step_lines in zip(torsion_indices, steps):
+        fname = os.path.join(rotor_dir, f'rotor_{i:04}.log')
+        with open(fname, 'w') as f:
+            f.writelines(step_lines)
+        written.append(fname)
+    return written
+
+
+# Adaptive scans:
+# run a coarse scan first (e.g. every 60 degrees), then compute only the points one fine step
+# either side of the minima and barriers it finds and merge everything into a ScanLog
+# text file that Arkane reads with HinderedRotor(scanLog=ScanLog(...))
+# Each new point is one constrained optimization, so no point is computed twice
+COARSE_DELTA = 60.0
+FINE_DELTA = 20.0
+FINAL_ROUTE = "#P m062x/cc-pVTZ"
+HARTREE_TO_KJ_PER_MOL = 2625.499639
+ELEMENT_SYMBOLS = {
+    35: "Br",
+    17: "Cl",
+    9: "F",
+    8: "O",
+    7: "N",
+    6: "C",
+    1: "H",
+    18: "Ar",
+    2: "He",
+    10: "Ne",
+    16: "S",
+}
+
+
+# angstrom, for working out which atoms move with a torsion
+COVALENT_RADII = {
+    35: 1.20,
+    17: 1.02,
+    9: 0.57,
+    8: 0.66,
+    7: 0.71,
+    6: 0.76,
+    1: 0.31,
+    18: 1.06,
+    2: 0.28,
+    10: 0.58,
+    16: 1.05,
+}
+
+
+def read_scan_points(logfile):
+    """Reads a Gaussian relaxed scan log
+    Returns a list with one entry per scan point, in scan order.
+    Each entry is (energy in Hartree, [(atomic number, x, y, z), ...]),
+    or None if that point's constrained optimization did not converge
+    """
+    points = []
+    energy = None
+    geometry = []
+    with open(logfile, 'r') as f:
+        line = f.readline()
+        while line:
+            if 'SCF Done:' in line:
+                energy = float(line.split()[4])
+            elif 'orientation:' in line:
+                for i in range(0, 4):
+                    f.readline()
+                geometry = []
+                line = f.readline()
+                while '-----' not in line:
+                    tokens = line.split()
+                    geometry.append((int(tokens[1]), float(tokens[3]), float(tokens[4]), float(tokens[5])))
+                    line = f.readline()
+            elif 'Optimization completed' in line:
+                points.append((energy, geometry))
+            elif 'Optimization stopped' in line:
+                points.append(None)
+            line = f.readline()
+    return points
+
+
+def get_refinement_centers(energies):
+    """Returns the indices of the minima and barriers of a periodic scan
+    Those are the only regions worth sampling at fine resolution. Flat stretches only count once
+    """
+    n = len(energies)
+    centers = []
+    for k in range(0, n):
+        previous_energy = energies[k - 1]
+        next_energy = energies[(k + 1) % n]
+        if energies[k] < previous_energy and energies[k] <= next_energy:
+            centers.append(k)
+        elif energies[k] > previous_energy and energies[k] >= next_energy:
+            centers.append(k)
+    return centers
+
+
+def get_refinement_angles(energies, coarse_delta=COARSE_DELTA, fine_delta=FINE_DELTA):
+    """Angles (degrees from the start of the coarse scan) to compute one fine step either side
+    of each minimum and barrier, as {angle: index of the coarse point to start from}
+    Overlapping windows are merged and the coarse points themselves are skipped
+    """
+    n_coarse = len(energies)
+    coarse_angles = set([round(k * coarse_delta % 360.0, 3) for k in range(0, n_coarse)])
+    angles = {}
+    for k in get_refinement_centers(energies):
+        for offset in [-fine_delta, fine_delta]:
+            angle = round((k * coarse_delta + offset) % 360.0, 3)
+            if angle in angles or angle in coarse_angles:
+                continue
+            angles[angle] = k
+    return angles
+
+
+def get_moving_atoms(geometry, pivot, rotating_pivot):
+    """0-based indices of the atoms on the rotating_pivot side of the pivot-rotating_pivot bond
+    Bonds are guessed from the covalent radii
+    """
+    xyz = np.array([atom[1:] for atom in geometry])
+    radii = np.array([COVALENT_RADII[atom[0]] for atom in geometry])
+    distances = np.linalg.norm(xyz[:, np.newaxis, :] - xyz[np.newaxis, :, :], axis=-1)
+    bonded = distances < 1.25 * (radii[:, np.newaxis] + radii[np.newaxis, :])
+
+    moving = set([rotating_pivot])
+    to_visit = [rotating_pivot]
+    while to_visit:
+        atom = to_visit.pop()
+        for neighbor in np.nonzero(bonded[atom])[0]:
+            if neighbor != atom and neighbor != pivot and neighbor not in moving:
+                moving.add(int(neighbor))
+                to_visit.append(int(neighbor))
+    return sorted(moving)
+
+
+def rotate_torsion(geometry, scan_atoms, degrees):
+    """Returns a copy of a geometry [(atomic number, x, y, z), ...] with the dihedral through
+    scan_atoms (1-based, as in the ModRedundant line) turned by degrees
+    """
+    pivot = int(scan_atoms[1]) - 1
+    rotating_pivot = int(scan_atoms[2]) - 1
+    xyz = np.array([atom[1:] for atom in geometry])
+    axis = xyz[rotating_pivot] - xyz[pivot]
+    axis = axis / np.linalg.norm(axis)
+    theta = np.radians(degrees)
+
+    new_xyz = xyz.copy()
+    for i in get_moving_atoms(geometry, pivot, rotating_pivot):
+        v = xyz[i] - xyz[rotating_pivot]
+        # Rodrigues' rotation formula
+        v = v * np.cos(theta) + np.cross(axis, v) * np.sin(theta) + axis * np.dot(axis, v) * (1 - np.cos(theta))
+        new_xyz[i] = xyz[rotating_pivot] + v
+    return [(atom[0], x, y, z) for atom, (x, y, z) in zip(geometry, new_xyz)]
+
+
+def read_com_file(com_file):
+    """Returns the route line, charge/multiplicity line and scan coordinate line of a rotor scan input
+    """
+    with open(com_file, 'r') as f:
+        lines = [line.strip() for line in f]
+    route = [line for line in lines if line.startswith('#')][0]
+    blank_lines = [i for i, line in enumerate(lines) if line == '']
+    charge_mult = lines[blank_lines[1] + 1]
+    scan_line = [line for line in lines if line.startswith('D ') and ' S ' in line][-1]
+    return route, charge_mult, scan_line
+
+
+def is_coarse_scan(com_file, coarse_delta=COARSE_DELTA):
+    """Whether a rotor scan input steps by the coarse increment, i.e. it was written with --adaptive
+    """
+    with open(com_file, 'r') as f:
+        scan_lines = [line.split() for line in f if line.startswith('D ') and ' S ' in line]
+    return len(scan_lines) > 0 and abs(float(scan_lines[-1][-1]) - coarse_delta) < 1e-6
+
+
+def get_coarse_points(rotor_dir, torsion_index, coarse_delta=COARSE_DELTA, route=FINAL_ROUTE):
+    """The points of a finished coarse scan, without the last one that repeats the first
+    The coarse points fill in the merged scan between the refinements, so they have to be at
+    the same level of theory as the refinements
+    """
+    coarse_com = os.path.join(rotor_dir, f'rotor_{torsion_index:04}.com')
+    coarse_route = read_com_file(coarse_com)[0]
+    if coarse_route != route:
+        raise ValueError(f'Coarse scan {coarse_com} uses "{coarse_route}" instead of "{route}", rerun it at the final level')
+    coarse_log = os.path.join(rotor_dir, f'rotor_{torsion_index:04}.log')
+    points = read_scan_points(coarse_log)
+    n_coarse = int(round(360.0 / coarse_delta))
+    points = points[:n_coarse]
+    if len(points) < n_coarse or None in points:
+        raise ValueError(f'Coarse scan {coarse_log} is incomplete, cannot refine it')
+    return points
+
+
+def get_refinement_file(rotor_dir, torsion_index, angle):
+    # the angle (in whole degrees relative to the coarse scan) is stored in the file name
+    return os.path.join(rotor_dir, f'rotor_{torsion_index:04}_refine_{int(round(angle)):03}.com')
+
+
+def get_missing_refinements(rotor_dir, torsion_index, coarse_delta=COARSE_DELTA, fine_delta=FINE_DELTA, route=FINAL_ROUTE):
+    """Refinement inputs of a finished coarse scan whose log is missing or didn't end in Normal termination
+    """
+    energies = [point[0] for point in get_coarse_points(rotor_dir, torsion_index, coarse_delta, route)]
+    angles = get_refinement_angles(energies, coarse_delta, fine_delta)
+    missing = []
+    for angle in sorted(angles):
+        refine_log = get_refinement_file(rotor_dir, torsion_index, angle)[:-4] + '.log'
+        if not os.path.exists(refine_log) or gaussian_log.termination_status(refine_log) != 0:
+            missing.append(refine_log[:-4] + '.com')
+    return missing
+
+
+def write_refinement_files(rotor_dir, torsion_index, coarse_delta=COARSE_DELTA, fine_delta=FINE_DELTA, route=FINAL_ROUTE):
+    """Writes one constrained optimization for each fine point next to a minimum or barrier
+    of a finished coarse scan. Each starts from the nearest coarse geometry with the torsion
+    turned to the new angle and frozen, in rotor_XXXX_refine_AAA.com
+    Points with a log already are not written again
+    Returns the list of files written
+    """
+    coarse_com = os.path.join(rotor_dir, f'rotor_{torsion_index:04}.com')
+    _, charge_mult, scan_line = read_com_file(coarse_com)
+    scan_atoms = scan_line.split()[1:5]
+
+    points = get_coarse_points(rotor_dir, torsion_index, coarse_delta, route)
+    energies = [point[0] for point in points]
+    angles = get_refinement_angles(energies, coarse_delta, fine_delta)
+
+    written = []
+    for angle, k in sorted(angles.items()):
+        fname = get_refinement_file(rotor_dir, torsion_index, angle)
+        if os.path.exists(fname[:-4] + '.log'):
+            continue  # already computed
+
+        _, geometry = points[k]
+        offset = (angle - k * coarse_delta + 180.0) % 360.0 - 180.0
+        geometry = rotate_torsion(geometry, scan_atoms, offset)
+        lines = [
+            "%mem=5GB",
+            "%nprocshared=48",
+            route,
+            "Opt=(CalcFC,ModRedun)",
+            "",
+            f"Gaussian input for a rotor scan point at {angle} degrees",
+            "",
+            charge_mult,
+        ]
+        for atomic_number, x, y, z in geometry:
+            lines.append(f'{ELEMENT_SYMBOLS[atomic_number]} {x:.6f} {y:.6f} {z:.6f}')
+        lines.append("")
+        lines.append(f"D {' '.join(scan_atoms)} F")
+        lines.append("")
+
+        with open(fname, 'w') as f:
+            for line in lines:
+                f.write(line + '\n')
+        written.append(fname)
+    return written
+
+
+def merge_scan(rotor_dir, torsion_index, coarse_delta=COARSE_DELTA, fine_delta=FINE_DELTA):
+    """Merges a coarse scan and its refinements into rotor_XXXX_scan.txt (Arkane ScanLog format)
+    Raises ValueError if any refinement is missing or didn't finish normally, since a scan with
+    holes in it would still make a (wrong) hindered rotor
+    Returns the path to the merged scan file
+    """
+    coarse_log = os.path.join(rotor_dir, f'rotor_{torsion_index:04}.log')
+    missing = get_missing_refinements(rotor_dir, torsion_index, coarse_delta, fine_delta)
+    if missing:
+        raise ValueError(f'Rotor {torsion_index} refinements missing or unfinished: {", ".join(missing)}')
+    refine_coms = sorted(glob.glob(os.path.join(rotor_dir, f'rotor_{torsion_index:04}_refine_*.com')))
+
+    scan = {}  # angle in degrees -> energy in Hartree
+
+    def add_points(logfile, start_angle, delta):
+        for k, point in enumerate(read_scan_points(logfile)):
+            if point is None:
+                continue
+            angle = round((start_angle + k * delta) % 360.0, 3)
+            # relaxed scans can have hysteresis, the lower energy is the better relaxed structure
+            if angle not in scan or point[0] < scan[angle]:
+                scan[angle] = point[0]
+
+    add_points(coarse_log, 0.0, coarse_delta)
+    for refine_com in refine_coms:
+        refine_log = refine_com[:-4] + '.log'
+        start_angle = float(os.path.basename(refine_com)[-7:-4])
+        add_points(refine_log, start_angle, fine_delta)
+
+    if not scan:
+        raise ValueError(f'No converged scan points found for rotor {torsion_index}')
+    angles = sorted(scan.keys())
+    energies = np.array([scan[angle] for angle in angles])
+    energies = (energies - energies[0]) * HARTREE_TO_KJ_PER_MOL
+
+    scan_file = os.path.join(rotor_dir, f'rotor_{torsion_index:04}_scan.txt')
+    with open(scan_file, 'w') as f:
+        f.write('{0:>24} {1:>24}\n'.format('Angle (radians)', 'Energy (kJ/mol)'))
+        for angle, energy in zip(angles, energies):
+            f.write('{0:23.10f} {1:23.10f}\n'.format(np.radians(angle), energy))
+    return scan_file
+
+
+if __name__ == '__main__':
+    # python rotor_scan.py split rotors_link1.log
+    # the torsion indices are taken from the rotor_XXXX.com files next to the log
+    if len(sys.argv) == 3 and sys.argv[1] == 'split':
+        link1_log = os.path.abspath(sys.argv[2])
+        rotor_dir = os.path.dirname(link1_log)
+        torsion_indices = sorted([
+            int(os.path.basename(fname)[6:10]) for fname in glob.glob(os.path.join(rotor_dir, 'rotor_????.com'))
+        ])
+        split_link1_log(link1_log, rotor_dir, torsion_indices)
@@ -0,0 +1,13 @@
+#!/bin/bash
+#SBATCH --job-name=batch_arkane
+#SBATCH --error=batch_arkane_error.log
+#SBATCH --output=batch_arkane_output.log
+#SBATCH --partition=short,west
+#SBATCH --time=1-00:00:00
+#SBATCH --nodes=1
+#SBATCH --cpus-per-task=16
+#SBATCH --exclude=c5003
+
+# run every pending thermo and kinetics Arkane job in this one allocation
+cd "/work/westgroup/harris.se/autoscience/autoscience_workflow/workflow/"
+python "/work/westgroup/harris.se/autoscience/autoscience_workflow/workflow/scripts/batch_arkane.py" $SLURM_CPUS_PER_TASK "$@"
@@ -56,19 +56,30 @@ if n_rotors == 0:
     exit(0)
 
 print("generating gaussian input files")
-# gaussian = autotst.calculator.gaussian.Gaussian(conformer=new_cf)
-for i, torsion in enumerate(new_cf.torsions):
-    # print(torsion)
-    # calc = gaussian.get_rotor_calc(torsion_index=i)
-    # calc.label = f'rotor_{i:04}'
-    # calc.directory = rotor_dir
-    # calc.parameters.pop('scratch')
-    # calc.parameters.pop('multiplicity')
-    # calc.parameters['mult'] = new_cf.rmg_molecule.multiplicity
-    # calc.write_input(new_cf.ase_molecule)
-
-    fname = os.path.join(rotor_dir, f'rotor_{i:04}.com')
-    rotor_scan.write_scan_file(fname, new_cf, i)
+# the z-matrix is built once and reused for every torsion
+# pass --link1 to run all the scans for this species as one multi-step Gaussian job
+# pass --adaptive to only run a coarse scan here and refine it later with refine_rotors.py
+# the coarse scan runs at the final level of theory because its points fill in the merged scan
+# pass --no-submit to only write the inputs, e.g. when Snakemake runs the Gaussian jobs itself
+use_link1 = '--link1' in sys.argv[2:]
+submit = '--no-submit' not in sys.argv[2:]
+degree_delta = 20.0
+route = rotor_scan.FINAL_ROUTE
+if '--adaptive' in sys.argv[2:]:
+    degree_delta = rotor_scan.COARSE_DELTA
+if any(arg.startswith('--coarse-route=') for arg in sys.argv[2:]):
+    # refining only the minima and barriers of a cheaper scan leaves 60+ degree gaps at the final level
+    print('--coarse-route is no longer supported, the coarse scan has to use the final route')
+    exit(1)
+
+# only scan one torsion out of each set of chemically equivalent torsions
+equivalents = rotor_scan.get_equivalent_torsions(new_cf)
+rotor_scan.write_equivalent_torsions(rotor_dir, equivalents)
+scan_indices = sorted(set(equivalents))
+print(f'{len(scan_indices)} unique rotors out of {n_rotors}')
+rotor_scan.write_scan_files(
+    rotor_dir, new_cf, torsion_indices=scan_indices, degree_delta=degree_delta, link1=use_link1, route=route
+)
 
 
 # Make a slurm script to run all rotors
@@ -81,8 +92,22 @@ slurm_settings = {
     '--mem': '20Gb',
     '--time': '24:00:00',
     '--cpus-per-task': 16,
-    '--array': f'0-{n_rotors - 1}%20',
+    '--array': ','.join([str(i) for i in scan_indices]) + '%20',
 }
+run_lines = [
+    'RUN_i=$(printf "%04.0f" $(($SLURM_ARRAY_TASK_ID)))\n',
+    'fname="rotor_${RUN_i}.com"\n\n',
+
+    'g16 $fname\n',
+]
+if use_link1:
+    # one job runs every scan, then the combined log is split back into rotor_XXXX.log files
+    slurm_settings.pop('--array')
+    rotor_scan_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rotor_scan.py')
+    run_lines = [
+        'g16 rotors_link1.com\n',
+        f'python {rotor_scan_script} split rotors_link1.log\n',
+    ]
 
 slurm_file_writer = job_manager.SlurmJobFile(
     full_path=slurm_run_file,
@@ -94,14 +119,12 @@ slurm_file_writer.content = [
     'mkdir -p $GAUSS_SCRDIR\n',
     'module load gaussian/g16\n',
     'source /shared/centos7/gaussian/g16/bsd/g16.profile\n\n',
-
-    'RUN_i=$(printf "%04.0f" $(($SLURM_ARRAY_TASK_ID)))\n',
-    'fname="rotor_${RUN_i}.com"\n\n',
-
-    'g16 $fname\n',
-]
+] + run_lines
 slurm_file_writer.write_file()
 
+if not submit:
+    exit(0)
+
 # submit the job
 start_dir = os.getcwd()
 os.chdir(rotor_dir)
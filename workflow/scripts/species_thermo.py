@@ -19,10 +19,14 @@ import ase.calculators.lj
 
 import job_manager
 
+import result_store
+
 
 DFT_DIR = os.environ['DFT_DIR']
 species_index = int(sys.argv[1])
 print(f'Species index is {species_index}')
+# pass --no-submit to only write the inputs, e.g. when Snakemake runs the Gaussian jobs itself
+submit = '--no-submit' not in sys.argv[2:]
 
 
 # Load the species from the official species list
@@ -67,6 +71,10 @@ for i, cf in enumerate(spec.conformers[species_smiles]):
     calc.chk = f'conformer_{i:04}.chk'
     calc.write_input(cf.ase_molecule)
 
+    # put the log in place if this exact calculation has been run before
+    if result_store.restore(os.path.join(conformer_dir, f'conformer_{i:04}.com')):
+        print(f'Restored conformer {i} from the result store')
+
 
 # Make slurm script
 # Make a file to run Gaussian
@@ -97,10 +105,21 @@ slurm_file_writer.content = [
     'RUN_i=$(printf "%04.0f" $(($SLURM_ARRAY_TASK_ID)))\n',
     'fname="conformer_${RUN_i}.com"\n\n',
 
-    'g16 $fname\n',
+    '# skip conformers restored from the result store or that already finished normally,\n',
+    '# but rerun ones that timed out or hit an error\n',
+    'if [ -f "conformer_${RUN_i}.restored" ] && [ -f "conformer_${RUN_i}.log" ]; then\n',
+    '    echo "conformer_${RUN_i} was restored from the result store"\n',
+    'elif tail -n 20 "conformer_${RUN_i}.log" 2>/dev/null | grep -q "Normal termination"; then\n',
+    '    echo "conformer_${RUN_i} already finished"\n',
+    'else\n',
+    '    g16 $fname\n',
+    'fi\n',
 ]
 slurm_file_writer.write_file()
 
+if not submit:
+    exit(0)
+
 # submit the job
 start_dir = os.getcwd()
 os.chdir(conformer_dir)
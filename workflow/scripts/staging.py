@@ -0,0 +1,87 @@
+# Functions for staging Gaussian logs into Arkane directories without copying them
+# A species like OH is used by hundreds of reactions, so copying its logs into every
+# reaction's arkane folder wastes time and disk quota. Files are symlinked, and only copied
+# if that fails. Hardlinks are opt-in: a hardlink looks like an independent file, but a
+# Gaussian rerun that rewrites the log in place changes the Arkane input along with it.
+# Use export_bundle to make a self-contained copy of an arkane directory to send elsewhere.
+#
+# Set STAGING_MODE to hardlink, symlink or copy to pick the first method to try
+# Usage: python staging.py export source_dir destination_dir
+import os
+import sys
+import shutil
+
+
+STAGING_MODES = ['hardlink', 'symlink', 'copy']
+
+
+def get_staging_modes(mode=None):
+    """Returns the staging methods to try in order
+    """
+    if mode is None:
+        mode = os.environ.get('STAGING_MODE', 'symlink')
+    if mode not in STAGING_MODES:
+        raise ValueError(f'Unknown staging mode {mode}, must be one of {STAGING_MODES}')
+    return STAGING_MODES[STAGING_MODES.index(mode):]
+
+
+def stage_file(src, dst, mode=None):
+    """Puts src at dst like shutil.copy, but with a symlink (or hardlink, if asked for) when possible
+    dst can be a directory, in which case the file keeps its name
+    An existing file at dst is replaced. Returns the path to the staged file
+    """
+    if os.path.isdir(dst):
+        dst = os.path.join(dst, os.path.basename(src))
+    src = os.path.realpath(src)
+    methods = get_staging_modes(mode)
+    if os.path.lexists(dst):
+        # hardlinks staged before symlinks were the default get replaced too
+        if os.path.exists(dst) and os.path.samefile(src, dst) and (methods[0] == 'hardlink' or os.path.islink(dst)):
+            return dst  # already staged
+        os.remove(dst)
+
+    for method in methods:
+        try:
+            if method == 'hardlink':
+                os.link(src, dst)
+            elif method == 'symlink':
+                os.symlink(src, dst)
+            else:
+                shutil.copy2(src, dst)
+            return dst
+        except OSError:
+            if method == 'copy':
+                raise
+    return dst
+
+
+def stage_tree(src_dir, dst_dir, mode=None):
+    """Mirrors the directory structure of src_dir into dst_dir and stages every file
+    Files already in dst_dir that aren't in src_dir are left alone
+    """
+    # walked by hand because shutil.copytree only accepts an existing dst_dir from Python 3.8
+    for root, dirs, files in os.walk(src_dir, followlinks=True):
+        dst_root = os.path.join(dst_dir, os.path.relpath(root, src_dir))
+        os.makedirs(dst_root, exist_ok=True)
+        for name in files:
+            stage_file(os.path.join(root, name), os.path.join(dst_root, name), mode=mode)
+    return dst_dir
+
+
+def export_bundle(src_dir, dst_dir):
+    """Makes a portable copy of a staged directory, with real copies of every linked file
+    """
+    for root, dirs, files in os.walk(src_dir, followlinks=True):
+        dst_root = os.path.join(dst_dir, os.path.relpath(root, src_dir))
+        os.makedirs(dst_root, exist_ok=True)
+        for name in files:
+            # copy2 follows symlinks, so the bundle gets the file contents
+            shutil.copy2(os.path.join(root, name), os.path.join(dst_root, name))
+    return dst_dir
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 4 or sys.argv[1] != 'export':
+        print('Usage: python staging.py export source_dir destination_dir')
+        sys.exit(1)
+    print(export_bundle(sys.argv[2], sys.argv[3]))
@@ -0,0 +1,326 @@
+# Campaign state database
+# One SQLite row per (species/reaction, index, stage) with its status, the last SLURM job, the number
+# of attempts and a pointer to the result, so scheduling questions like "which species have rotors
+# pending?" are an indexed query instead of a walk through DFT_DIR with globs and log reads.
+# job.py and kineticfun.py update it as they go and check it before falling back to the files.
+# bootstrap() fills it in once from the files an existing campaign left behind
+# (NO_ROTORS.txt, RMG_libraries/thermo.py, irc_result.txt, slurm-*.out, ...).
+#
+# SQLite locking is unreliable on some network filesystems - set STATE_DB to put the database
+# somewhere else if DFT_DIR is on one of them. If the database can't be read or written the
+# error is printed and the callers fall back to checking the files.
+# A complete row only counts while its result_path still exists, so deleting a result reruns the stage.
+#
+# Usage: python state_db.py bootstrap
+#        python state_db.py species rotors pending    prints the matching indices
+#        python state_db.py reaction 12               prints every stage of one item
+#        python state_db.py reset reaction 12 [irc]   marks every stage (or one) of an item pending
+import os
+import re
+import sys
+import glob
+import time
+import sqlite3
+
+import model_lists
+import gaussian_log
+
+
+try:
+    DFT_DIR = os.environ['DFT_DIR']
+except KeyError:
+    DFT_DIR = "/work/westgroup/harris.se/autoscience/autoscience/butane/dft"
+
+# 'skipped' is complete with nothing to do, e.g. rotors for a species with NO_ROTORS.txt
+STATUSES = ['pending', 'running', 'complete', 'failed', 'skipped']
+SPECIES_STAGES = ['conformers', 'rotors', 'arkane']
+REACTION_STAGES = ['shell', 'center', 'overall', 'vibrational_analysis', 'irc', 'arkane']
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS items (
+        kind TEXT NOT NULL,
+        idx INTEGER NOT NULL,
+        stage TEXT NOT NULL,
+        status TEXT NOT NULL,
+        job_id TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        result_path TEXT,
+        updated REAL NOT NULL,
+        PRIMARY KEY (kind, idx, stage)
+    )""",
+    'CREATE INDEX IF NOT EXISTS items_by_status ON items (kind, stage, status, idx)',
+]
+
+# job_id and result_path are only overwritten when a new value is given
+UPSERT = """INSERT INTO items (kind, idx, stage, status, job_id, attempts, result_path, updated)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (kind, idx, stage) DO UPDATE SET
+        status = excluded.status,
+        job_id = COALESCE(excluded.job_id, items.job_id),
+        attempts = items.attempts + excluded.attempts,
+        result_path = COALESCE(excluded.result_path, items.result_path),
+        updated = excluded.updated"""
+
+COLUMNS = ['kind', 'idx', 'stage', 'status', 'job_id', 'attempts', 'result_path', 'updated']
+
+_connection = None
+_connection_key = None
+_reported_errors = set()
+
+
+def get_db_file():
+    return os.environ.get('STATE_DB', os.path.join(DFT_DIR, 'campaign_state.sqlite'))
+
+
+def connect():
+    """Returns this process's connection, creating the database and tables if needed
+    """
+    global _connection, _connection_key
+    # a connection can't be shared with a forked child, so each process opens its own
+    key = (os.getpid(), get_db_file())
+    if _connection is None or _connection_key != key:
+        _connection = None
+        connection = sqlite3.connect(key[1], timeout=60)
+        try:
+            with connection:
+                for statement in SCHEMA:
+                    connection.execute(statement)
+        except sqlite3.Error:
+            connection.close()
+            raise
+        _connection = connection
+        _connection_key = key
+    return _connection
+
+
+def report_error(error):
+    # printed once per message so a broken database doesn't flood the logs of a long sweep
+    message = f'State database {get_db_file()} unavailable, checking the files instead: {error}'
+    if message not in _reported_errors:
+        _reported_errors.add(message)
+        print(message)
+
+
+def set_status(kind, index, stage, status, job_id=None, result_path=None, new_attempt=False):
+    """Records the status of one stage in a single transaction
+    new_attempt=True counts a new submission of the stage
+    """
+    if status not in STATUSES:
+        raise ValueError(f'Unknown status {status}')
+    try:
+        conn = connect()
+        with conn:
+            conn.execute(UPSERT, (
+                kind, int(index), stage, status,
+                None if job_id is None else str(job_id),
+                int(new_attempt), result_path, time.time(),
+            ))
+    except sqlite3.Error as e:
+        report_error(e)
+
+
+def get_item(kind, index, stage):
+    """Returns the row for one stage as a dictionary, or None if nothing has been recorded
+    or the database can't be read
+    """
+    try:
+        row = connect().execute(
+            f'SELECT {", ".join(COLUMNS)} FROM items WHERE kind = ? AND idx = ? AND stage = ?',
+            (kind, int(index), stage),
+        ).fetchone()
+    except sqlite3.Error as e:
+        report_error(e)
+        return None
+    if row is None:
+        return None
+    return dict(zip(COLUMNS, row))
+
+
+def get_status(kind, index, stage):
+    item = get_item(kind, index, stage)
+    if item is None:
+        return None
+    return item['status']
+
+
+def is_complete(kind, index, stage):
+    """True if the stage was recorded as complete or skipped and its result is still there
+    """
+    item = get_item(kind, index, stage)
+    if item is None or item['status'] not in ('complete', 'skipped'):
+        return False
+    return item['result_path'] is None or os.path.exists(item['result_path'])
+
+
+def reset(kind, index, stage=None):
+    """Marks every stage of an item, or just one, as pending so it is checked and run again
+    Keeps the job IDs and attempt counts. Returns the number of rows reset
+    """
+    query = 'UPDATE items SET status = ?, result_path = NULL, updated = ? WHERE kind = ? AND idx = ?'
+    parameters = ['pending', time.time(), kind, int(index)]
+    if stage is not None:
+        query += ' AND stage = ?'
+        parameters.append(stage)
+    conn = connect()
+    with conn:
+        return conn.execute(query, parameters).rowcount
+
+
+def find(kind, stage, status):
+    """Indices of every species or reaction with a stage in the given status
+    """
+    rows = connect().execute(
+        'SELECT idx FROM items WHERE kind = ? AND stage = ? AND status = ? ORDER BY idx',
+        (kind, stage, status),
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def get_items(kind, index):
+    rows = connect().execute(
+        f'SELECT {", ".join(COLUMNS)} FROM items WHERE kind = ? AND idx = ?', (kind, int(index))
+    ).fetchall()
+    return [dict(zip(COLUMNS, row)) for row in rows]
+
+
+def get_last_slurm_job(directory):
+    """Highest job ID among the slurm-<job>[_<task>].out files in a directory, or None
+    """
+    job_ids = []
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                match = re.match(r'slurm-(\d+)', entry.name)
+                if match:
+                    job_ids.append(int(match.group(1)))
+    except FileNotFoundError:
+        return None
+    if not job_ids:
+        return None
+    return str(max(job_ids))
+
+
+def read_flag_file(path):
+    # contents of vibrational_analysis_check.txt or irc_result.txt as a status
+    with open(path, 'r') as f:
+        return 'complete' if f.read().strip() == 'True' else 'failed'
+
+
+def get_species_rows(species_index):
+    """(stage, status, job_id, result_path) for each stage of a species, from which files exist
+    """
+    species_dir = os.path.join(DFT_DIR, 'thermo', f'species_{species_index:04}')
+    conformer_dir = os.path.join(species_dir, 'conformers')
+    rotor_dir = os.path.join(species_dir, 'rotors')
+    thermo_file = os.path.join(species_dir, 'arkane', 'RMG_libraries', 'thermo.py')
+    lowest_conformer_file = os.path.join(rotor_dir, 'lowest_conformer.txt')
+    no_rotors_file = os.path.join(rotor_dir, 'NO_ROTORS.txt')
+
+    rows = []
+    arkane_done = os.path.exists(thermo_file)
+    rows.append(('arkane', 'complete' if arkane_done else 'pending', None, thermo_file if arkane_done else None))
+
+    if os.path.exists(no_rotors_file):
+        rows.append(('rotors', 'skipped', None, no_rotors_file))
+    elif arkane_done or os.path.exists(os.path.join(rotor_dir, 'rotors.done')):
+        rows.append(('rotors', 'complete', get_last_slurm_job(rotor_dir), rotor_dir))
+    elif os.path.exists(os.path.join(rotor_dir, 'run_rotor_calcs.sh')):
+        rows.append(('rotors', 'running', get_last_slurm_job(rotor_dir), None))
+    else:
+        rows.append(('rotors', 'pending', None, None))
+
+    # rotors only start once the lowest conformer has been picked
+    rotors_started = rows[-1][1] != 'pending'
+    if os.path.exists(lowest_conformer_file):
+        rows.append(('conformers', 'complete', get_last_slurm_job(conformer_dir), lowest_conformer_file))
+    elif rotors_started or os.path.exists(os.path.join(conformer_dir, 'conformers.done')):
+        rows.append(('conformers', 'complete', get_last_slurm_job(conformer_dir), conformer_dir))
+    elif os.path.exists(os.path.join(conformer_dir, 'run.sh')):
+        rows.append(('conformers', 'running', get_last_slurm_job(conformer_dir), None))
+    else:
+        rows.append(('conformers', 'pending', None, None))
+    return rows
+
+
+def get_reaction_rows(reaction_index):
+    reaction_dir = os.path.join(DFT_DIR, 'kinetics', f'reaction_{reaction_index:04}')
+    shell_dir = os.path.join(reaction_dir, 'shell')
+    overall_dir = os.path.join(reaction_dir, 'overall')
+    reactions_file = os.path.join(reaction_dir, 'arkane', 'RMG_libraries', 'reactions.py')
+    vib_file = os.path.join(reaction_dir, 'arkane', 'vibrational_analysis_check.txt')
+    irc_file = os.path.join(reaction_dir, 'irc', 'irc_result.txt')
+
+    rows = []
+    arkane_done = os.path.exists(reactions_file)
+    rows.append(('arkane', 'complete' if arkane_done else 'pending', None, reactions_file if arkane_done else None))
+
+    # each overall array task adds to ts_energies.csv as it finishes, so the file exists while the
+    # others are still running - the stage is complete once every log has terminated, as in
+    # kineticfun.overall_complete
+    overall_logs = glob.glob(os.path.join(overall_dir, 'fwd_ts_*.log'))
+    if overall_logs and all(gaussian_log.termination_status(log) not in (1, -1) for log in overall_logs):
+        rows.append(('overall', 'complete', get_last_slurm_job(overall_dir), overall_dir))
+    elif os.path.isdir(overall_dir):
+        rows.append(('overall', 'running', get_last_slurm_job(overall_dir), None))
+    else:
+        rows.append(('overall', 'pending', None, None))
+
+    # the overall optimizations start from the shell geometries
+    if os.path.isdir(overall_dir):
+        rows.append(('shell', 'complete', get_last_slurm_job(shell_dir), shell_dir))
+    elif os.path.isdir(shell_dir):
+        rows.append(('shell', 'running', get_last_slurm_job(shell_dir), None))
+    else:
+        rows.append(('shell', 'pending', None, None))
+
+    for stage, flag_file in [('vibrational_analysis', vib_file), ('irc', irc_file)]:
+        if os.path.exists(flag_file):
+            rows.append((stage, read_flag_file(flag_file), None, flag_file))
+        else:
+            rows.append((stage, 'pending', None, None))
+    return rows
+
+
+def bootstrap():
+    """Fills in every species and reaction in the lists from the files in DFT_DIR
+    Overwrites status and result_path but keeps the attempt counts. Returns the number of rows written
+    """
+    now = time.time()
+    rows = []
+    for kind, list_name, get_rows in [
+        ('species', 'species_list.csv', get_species_rows),
+        ('reaction', 'reaction_list.csv', get_reaction_rows),
+    ]:
+        list_file = os.path.join(DFT_DIR, list_name)
+        if not os.path.exists(list_file):
+            continue
+        for entry in model_lists.read_list(list_file):
+            for stage, status, job_id, result_path in get_rows(entry['i']):
+                rows.append((kind, entry['i'], stage, status, job_id, 0, result_path, now))
+
+    conn = connect()
+    with conn:
+        conn.executemany(UPSERT, rows)
+    return len(rows)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print('Usage: python state_db.py bootstrap | <kind> <stage> <status> | <kind> <index> | reset <kind> <index> [stage]')
+        exit(1)
+
+    if sys.argv[1] == 'bootstrap':
+        n_rows = bootstrap()
+        print(f'Wrote {n_rows} rows to {get_db_file()}')
+    elif sys.argv[1] == 'reset':
+        stage = sys.argv[4] if len(sys.argv) > 4 else None
+        n_rows = reset(sys.argv[2], int(sys.argv[3]), stage)
+        print(f'Reset {n_rows} rows')
+    elif len(sys.argv) == 4:
+        for index in find(sys.argv[1], sys.argv[2], sys.argv[3]):
+            print(index)
+    else:
+        for item in get_items(sys.argv[1], int(sys.argv[2])):
+            updated = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(item['updated']))
+            print(f"{item['stage']:22s} {item['status']:10s} job {item['job_id'] or '-':>10s}  "
+                  f"attempts {item['attempts']}  {updated}  {item['result_path'] or ''}")
@@ -1,8 +1,10 @@
-# script to copy lowest conformer to the rotors folder
+# script to stage the lowest conformer to the rotors folder
 import os
 import sys
 import job
-import shutil
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import staging
 
 
 species_index = int(sys.argv[1])
@@ -12,4 +14,8 @@ if best_conformer_file is None:
 
 rotor_dir = os.path.join(job.DFT_DIR, 'thermo', f'species_{species_index:04}', 'rotors')
 os.makedirs(rotor_dir, exist_ok=True)
-shutil.copy(best_conformer_file, rotor_dir)
+staging.stage_file(best_conformer_file, rotor_dir)
+
+# record which conformer was picked, so later steps (and Snakemake) have a fixed file to depend on
+with open(os.path.join(rotor_dir, 'lowest_conformer.txt'), 'w') as f:
+    f.write(os.path.basename(best_conformer_file) + '\n')
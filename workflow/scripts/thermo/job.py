@@ -1,13 +1,18 @@
 # Functions for running a thermo job using this workflow
-import pandas as pd
 import os
 import sys
 import glob
-import datetime
 import time
+import shutil
 import subprocess
 import job_manager
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import result_store
+import model_lists
+import events
+import state_db
+
 
 try:
     DFT_DIR = os.environ['DFT_DIR']
@@ -15,13 +20,18 @@ except KeyError:
     # DFT_DIR = '/work/westgroup/harris.se/autoscience/autoscience_workflow/results/dft'
     DFT_DIR = '/work/westgroup/harris.se/autoscience/autoscience/butane/dft'
 
+WORKFLOW_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+SLURM_PROFILE = os.path.join(WORKFLOW_DIR, 'profiles', 'slurm')
+# the SLURM profile needs Snakemake >= 8 (Python >= 3.11), which can't be installed in tst_env,
+# so this driver calls the snakemake from another environment - set SNAKEMAKE to its full path
+MIN_SNAKEMAKE_VERSION = 8
+
 
 def get_num_species():
     """Function to lookup number of species in the species_list.csv
     """
     species_csv = os.path.join(DFT_DIR, 'species_list.csv')
-    species_df = pd.read_csv(species_csv)
-    return species_df.i.values[-1]
+    return model_lists.get_last_index(species_csv)
 
 
 def index2smiles(species_index):
@@ -29,17 +39,14 @@ def index2smiles(species_index):
     looks up the results in the species_list.csv
     """
     species_csv = os.path.join(DFT_DIR, 'species_list.csv')
-    species_df = pd.read_csv(species_csv)
-    species_index = species_df.SMILES.values[species_index]
-    return species_index
+    return model_lists.get_value(species_csv, species_index, 'SMILES')
 
 
 def index2name(species_index):
     """Function to return species name given in species_list.csv
     """
     species_csv = os.path.join(DFT_DIR, 'species_list.csv')
-    species_df = pd.read_csv(species_csv)
-    return species_df[species_df['i'] == species_index]['name'].values[0]
+    return model_lists.get_value(species_csv, species_index, 'name')
 
 
 def smiles2index(species_smiles):
@@ -47,28 +54,11 @@ def smiles2index(species_smiles):
     looks up the results in the species_list.csv
     """
     species_csv = os.path.join(DFT_DIR, 'species_list.csv')
-    species_df = pd.read_csv(species_csv)
-    try:
-        species_index = species_df[species_df['SMILES'] == species_smiles]['i'].values[0]
-        return species_index
-    except IndexError:
-        # print(f'could not identify species {species_smiles}')
+    species_index = model_lists.find_index(species_csv, 'SMILES', species_smiles)
+    if species_index is None:
+        # you don't want to equate resonance structures, so no isomorphism check here
         raise IndexError(f'could not identify species {species_smiles}')
-        # you don't want to equate resonance structures
-        import rmgpy.species
-        # now we need to check all the species for isomorphism
-        ref_sp = rmgpy.species.Species(smiles=species_smiles)
-        for i in range(0, len(species_df)):
-            sp = rmgpy.species.Species(smiles=species_df['SMILES'].values[i])
-            resonance = sp.generate_resonance_structures()
-            if resonance:
-                sp = resonance
-            else:
-                sp = [sp]
-            for compare_sp in sp:
-                if ref_sp.is_isomorphic(compare_sp):
-                    return i
-        print(f'could not identify species {species_smiles}')
+    return species_index
 
 
 def arkane_complete(species_index):
@@ -77,9 +67,14 @@ def arkane_complete(species_index):
     DFT_DIR/thermo/species_XXXX/arkane/RMG_libraries/thermo.py
     Returns True if complete, False otherwise
     """
+    if state_db.is_complete('species', species_index, 'arkane'):
+        return True
     species_dir = os.path.join(DFT_DIR, 'thermo', f'species_{species_index:04}')
     arkane_result = os.path.join(species_dir, 'arkane', 'RMG_libraries', 'thermo.py')
-    return os.path.exists(arkane_result)
+    if os.path.exists(arkane_result):
+        state_db.set_status('species', species_index, 'arkane', 'complete', result_path=arkane_result)
+        return True
+    return False
 
 
 def termination_status(log_file):
@@ -118,8 +113,9 @@ def get_n_runs(slurm_array_file):
     with open(slurm_array_file, 'r') as f:
         for line in f:
             if 'SBATCH --array=' in line:
-                token = line.split('-')[-1]
-                n_runs = 1 + int(token.split('%')[0])
+                # handles ranges and comma separated lists, e.g. 0-17%20 or 0,2,5%20
+                array_str = line.split('--array=')[-1].split('%')[0].strip()
+                n_runs = 1 + max([int(token.split('-')[-1]) for token in array_str.split(',')])
                 return n_runs
     return 0
 
@@ -161,9 +157,15 @@ def incomplete_rotors(species_index):
     if not os.path.exists(slurm_array_file):
         return True  # no rotors run yet
     n_rotors = get_n_runs(slurm_array_file)
+    if n_rotors == 0:
+        # Link1 rotor jobs run without an array, so look at the individual inputs instead
+        rotor_inputs = glob.glob(os.path.join(rotor_dir, 'rotor_????.com'))
+        n_rotors = 1 + max([int(os.path.basename(fname)[6:10]) for fname in rotor_inputs], default=-1)
 
     incomplete_rs = []
     for r_index in range(0, n_rotors):
+        if not os.path.exists(os.path.join(rotor_dir, f'rotor_{r_index:04}.com')):
+            continue  # equivalent to another rotor, so it was never scanned
         rotor_file = os.path.join(rotor_dir, f'rotor_{r_index:04}.log')
         if not os.path.exists(rotor_file):
             incomplete_rs.append(r_index)
@@ -174,13 +176,40 @@ def incomplete_rotors(species_index):
     return incomplete_rs
 
 
+def incomplete_refinements(species_index):
+    """Returns a list of the refinement inputs of adaptive rotor scans (see refine_rotors.py)
+    that are missing a log or didn't end in Normal termination
+    Coarse scans that haven't finished are left to incomplete_rotors
+    """
+    rotor_dir = os.path.join(DFT_DIR, 'thermo', f'species_{species_index:04}', 'rotors')
+    rotor_inputs = sorted(glob.glob(os.path.join(rotor_dir, 'rotor_????.com')))
+    if not rotor_inputs:
+        return []
+    import rotor_scan  # needs the AutoTST environment, so only import it for species with rotors
+
+    incomplete_refs = []
+    for rotor_input in rotor_inputs:
+        if not rotor_scan.is_coarse_scan(rotor_input) or not os.path.exists(rotor_input[:-4] + '.log'):
+            continue
+        try:
+            incomplete_refs += rotor_scan.get_missing_refinements(rotor_dir, int(os.path.basename(rotor_input)[6:10]))
+        except ValueError as e:
+            print(e)
+            incomplete_refs.append(rotor_input)
+    return incomplete_refs
+
+
 def conformers_complete(species_index):
     """Function to check whether all of the Gaussian conformer jobs have finished running.
     Looks at the run.sh script to find the highest conformer index, then searches each .log file
     for Normal termination
     """
+    if state_db.is_complete('species', species_index, 'conformers'):
+        return True
     if incomplete_conformers(species_index):
         return False
+    conformer_dir = os.path.join(DFT_DIR, 'thermo', f'species_{species_index:04}', 'conformers')
+    state_db.set_status('species', species_index, 'conformers', 'complete', result_path=conformer_dir)
     return True
 
 
@@ -189,8 +218,14 @@ def rotors_complete(species_index):
     Looks at the run.sh script to find the highest rotor index, then searches each .log file
     for Normal termination
     """
+    if state_db.is_complete('species', species_index, 'rotors'):
+        return True
     if incomplete_rotors(species_index):
         return False
+    if incomplete_refinements(species_index):
+        return False
+    rotor_dir = os.path.join(DFT_DIR, 'thermo', f'species_{species_index:04}', 'rotors')
+    state_db.set_status('species', species_index, 'rotors', 'complete', result_path=rotor_dir)
     return True
 
 
@@ -248,7 +283,12 @@ def restart_conformers(species_index):
     slurm_cmd = f"sbatch {slurm_run_file}"
     gaussian_conformers_job.submit(slurm_cmd)
     os.chdir(start_dir)
-    gaussian_conformers_job.wait_all(check_interval=600)
+    stage_log = events.StageLog('species', species_index, 'conformers')
+    stage_log.event('submitted', job_id=gaussian_conformers_job.job_id, restart=True)
+    state_db.set_status(
+        'species', species_index, 'conformers', 'running', job_id=gaussian_conformers_job.job_id, new_attempt=True
+    )
+    stage_log.wait_for_job(gaussian_conformers_job.job_id, check_interval=600)
 
 
 def restart_rotors(species_index):
@@ -296,7 +336,58 @@ def restart_rotors(species_index):
     slurm_cmd = f"sbatch {slurm_run_file}"
     gaussian_rotors_job.submit(slurm_cmd)
     os.chdir(start_dir)
-    gaussian_rotors_job.wait_all(check_interval=600)
+    stage_log = events.StageLog('species', species_index, 'rotors')
+    stage_log.event('submitted', job_id=gaussian_rotors_job.job_id, restart=True)
+    state_db.set_status(
+        'species', species_index, 'rotors', 'running', job_id=gaussian_rotors_job.job_id, new_attempt=True
+    )
+    stage_log.wait_for_job(gaussian_rotors_job.job_id, check_interval=600)
+
+
+def get_snakemake():
+    """Returns the path to a snakemake that can run the SLURM profile, or None if there isn't one
+    Uses $SNAKEMAKE, otherwise the first snakemake on the PATH that isn't in this Python environment
+    """
+    snakemake = os.environ.get('SNAKEMAKE')
+    if not snakemake:
+        snakemake = shutil.which('snakemake')
+        if snakemake is None:
+            print('No snakemake found, set SNAKEMAKE to the snakemake for the SLURM profile')
+            return None
+        if os.path.realpath(snakemake).startswith(os.path.realpath(sys.prefix) + os.sep):
+            print(f'{snakemake} is in the driver environment, set SNAKEMAKE to the snakemake for the SLURM profile')
+            return None
+    try:
+        proc = subprocess.run([snakemake, '--version'], capture_output=True, text=True)
+    except OSError as e:
+        print(f'Could not run {snakemake}: {e}')
+        return None
+    version = proc.stdout.strip()
+    if proc.returncode != 0 or not version.split('.')[0].isdigit() or int(version.split('.')[0]) < MIN_SNAKEMAKE_VERSION:
+        print(f'{snakemake} is version {version or "unknown"}, the SLURM profile needs {MIN_SNAKEMAKE_VERSION} or newer')
+        return None
+    return snakemake
+
+
+def run_snakemake(target, stage_log=None):
+    """Builds one target of the wildcard Snakefile rules with the SLURM profile
+    Snakemake submits the jobs itself and this blocks until they have all finished
+    Returns the snakemake exit code, or None if no usable snakemake was found
+    """
+    snakemake = get_snakemake()
+    if snakemake is None:
+        if stage_log is not None:
+            stage_log.event('snakemake_unavailable')
+        return None
+    snakemake_cmd = [snakemake, '--profile', SLURM_PROFILE, target]
+    print(f'Running {" ".join(snakemake_cmd)}')
+    proc = subprocess.run(snakemake_cmd, cwd=WORKFLOW_DIR)
+    if proc.returncode != 0:
+        # usually a Gaussian job that timed out, which the restart handles
+        print(f'snakemake exited with code {proc.returncode} for {target}')
+        if stage_log is not None:
+            stage_log.event('snakemake_failed', returncode=proc.returncode)
+    return proc.returncode
 
 
 def run_conformers_job(species_index):
@@ -306,77 +397,41 @@ def run_conformers_job(species_index):
     species_dir = os.path.join(DFT_DIR, 'thermo', f'species_{species_index:04}')
     conformer_dir = os.path.join(species_dir, 'conformers')
     os.makedirs(conformer_dir, exist_ok=True)
-    logfile = os.path.join(conformer_dir, 'conformers.log')
+    stage_log = events.StageLog('species', species_index, 'conformers')
     start = time.time()
-    timestamp = datetime.datetime.now()
-    with open(logfile, 'a') as f:
-        f.write(f'Starting conformers job: {timestamp}' + '\n')
+    stage_log.event('start')
 
     # check if the run was already completed
     if conformers_complete(species_index):
         print('Conformers already ran')
-        with open(logfile, 'a') as f:
-            f.write('Conformers already ran\n')
+        stage_log.event('end', duration=time.time() - start, result='already ran')
         return True
 
-    # TODO make this path relative to the job.py script
-    workflow_dir = "/work/westgroup/harris.se/autoscience/autoscience_workflow/workflow"
-
-    # start a job that calls snakemake to run conformers
-    os.chdir(workflow_dir)
-    conformer_cmd = f'snakemake -c1 species_thermo --config species_index={species_index}'
-    print(f'Running {conformer_cmd}')
-    cmd_pieces = conformer_cmd.split()
-    proc = subprocess.Popen(cmd_pieces)
-    print(proc)
-
-    # RUN HOTBIT
-    time.sleep(300)
-    g16_job_number = ''
-    # look for the hotbit slurm file
-    hotbit_slurm = glob.glob(os.path.join(species_dir, 'slurm-*'))
-    if len(hotbit_slurm) == 0:
-        print('Hotbit slurm file not found. Hotbit did not start.')
-        exit(3)
-    hotbit_complete = False
-    while not hotbit_complete:
-        with open(hotbit_slurm[0], 'r') as f:
-            lines = f.readlines()
-            for line in lines:
-                if 'Submitted batch job' in line:
-                    hotbit_complete = True
-                    g16_job_number = line.split()[-1]
-                    break
-        time.sleep(300)  # This wait is to make sure the job is on the SLURM queue
-    print('Hotbit conformer screening complete')
-    with open(logfile, 'a') as f:
-        f.write('Hotbit conformer screening complete\n')
-
-    # wait 10 minutes for the conformer jobs to finish
-    gaussian_job = job_manager.SlurmJob()
-    gaussian_job.job_id = g16_job_number
-    print(f'Waiting on job {gaussian_job}')
-    with open(logfile, 'a') as f:
-        f.write(f'Waiting on job {g16_job_number}' + '\n')
-    gaussian_job.wait_all(check_interval=600)
+    # Snakemake submits the Hotbit and Gaussian jobs through the SLURM profile and waits for them
+    state_db.set_status('species', species_index, 'conformers', 'running', new_attempt=True)
+    with stage_log.timed('snakemake'):
+        snakemake_code = run_snakemake(os.path.join(conformer_dir, 'conformers.done'), stage_log)
+    if snakemake_code is None:
+        # nothing was submitted, so there's nothing to restart
+        state_db.set_status('species', species_index, 'conformers', 'failed')
+        stage_log.event('end', duration=time.time() - start, result='no snakemake')
+        return False
 
     # rerun any conformer jobs that failed to converge in time:
     if not conformers_complete(species_index):
-        with open(logfile, 'a') as f:
-            f.write('Setting up conformer restart job\n')
-        restart_conformers(species_index)  # this waits for jobs to finish
+        with stage_log.timed('restart'):
+            restart_conformers(species_index)  # this waits for jobs to finish
         if not conformers_complete(species_index):
-            with open(logfile, 'a') as f:
-                f.write('Conformer restart failed\n')
+            stage_log.event('end', duration=time.time() - start, result='restart failed')
+            state_db.set_status('species', species_index, 'conformers', 'failed')
             return False
 
-    end = time.time()
-    duration = end - start
+    duration = time.time() - start
     print(f'Gaussian conformer jobs completed in {duration} seconds' + '\n')
+    stage_log.event('end', duration=duration, result='complete')
 
-    with open(logfile, 'a') as f:
-        f.write(f'Gaussian conformer jobs completed in {duration} seconds' + '\n')
-
+    # save the finished conformers so they are never run again
+    result_store.record_directory(conformer_dir, 'conformer_*.com')
     return True
 
 
@@ -419,63 +474,51 @@ def run_rotors_job(species_index):
     species_dir = os.path.join(DFT_DIR, 'thermo', f'species_{species_index:04}')
     rotor_dir = os.path.join(species_dir, 'rotors')
     os.makedirs(rotor_dir, exist_ok=True)
-    logfile = os.path.join(rotor_dir, 'rotors.log')
+    stage_log = events.StageLog('species', species_index, 'rotors')
     start = time.time()
-    timestamp = datetime.datetime.now()
-    with open(logfile, 'a') as f:
-        f.write(f'Starting rotors job: {timestamp}' + '\n')
+    stage_log.event('start')
 
     # check if a rotor job was already completed
-    if os.path.exists(os.path.join(rotor_dir, 'NO_ROTORS.txt')):
+    no_rotors_file = os.path.join(rotor_dir, 'NO_ROTORS.txt')
+    # a skipped row only counts while NO_ROTORS.txt is still there
+    rotors_skipped = state_db.get_status('species', species_index, 'rotors') == 'skipped' and \
+        state_db.is_complete('species', species_index, 'rotors')
+    if rotors_skipped or os.path.exists(no_rotors_file):
+        state_db.set_status('species', species_index, 'rotors', 'skipped', result_path=no_rotors_file)
         print('No rotors to run')
-        with open(logfile, 'a') as f:
-            f.write('No rotors to run\n')
+        stage_log.event('end', duration=time.time() - start, result='no rotors')
         return True
     elif rotors_complete(species_index):
         print('Rotors already ran')
-        with open(logfile, 'a') as f:
-            f.write('Rotors already ran\n')
+        stage_log.event('end', duration=time.time() - start, result='already ran')
         return True
 
-    rotor_cmd = f'snakemake -c1 run_rotors --config species_index={species_index}'
-    print(f'Running {rotor_cmd}')
-    cmd_pieces = rotor_cmd.split()
-    proc = subprocess.Popen(cmd_pieces, stdin=None, stdout=None, stderr=None, close_fds=True)
-    print(proc)
-
-    # wait 5 minutes for the rotor gaussian job to begin
-    time.sleep(300)
-    g16_job_number = ''
-
-    rotor_slurm_files = glob.glob(os.path.join(rotor_dir, 'slurm-*'))
-    if len(rotor_slurm_files) == 0:
-        print('Rotor slurm file not found')
-        exit(3)
-
-    rotor_slurm_file = os.path.basename(rotor_slurm_files[0])
-    rotor_slurm_id = rotor_slurm_file[6:14]
-    rotor_job = job_manager.SlurmJob()
-    rotor_job.job_id = rotor_slurm_id
-    print(f'Waiting on job {rotor_slurm_id}')
-    with open(logfile, 'a') as f:
-        f.write(f'Waiting on job {rotor_slurm_id}' + '\n')
-    rotor_job.wait_all(check_interval=30)
+    state_db.set_status('species', species_index, 'rotors', 'running', new_attempt=True)
+    with stage_log.timed('snakemake'):
+        snakemake_code = run_snakemake(os.path.join(rotor_dir, 'rotors.done'), stage_log)
+    if snakemake_code is None:
+        # nothing was submitted, so there's nothing to restart
+        state_db.set_status('species', species_index, 'rotors', 'failed')
+        stage_log.event('end', duration=time.time() - start, result='no snakemake')
+        return False
 
     # rerun any rotor jobs that failed to converge in time:
     if not rotors_complete(species_index):
-        with open(logfile, 'a') as f:
-            f.write('Setting up rotor restart job\n')
-        restart_rotors(species_index)  # this waits for jobs to finish
+        if incomplete_rotors(species_index):
+            with stage_log.timed('restart'):
+                restart_rotors(species_index)  # this waits for jobs to finish
+        # adaptive scans can only be refined once the restarted coarse scans have finished
+        if not incomplete_rotors(species_index) and incomplete_refinements(species_index):
+            with stage_log.timed('refine'):
+                run_snakemake(os.path.join(rotor_dir, 'rotors.done'), stage_log)
         if not rotors_complete(species_index):
-            with open(logfile, 'a') as f:
-                f.write('Rotor restart failed\n')
+            stage_log.event('end', duration=time.time() - start, result='restart failed')
+            state_db.set_status('species', species_index, 'rotors', 'failed')
             return False
 
-    end = time.time()
-    duration = end - start
+    duration = time.time() - start
     print(f'Gaussian rotor jobs completed in {duration} seconds' + '\n')
-    with open(logfile, 'a') as f:
-        f.write(f'Gaussian rotor jobs completed in {duration} seconds' + '\n')
+    stage_log.event('end', duration=duration, result='complete')
     return True
 
 
@@ -489,35 +532,27 @@ def run_arkane_job(species_index):
         print('Arkane job already ran')
         return True
 
-    cwd = os.getcwd()
-    snakemake_dir = '/work/westgroup/harris.se/autoscience/autoscience_workflow/workflow'
-    os.chdir(snakemake_dir)
-    arkane_cmd = f'snakemake -c1 run_arkane_thermo --config species_index={species_index}'
-    print(f'Running {arkane_cmd}')
-    cmd_pieces = arkane_cmd.split()
-    proc = subprocess.Popen(cmd_pieces, stdin=None, stdout=None, stderr=None, close_fds=True)
-    print(proc)
-    os.chdir(cwd)
-
-    # wait 10 minutes for Arkane start/finish
-    # try to read the slurm file in
+    species_smiles = index2smiles(species_index)
+    stage_log = events.StageLog('species', species_index, 'arkane')
+    start = time.time()
+    stage_log.event('start')
     print('Waiting for arkane job')
-    logfile = os.path.join(arkane_dir, 'snakemake_arkane.log')
-    with open(logfile, 'a') as f:
-        f.write('Waiting for arkane job\n')
-    while not os.path.exists(arkane_result):
-        time.sleep(30)
-
-        # TODO, give up if it has started running but hasn't completed in twenty minutes
-    print('Arkane complete')
-    with open(logfile, 'a') as f:
-        f.write('Arkane complete\n')
+    state_db.set_status('species', species_index, 'arkane', 'running', new_attempt=True)
+    snakemake_code = run_snakemake(arkane_result, stage_log)
+    duration = time.time() - start
+    if snakemake_code is None:
+        state_db.set_status('species', species_index, 'arkane', 'failed')
+        stage_log.event('end', duration=duration, result='no snakemake')
+        return False
+    if not arkane_complete(species_index):
+        print('Arkane failed')
+        state_db.set_status('species', species_index, 'arkane', 'failed')
+        stage_log.event('end', duration=duration, result='failed')
+        return False
 
-    end = time.time()
-    duration = end - start
     print(f'COMPLETED {species_smiles} IN {duration} SECONDS')
-    with open(logfile, 'a') as f:
-        f.write(f'COMPLETED {species_smiles} IN {duration} SECONDS' + '\n')
+    stage_log.event('end', duration=duration, result='complete')
+    return True
 
 
 # temporary function to make no_rotors library -- delete this after you're done with it
@@ -531,6 +566,7 @@ def run_arkane_job_no_rotors(species_index):
         print("arkane already ran")
         return
 
+    start = time.time()
     cwd = os.getcwd()
     snakemake_dir = '/work/westgroup/harris.se/autoscience/autoscience_workflow/workflow'
     os.chdir(snakemake_dir)
@@ -541,22 +577,13 @@ def run_arkane_job_no_rotors(species_index):
     print(proc)
     os.chdir(cwd)
 
-    # wait 10 minutes for Arkane start/finish
-    # try to read the slurm file in
     print('Waiting for arkane job')
-    logfile = os.path.join(arkane_dir, 'snakemake_arkane.log')
-    with open(logfile, 'a') as f:
-        f.write('Waiting for arkane job\n')
+    stage_log = events.StageLog('species', species_index, 'arkane_no_rotors')
+    stage_log.event('start')
     while not os.path.exists(arkane_result):
         time.sleep(30)
 
         # TODO, give up if it has started running but hasn't completed in twenty minutes
-    print('Arkane complete')
-    with open(logfile, 'a') as f:
-        f.write('Arkane complete\n')
-
-    end = time.time()
-    duration = end - start
-    print(f'COMPLETED {species_smiles} IN {duration} SECONDS')
-    with open(logfile, 'a') as f:
-        f.write(f'COMPLETED {species_smiles} IN {duration} SECONDS' + '\n')
+    duration = time.time() - start
+    print(f'COMPLETED {index2smiles(species_index)} IN {duration} SECONDS')
+    stage_log.event('end', duration=duration, result='complete')
@@ -1,33 +1,32 @@
 # Script for running a thermo job for one species
+import os
 import sys
 import job
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import events
+
 
-logfile = 'all_logs.txt'
 n_species = job.get_num_species()
 print(n_species)
 # skip_indices = [1, 2, 3, 4, 9, 10, 42, 45, 46, 47]
 skip_indices = [9, 10]
 for species_index in range(110, 180):
     species_smiles = job.index2smiles(species_index)
+    stage_log = events.StageLog('species', species_index, 'campaign')
     if species_index in skip_indices:
-        with open(logfile, 'a') as f:
-            f.write(f'Skipping species {species_index}: {species_smiles}' + '\n')
+        stage_log.event('skipped', smiles=species_smiles)
         print(f'Skipping species {species_index}: {species_smiles}')
         continue
 
     if job.arkane_complete(species_index):
-        with open(logfile, 'a') as f:
-            f.write(f"SPECIES {species_index}: {species_smiles} already COMPLETE" + '\n')
+        stage_log.event('already_complete', smiles=species_smiles)
         print(f"SPECIES {species_index}: {species_smiles} already COMPLETE")
         continue
 
-    with open(logfile, 'a') as f:
-        f.write(f"Running Calculation for Species {species_index}: {species_smiles}" + '\n')
     print(f"Running Calculation for Species {species_index}: {species_smiles}")
-    job.run_conformers_job(species_index)
-    job.run_rotors_job(species_index)
-    job.run_arkane_job(species_index)
-    with open(logfile, 'a') as f:
-        f.write(f"SPECIES {species_index}: {species_smiles} COMPLETE" + '\n')
+    with stage_log.timed('species'):
+        job.run_conformers_job(species_index)
+        job.run_rotors_job(species_index)
+        job.run_arkane_job(species_index)
     print(f"SPECIES {species_index}: {species_smiles} COMPLETE")
@@ -8,5 +8,8 @@
 #SBATCH --exclude=c5003
 
 
+# the snakemake (>= 8, with the SLURM executor plugin) that job.py runs the profile with
+# export SNAKEMAKE=/path/to/snakemake_env/bin/snakemake
+
 cd "/work/westgroup/harris.se/autoscience/autoscience_workflow/workflow/"
 python "/work/westgroup/harris.se/autoscience/autoscience_workflow/workflow/scripts/thermo/run_one.py" $1
@@ -0,0 +1,324 @@
+# Keeps the heavy chemistry modules imported so short workflow steps don't pay for the imports
+# The server imports RMG, Arkane, AutoTST, ASE etc. once and listens on a UNIX socket.
+# Each request forks the server, so the step runs in a fresh process that already has the
+# modules loaded, with the client's working directory, environment, stdin/stdout/stderr and argv.
+# If no server is running, or the server runs a different Python environment than the client
+# (so it would have the wrong packages), the client just runs the script with this Python.
+# The server exits at startup if any of the chemistry modules can't be imported.
+#
+# The socket is node-local, so steps only use the server on the node it was started on
+# (Snakemake starts one in onstart for the localrules).
+#
+# Usage:
+#     python worker.py start                  start a server in the background if none is running
+#     python worker.py serve                  run the server in the foreground
+#     python worker.py stop
+#     python worker.py run script.py [args]   run a script through the server
+import os
+import sys
+import json
+import time
+import array
+import runpy
+import signal
+import socket
+import struct
+import tempfile
+import traceback
+import subprocess
+
+
+PRELOAD_MODULES = [
+    'numpy',
+    'pandas',
+    'rmgpy.molecule',
+    'rmgpy.species',
+    'rmgpy.reaction',
+    'rmgpy.chemkin',
+    'rmgpy.data.thermo',
+    'rmgpy.data.kinetics',
+    'arkane.main',
+    'arkane.ess',
+    'ase.io',
+    'autotst.reaction',
+    'autotst.species',
+    'autotst.calculator.gaussian',
+]
+
+# exit code the server sends back when the client runs under a different Python environment
+WRONG_ENVIRONMENT = -2
+
+# shut down after this many seconds without a request so servers don't pile up on the login node
+IDLE_TIMEOUT = int(os.environ.get('WORKER_IDLE_TIMEOUT', 12 * 3600))
+
+
+def get_socket_path():
+    try:
+        return os.environ['WORKER_SOCKET']
+    except KeyError:
+        return os.path.join(tempfile.gettempdir(), f'autoscience_worker_{os.getuid()}.sock')
+
+
+def connect(socket_path=None):
+    """Returns a socket connected to the server, or None if there isn't one
+    """
+    if socket_path is None:
+        socket_path = get_socket_path()
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        client.close()
+        return None
+    return client
+
+
+def recv_exactly(conn, n_bytes):
+    data = b''
+    while len(data) < n_bytes:
+        chunk = conn.recv(n_bytes - len(data))
+        if not chunk:
+            raise ConnectionError('connection closed')
+        data += chunk
+    return data
+
+
+def get_environment():
+    return os.path.realpath(sys.prefix)
+
+
+def preload(modules=PRELOAD_MODULES):
+    """Imports the modules and returns the ones that failed
+    """
+    failed = []
+    for module in modules:
+        start = time.time()
+        try:
+            __import__(module)
+        except Exception as e:
+            print(f'Could not import {module}: {type(e).__name__}: {e}')
+            failed.append(module)
+            continue
+        print(f'Imported {module} in {time.time() - start:.1f}s')
+    sys.stdout.flush()
+    return failed
+
+
+def run_request(conn):
+    """Runs one request in the forked child and sends back the exit code
+    """
+    fds = array.array('i')
+    header, ancdata, _, _ = conn.recvmsg(4, socket.CMSG_SPACE(3 * fds.itemsize))
+    for level, kind, data in ancdata:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes(data[:len(data) - (len(data) % fds.itemsize)])
+    if not header:
+        return 0  # someone checking whether the server is up
+    header += recv_exactly(conn, 4 - len(header))
+    request = json.loads(recv_exactly(conn, struct.unpack('!I', header)[0]).decode())
+    if request.get('environment') != get_environment():
+        for fd in fds:
+            os.close(fd)
+        conn.sendall(struct.pack('!i', WRONG_ENVIRONMENT))
+        return WRONG_ENVIRONMENT
+
+    # take over the client's stdin, stdout and stderr
+    sys.stdout.flush()
+    sys.stderr.flush()
+    for target_fd, fd in enumerate(fds[:3]):
+        os.dup2(fd, target_fd)
+        os.close(fd)
+
+    os.chdir(request['cwd'])
+    os.environ.clear()
+    os.environ.update(request['env'])
+    script = os.path.abspath(request['argv'][0])
+    sys.argv = [script] + request['argv'][1:]
+    sys.path[0] = os.path.dirname(script)
+
+    code = 0
+    try:
+        runpy.run_path(script, run_name='__main__')
+    except SystemExit as e:
+        if e.code is None:
+            code = 0
+        elif isinstance(e.code, int):
+            code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    sys.stdout.flush()
+    sys.stderr.flush()
+    conn.sendall(struct.pack('!i', code))
+    return code
+
+
+def serve(socket_path=None):
+    if socket_path is None:
+        socket_path = get_socket_path()
+    existing = connect(socket_path)
+    if existing is not None:
+        existing.close()
+        print(f'Worker already running on {socket_path}')
+        return
+    if os.path.exists(socket_path):
+        os.remove(socket_path)  # left over from a server that died
+
+    # a server without the chemistry packages would just fail every step, so don't start one
+    failed = preload()
+    if failed:
+        print(f'Not starting the worker, {sys.executable} could not import {", ".join(failed)}')
+        sys.exit(1)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o077)
+    try:
+        server.bind(socket_path)
+    finally:
+        os.umask(old_umask)
+    server.listen(64)
+    with open(socket_path + '.pid', 'w') as f:
+        f.write(str(os.getpid()))
+    server.settimeout(60)
+    print(f'Worker listening on {socket_path}')
+    sys.stdout.flush()
+
+    def shutdown(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, shutdown)
+
+    last_request = time.time()
+    try:
+        while time.time() - last_request < IDLE_TIMEOUT:
+            # reap finished children
+            try:
+                while os.waitpid(-1, os.WNOHANG)[0] > 0:
+                    pass
+            except ChildProcessError:
+                pass
+
+            try:
+                conn, _ = server.accept()
+            except socket.timeout:
+                continue
+            last_request = time.time()
+            conn.settimeout(None)
+            pid = os.fork()
+            if pid == 0:
+                server.close()
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                code = 1
+                try:
+                    code = run_request(conn)
+                except BaseException:
+                    traceback.print_exc()
+                finally:
+                    # os._exit skips atexit, so write out any buffered events first
+                    if 'events' in sys.modules:
+                        sys.modules['events'].flush()
+                    os._exit(code)
+            conn.close()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        for path in [socket_path, socket_path + '.pid']:
+            if os.path.exists(path):
+                os.remove(path)
+        print('Worker stopped')
+
+
+def start(socket_path=None):
+    """Starts a server in the background and waits until it is accepting requests
+    """
+    if socket_path is None:
+        socket_path = get_socket_path()
+    existing = connect(socket_path)
+    if existing is not None:
+        existing.close()
+        return True
+
+    logfile = os.path.join(tempfile.gettempdir(), f'autoscience_worker_{os.getuid()}.log')
+    with open(logfile, 'a') as f:
+        proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), 'serve'],
+            stdin=subprocess.DEVNULL, stdout=f, stderr=subprocess.STDOUT, start_new_session=True,
+        )
+    # preloading RMG and AutoTST takes a while
+    for i in range(300):
+        time.sleep(1)
+        client = connect(socket_path)
+        if client is not None:
+            client.close()
+            print(f'Worker started with pid {proc.pid}')
+            return True
+        if proc.poll() is not None:
+            break
+    print(f'Worker did not start, see {logfile}')
+    return False
+
+
+def stop(socket_path=None):
+    if socket_path is None:
+        socket_path = get_socket_path()
+    try:
+        with open(socket_path + '.pid', 'r') as f:
+            pid = int(f.read())
+    except (FileNotFoundError, ValueError):
+        print('No worker running')
+        return
+    try:
+        os.kill(pid, signal.SIGTERM)
+        print(f'Stopped worker {pid}')
+    except ProcessLookupError:
+        print('No worker running')
+        os.remove(socket_path + '.pid')
+
+
+def run(argv, socket_path=None):
+    """Runs argv (script and arguments) through the server and returns the exit code
+    Falls back to running the script directly if there's no server or it runs a different Python
+    """
+    client = connect(socket_path)
+    if client is None:
+        os.execv(sys.executable, [sys.executable] + argv)
+
+    payload = json.dumps({
+        'argv': argv, 'cwd': os.getcwd(), 'env': dict(os.environ), 'environment': get_environment(),
+    }).encode()
+    message = struct.pack('!I', len(payload)) + payload
+    try:
+        client.sendmsg([message[:4]], [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array('i', [0, 1, 2]))])
+        client.sendall(message[4:])
+        code = struct.unpack('!i', recv_exactly(client, 4))[0]
+    except OSError:
+        print('Worker died while running the request', file=sys.stderr)
+        code = 1
+    finally:
+        client.close()
+    if code == WRONG_ENVIRONMENT:
+        print(f'Worker runs a different Python environment, running with {sys.executable}', file=sys.stderr)
+        sys.stderr.flush()
+        os.execv(sys.executable, [sys.executable] + argv)
+    return code
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print('Usage: python worker.py start|serve|stop|run script.py [args]')
+        exit(1)
+    command = sys.argv[1]
+    if command == 'serve':
+        serve()
+    elif command == 'start':
+        exit(0 if start() else 1)
+    elif command == 'stop':
+        stop()
+    elif command == 'run':
+        exit(run(sys.argv[2:]))
+    else:
+        print(f'Unknown command {command}')
+        exit(1)
@@ -0,0 +1,61 @@
+# read_sacct against a saved sacct file and a stand-in sacct command that prints it
+import os
+import stat
+
+import pytest
+
+import campaign_report
+
+
+SACCT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'sacct.txt')
+
+
+@pytest.fixture
+def fake_sacct(tmp_path, monkeypatch):
+    """Puts a sacct on the PATH that records its arguments and prints the saved output
+    Returns the file the arguments are written to
+    """
+    args_file = tmp_path / 'sacct_args.txt'
+    script = tmp_path / 'sacct'
+    script.write_text(f'#!/bin/sh\necho "$@" > {args_file}\ncat {SACCT_FILE}\n')
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv('PATH', str(tmp_path) + os.pathsep + os.environ['PATH'])
+    return args_file
+
+
+def check_jobs(jobs):
+    # the pending job and the job that isn't part of the workflow are left out
+    assert [job['job_id'] for job in jobs] == ['1001_0', '1001_1', '1002', '1003']
+    by_id = {job['job_id']: job for job in jobs}
+
+    assert (by_id['1001_0']['kind'], by_id['1001_0']['index'], by_id['1001_0']['stage']) == ('species', 12, 'conformers')
+    assert by_id['1001_0']['core_hours'] == pytest.approx(32.0)
+    assert by_id['1001_0']['queue_wait'] == pytest.approx(0.5)
+    assert by_id['1001_1']['state'] == 'FAILED'
+
+    assert (by_id['1002']['kind'], by_id['1002']['index'], by_id['1002']['stage']) == ('reaction', 4, 'shell')
+    assert by_id['1002']['restart']
+    assert by_id['1002']['state'] == 'CANCELLED'
+    assert by_id['1002']['queue_wait'] == pytest.approx(6.0)
+
+    # Snakemake jobs are recognized from the rule in the comment
+    assert (by_id['1003']['kind'], by_id['1003']['index'], by_id['1003']['stage']) == ('species', 30, 'rotors')
+    assert not by_id['1003']['restart']
+    assert by_id['1003']['core_hours'] == pytest.approx(384.0)
+
+
+def test_read_sacct_file():
+    check_jobs(campaign_report.read_sacct(SACCT_FILE))
+
+
+def test_read_sacct_command(fake_sacct, monkeypatch):
+    monkeypatch.setenv('SACCT_START', '2022-02-15')
+    check_jobs(campaign_report.read_sacct())
+    args = fake_sacct.read_text().split()
+    assert args[:5] == ['-P', '-X', '-S', '2022-02-15', '-o']
+    assert args[5] == ','.join(campaign_report.SACCT_FIELDS)
+
+
+def test_read_sacct_without_sacct(tmp_path, monkeypatch):
+    monkeypatch.setenv('PATH', str(tmp_path))
+    assert campaign_report.read_sacct() == []